@@ -0,0 +1,310 @@
+# pylint: disable=W,R,C,no-member
+"""
+Headless benchmark suite for ui_library.
+
+    python benchmarks/bench.py                  run everything and compare against baseline.json
+    python benchmarks/bench.py tabs scrollable  run some scenarios
+    python benchmarks/bench.py --quick          smaller inputs, for a fast sanity check
+    python benchmarks/bench.py --save-baseline  store this run as the new baseline
+    python benchmarks/bench.py --check          exit with 1 if anything regressed past --threshold
+
+Every scenario runs in its own interpreter so import costs and caches don't leak between them.
+Timings are the median of `--repeat` runs (setup excluded). Memory is the tracemalloc peak of
+one extra run, setup included. Baselines are only comparable on the same machine.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+SCENARIOS = {}
+
+def scenario(name:str):
+    """
+    registers `setup(quick) -> run` as a scenario. `run()` is the timed part and may return
+    a list of per-frame times (from Editor.run_headless)
+    """
+    def register(setup):
+        SCENARIOS[name] = setup
+        return setup
+    return register
+
+def _prepare():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.chdir(ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "ui_library"))
+
+def _json_text(size:int) -> str:
+    rng = random.Random(0)
+    items = []
+    text = ""
+    while len(text) < size:
+        for _ in range(200):
+            items.append({
+                "id": rng.randint(0, 1_000_000),
+                "name": f"item \"{rng.randint(0, 999)}\"\\n",
+                "price": round(rng.random() * 100, 2),
+                "tags": [rng.choice(["a", "b", "c"]) for _ in range(3)],
+                "active": rng.choice([True, False, None])
+            })
+        text = json.dumps({"items": items}, indent=4)
+    return text
+
+def _ds_text(size:int) -> str:
+    rng = random.Random(0)
+    lines = []
+    length = 0
+    while length < size:
+        n = rng.randint(0, 999)
+        line = rng.choice([
+            f"// comment {n}",
+            f"/* block {n} */",
+            f"@tag{n}: [engine:combat/start] <#player.health> = {n}",
+            f"if <%x.{n}> >= {n} and not <$y> {{",
+            f"    $var{n} = \"text {n} `<#a>` \\n\" + 'more'",
+            f"    return [game:items/{n}] <name>",
+            f"}} elif true or false {{ break }} else {{ pass }}",
+            f"for <i> in <#list.{n}> {{ # % {n}.5 }}",
+        ])
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def _frames(run, *args, **kwargs):
+    return lambda: run(*args, **kwargs)
+
+
+@scenario("import")
+def _import(quick):
+    # has to be the first ui_library import of the process
+    def run():
+        import ui_library # pylint: disable=unused-import
+    return run
+
+@scenario("startup")
+def _startup(quick):
+    import ui_library as u
+    def run():
+        editor = u.Editor("bench", None, 800, 600)
+        editor.add_layer(0, u.NumberedTextArea(0, 0, 800, 600))
+        return editor.run_headless(frames=1)
+    return run
+
+@scenario("text_area_typing")
+def _text_area_typing(quick):
+    import ui_library as u
+    lines = 5_000 if quick else 50_000
+    editor = u.Editor("bench", None, 800, 600)
+    area = u.NumberedTextArea(0, 0, 800, 600)
+    area.set_content("\n".join(f"line {i} = {{\"value\": {i * 7 % 1000}}}" for i in range(lines)))
+    editor.add_layer(0, area)
+    replay = u.InputReplay().click(1, 300, 40)
+    end = replay.type_text(4, "typing into a big file\n")
+    return _frames(editor.run_headless, replay, end + 2)
+
+@scenario("text_area_scrolling")
+def _text_area_scrolling(quick):
+    import ui_library as u
+    lines = 5_000 if quick else 50_000
+    editor = u.Editor("bench", None, 800, 600)
+    area = u.NumberedTextArea(0, 0, 800, 600)
+    area.set_content("\n".join(f"line {i} = {{\"value\": {i * 7 % 1000}}}" for i in range(lines)))
+    editor.add_layer(0, area)
+    replay = u.InputReplay().move(0, 300, 300)
+    for f in range(1, 41):
+        replay.scroll(f, -3 if f <= 30 else 3)
+    return _frames(editor.run_headless, replay, 42)
+
+@scenario("tabs")
+def _tabs(quick):
+    import ui_library as u
+    count = 50 if quick else 500
+    editor = u.Editor("bench", None, 800, 600)
+    tabs = u.Tabs(0, 0, 800, 600, tab_data={f"tab {i}": [] for i in range(count)}, scrollable_tabs=True)
+    editor.add_layer(0, tabs)
+    replay = u.InputReplay()
+    for f in range(60):
+        replay.move(f, 10 + f * 12, 8)
+    replay.click(30, 200, 8)
+    for f in range(40, 60):
+        replay.scroll(f, -1)
+    return _frames(editor.run_headless, replay, 61)
+
+@scenario("scrollable_buttons")
+def _scrollable_buttons(quick):
+    import ui_library as u
+    count = 500 if quick else 5_000
+    editor = u.Editor("bench", None, 800, 600)
+    scrollable = u.Scrollable(0, 0, 800, 600, left_bound=0, top_bound=0)
+    for i in range(count):
+        scrollable.children.append(u.Button(10 + (i % 5) * 150, 10 + (i // 5) * 24, 140, 20, f"button {i}"))
+    editor.add_layer(0, scrollable)
+    replay = u.InputReplay()
+    for f in range(60):
+        replay.move(f, 20 + f * 10, 30 + f * 8)
+    for f in range(30, 60):
+        replay.scroll(f, -2)
+    return _frames(editor.run_headless, replay, 61)
+
+@scenario("construct_widgets")
+def _construct_widgets(quick):
+    import ui_library as u
+    count = 1_000 if quick else 10_000
+    def run():
+        widgets = [(u.Button(0, i * 20, 100, 20, f"file {i}"), u.Text(0, i * 20, 1, f"file {i}")) for i in range(count)]
+    return run
+
+@scenario("poly3d")
+def _poly3d(quick):
+    import ui_library as u
+    from shapely.geometry import Point
+    subdivisions = 8 if quick else 16
+    star = [
+        Point(300 + (100 if i % 2 else 40) * math.cos(i * math.pi / 8), 300 + (100 if i % 2 else 40) * math.sin(i * math.pi / 8))
+        for i in range(16)
+    ]
+    def run():
+        editor = u.Editor("bench", None, 800, 600)
+        sphere = u.Poly3D.sphere((0, 0, 0), 150, (200, 120, 80), subdivisions)
+        prism = u.Poly3D.extrude_polygon((0, 0, 100), u.Polygon(star), 80, (80, 120, 200), rotations=[(30, 20, 0)])
+        editor.add_layer(0, sphere, prism)
+        return editor.run_headless(frames=10)
+    return run
+
+@scenario("json_colors")
+def _json_colors(quick):
+    import ui_library as u
+    text = _json_text(200_000 if quick else 2_000_000)
+    return lambda: u.FileEditor.json_colors(None, text)
+
+@scenario("ds_colors")
+def _ds_colors(quick):
+    import ui_library as u
+    text = _ds_text(200_000 if quick else 2_000_000)
+    return lambda: u.FileEditor.ds_colors(None, text)
+
+@scenario("animations")
+def _animations(quick):
+    import ui_library as u
+    import pygame
+    count = 100 if quick else 1_000
+    frames = []
+    for i in range(8):
+        surface = pygame.Surface((16, 16))
+        surface.fill((i * 30, 80, 160))
+        frames.append(surface)
+    editor = u.Editor("bench", None, 800, 600)
+    for i in range(count):
+        editor.add_layer(0, u.Animation((i % 50) * 16, (i // 50) * 16, custom=frames, fps=60))
+    return _frames(editor.run_headless, None, 120)
+
+
+def _measure(name:str, quick:bool, repeat:int) -> dict:
+    _prepare()
+    setup = SCENARIOS[name]
+    times = []
+    frame_times = []
+    for i in range(1 if name == "import" else repeat):
+        run = setup(quick)
+        start = time.perf_counter()
+        out = run()
+        times.append(time.perf_counter() - start)
+        if isinstance(out, list):
+            frame_times += out
+
+    result = {"time": statistics.median(times)}
+    if frame_times:
+        result["frame_ms"] = statistics.median(frame_times) * 1000
+        result["frame_max_ms"] = max(frame_times) * 1000
+
+    if name != "import":
+        tracemalloc.start()
+        setup(quick)()
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+def _run_worker(name:str, quick:bool, repeat:int) -> dict:
+    args = [sys.executable, os.path.abspath(__file__), "--worker", name, "--repeat", str(repeat)]
+    if quick:
+        args.append("--quick")
+    proc = subprocess.run(args, capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def _change(new, old) -> str:
+    if not old: return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="ui_library benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit with 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before --check fails (0.15 = 15%%)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_measure(args.worker, args.quick, args.repeat)))
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    mode = "quick" if args.quick else "full"
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get(mode, {})
+
+    results = {}
+    regressions = []
+    print(f"{'scenario':<22}{'time':>12}{'frame':>12}{'peak':>12}{'vs baseline':>14}")
+    for name in names:
+        result = results[name] = _run_worker(name, args.quick, args.repeat)
+        if "error" in result:
+            print(f"{name:<22}  error: {result['error']}")
+            continue
+        old = baseline.get(name, {})
+        frame = f"{result['frame_ms']:.2f} ms" if "frame_ms" in result else ""
+        peak = f"{result['peak_kb'] / 1024:.1f} MB" if "peak_kb" in result else ""
+        print(f"{name:<22}{result['time'] * 1000:>9.1f} ms{frame:>12}{peak:>12}{_change(result['time'], old.get('time')):>14}")
+        if old.get("time") and result["time"] > old["time"] * (1 + args.threshold):
+            regressions.append(name)
+
+    if args.save_baseline:
+        data = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        data.setdefault(mode, {}).update({n: r for n, r in results.items() if "error" not in r})
+        with open(args.baseline, "w+", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        print(f"saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.check:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
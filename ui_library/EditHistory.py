@@ -0,0 +1,138 @@
+# pylint: disable=W,R,C,no-member
+
+from collections import deque
+
+class Edit:
+    """`removed` was replaced with `inserted` at (line, col)"""
+
+    __slots__ = [
+        "line", "col", "removed", "inserted"
+    ]
+
+    def __init__(self, line:int, col:int, removed:str, inserted:str):
+        self.line = line
+        self.col = col
+        self.removed = removed
+        self.inserted = inserted
+
+    def size(self) -> int:
+        return len(self.removed) + len(self.inserted)
+
+    def __repr__(self):
+        return f"Edit({self.line}, {self.col}, {self.removed!r} -> {self.inserted!r})"
+
+
+class EditHistory:
+    """
+    Undo/redo log of edits, used by `MultilineTextBox`.
+
+    Every step is a list of `Edit`s. Undoing a step replaces each edit's `inserted` text with its `removed`
+    text (last edit first) and redoing does the opposite, so both cost as much as the edit, not the document.
+    Consecutive single character inserts and deletes are merged into one step while `coalesce` is passed,
+    until `seal()` is called or the cursor jumps somewhere else.
+
+    The oldest steps are dropped once there are more than `max_steps` or they hold more than `max_chars`
+    characters of text.
+    """
+
+    __slots__ = [
+        "max_steps", "max_chars", "_undo", "_redo", "_chars", "_group", "_sealed"
+    ]
+
+    def __init__(self, max_steps:int=1000, max_chars:int=10_000_000):
+        self.max_steps = max_steps
+        self.max_chars = max_chars
+        self._undo: deque[list[Edit]] = deque()
+        self._redo: list[list[Edit]] = []
+        self._chars = 0
+        self._group: list[Edit]|None = None
+        self._sealed = True
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._chars = 0
+        self._group = None
+        self._sealed = True
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def seal(self):
+        """the next edit starts a new step"""
+        self._sealed = True
+
+    def begin(self):
+        """edits recorded until `end()` are undone as one step"""
+        self._group = []
+
+    def end(self):
+        group, self._group = self._group, None
+        if group:
+            self._redo.clear()
+            self._push(group)
+        self._sealed = True
+
+    def record(self, line:int, col:int, removed:str, inserted:str, coalesce:bool=False):
+        edit = Edit(line, col, removed, inserted)
+        if self._group is not None:
+            self._group.append(edit)
+            return
+        self._redo.clear()
+        if coalesce and not self._sealed and self._merge(edit):
+            self._trim()
+            return
+        self._push([edit])
+        self._sealed = not coalesce
+
+    def _merge(self, edit:Edit) -> bool:
+        step = self._undo[-1] if self._undo else None
+        if step is None or len(step) != 1 or "\n" in edit.removed or "\n" in edit.inserted:
+            return False
+        last = step[0]
+        if last.line != edit.line or "\n" in last.removed or "\n" in last.inserted:
+            return False
+        if not edit.removed and not last.removed and edit.col == last.col + len(last.inserted): # typing
+            last.inserted += edit.inserted
+        elif not edit.inserted and not last.inserted and edit.col + len(edit.removed) == last.col: # backspace
+            last.col = edit.col
+            last.removed = edit.removed + last.removed
+        elif not edit.inserted and not last.inserted and edit.col == last.col: # delete
+            last.removed += edit.removed
+        else:
+            return False
+        self._chars += edit.size()
+        return True
+
+    def _push(self, step:list[Edit]):
+        self._undo.append(step)
+        self._chars += sum(e.size() for e in step)
+        self._trim()
+
+    def _trim(self):
+        while len(self._undo) > 1 and (len(self._undo) > self.max_steps or self._chars > self.max_chars):
+            self._chars -= sum(e.size() for e in self._undo.popleft())
+
+    def undo(self) -> list[Edit]|None:
+        """the step to undo (apply its edits in reverse, `inserted` -> `removed`), or None"""
+        if not self._undo:
+            return None
+        step = self._undo.pop()
+        self._chars -= sum(e.size() for e in step)
+        self._redo.append(step)
+        self._sealed = True
+        return step
+
+    def redo(self) -> list[Edit]|None:
+        """the step to redo (apply its edits in order, `removed` -> `inserted`), or None"""
+        if not self._redo:
+            return None
+        step = self._redo.pop()
+        self._undo.append(step)
+        self._chars += sum(e.size() for e in step)
+        self._trim()
+        self._sealed = True
+        return step
@@ -0,0 +1,148 @@
+# pylint: disable=W,R,C,no-member
+
+from collections import deque
+import threading
+import tempfile
+import hashlib
+import shutil
+import os
+
+class FileSaver:
+    """
+    Writes files on a background thread so saving never blocks a frame.
+
+    Every save is written to a temporary file next to the target, fsynced and renamed over the target,
+    so a crash mid-save leaves either the old or the new file, never a truncated one. Unedited lazy chunks of
+    a `TextBuffer` are copied from the mapped file as they are, without being decoded. A save of a path
+    that is still queued replaces the queued one, and content whose hash matches what was last written
+    to (or `remember`ed for) that path isn't written again.
+
+    Completion callbacks, `callback(path, result)`, run on the thread that calls `poll()` (the UI thread).
+    `result` is True when the file was written, False when it was unchanged, or the exception that stopped the save.
+
+    Use `FileSaver.get()` for the process wide saver.
+    """
+
+    _shared: "FileSaver|None" = None
+
+    __slots__ = [
+        "_lock", "_pending", "_hashes", "_done", "_thread", "_active"
+    ]
+
+    @classmethod
+    def get(cls) -> "FileSaver":
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._pending: dict[str, tuple] = {} # path: (content, callbacks)
+        self._hashes: dict[str, bytes] = {}
+        self._done: deque[tuple] = deque() # (callbacks, path, result)
+        self._thread = None
+        self._active = 0
+
+    @staticmethod
+    def _pieces(content):
+        """the UTF-8 bytes of `content`"""
+        if isinstance(content, str):
+            yield content.encode("utf-8")
+        else:
+            yield from content.encoded()
+
+    def _hash(self, content) -> bytes:
+        digest = hashlib.blake2b()
+        for piece in self._pieces(content):
+            digest.update(piece)
+        return digest.digest()
+
+    def remember(self, path:str, content):
+        """records `content` as what `path` holds on disk, so saving it unchanged is skipped"""
+        digest = self._hash(content)
+        with self._lock: # the background thread reads and writes the hashes too
+            self._hashes[os.path.abspath(path)] = digest
+
+    def save(self, path:str, content, callback=None):
+        """
+        queues writing `content` (a str or a `TextBuffer` snapshot, which is only read on the background thread) to `path`.
+        `callback(path, result)` runs from `poll()` once it's done
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            callbacks = self._pending.pop(path, (None, []))[1]
+            if callback is not None:
+                callbacks.append(callback)
+            self._pending[path] = (content, callbacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="file saver", daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def busy(self) -> bool:
+        """True while saves are queued, being written or waiting for `poll()`"""
+        return bool(self._pending or self._active or self._done)
+
+    def poll(self) -> int:
+        """runs the callbacks of finished saves on the calling thread, returns how many saves finished"""
+        count = 0
+        while self._done:
+            callbacks, path, result = self._done.popleft()
+            for callback in callbacks:
+                callback(path, result)
+            count += 1
+        return count
+
+    def wait(self):
+        """blocks until every queued save is written (for shutting down), then runs `poll()`"""
+        with self._lock:
+            while self._pending or self._active:
+                self._lock.wait()
+        self.poll()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._lock.wait()
+                path = next(iter(self._pending))
+                content, callbacks = self._pending.pop(path)
+                self._active += 1
+            try:
+                result = self._write(path, content)
+            except Exception as e:
+                result = e
+            with self._lock:
+                self._done.append((callbacks, path, result))
+                self._active -= 1
+                self._lock.notify_all()
+
+    def _write(self, path:str, content) -> bool:
+        digest = self._hash(content)
+        with self._lock:
+            if self._hashes.get(path) == digest:
+                return False
+        folder, name = os.path.split(path)
+        fd, temp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for piece in self._pieces(content):
+                    f.write(piece)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, temp)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        if hasattr(os, "O_DIRECTORY"): # make the rename itself durable
+            dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        with self._lock:
+            self._hashes[path] = digest
+        return True
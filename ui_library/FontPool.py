@@ -0,0 +1,38 @@
+# pylint: disable=W,R,C,no-member
+
+from Options import FONT, TEXT_SIZE
+
+import pygame
+
+class FontPool:
+    """
+    Process wide registry of pygame fonts keyed by (path, size, bold, italic, underline).
+    Fonts are loaded the first time a key is asked for and shared by every widget after that.
+
+    Shared fonts must not be restyled in place (`set_bold`, `set_italic`, ...), ask the pool for the style instead.
+    """
+
+    _fonts: dict[tuple[str, int, bool, bool, bool], pygame.font.Font] = {}
+
+    @classmethod
+    def get(cls, path:str=FONT, size:int=TEXT_SIZE, bold:bool=False, italic:bool=False, underline:bool=False) -> pygame.font.Font:
+        key = (path, size, bold, italic, underline)
+        if (font := cls._fonts.get(key)) is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.Font(path, size)
+            font.set_bold(bold)
+            font.set_italic(italic)
+            font.set_underline(underline)
+            cls._fonts[key] = font
+        return font
+
+    @classmethod
+    def loaded(cls) -> int:
+        """how many distinct fonts have been loaded"""
+        return len(cls._fonts)
+
+    @classmethod
+    def clear(cls):
+        """drops the pool. fonts already held by widgets stay alive"""
+        cls._fonts.clear()
@@ -3,9 +3,12 @@
 from UIElement import UIElement
 from RenderPrimitives import Color, Image, Animation
 from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, \
-    FONT, SCROLL_MULTIPLIER
+    FONT, SCROLL_MULTIPLIER, GLYPH_ATLAS
 from EditorMimic import EditorMimic
 from Organizers import Draggable
+from SpatialIndex import SpatialIndex
+from GlyphAtlas import GlyphAtlas
+from FontPool import FontPool
 from enum import Enum, auto
 import pygame
 
@@ -14,7 +17,7 @@ class Button(UIElement):
     __slots__ = [
         "x", "y", "width", "height", "text", "bg_color", "hover_color", "click_color",
         "text_color", "lheld", "rheld", "hovered", "_hovered", "children", "_uoffx",
-        "_uoffy", "text_size", "font", "surface", "_override", "_mimic"
+        "_uoffy", "text_size", "font", "surface", "_override", "_mimic", "_drawn", "atlas"
     ]
 
     class _overrider:
@@ -27,7 +30,9 @@ class Button(UIElement):
             self._parent = parent
             self.screen = parent.surface
 
-    def __init__(self, x:int, y:int, width:int, height:int|None=None, text:str="", bg_color:Color|Image|tuple|int|None=TEXT_BG_COLOR, text_color:Color|tuple|int=TEXT_COLOR, text_size:int=TEXT_SIZE, hover_color:tuple|list|Color=TEXT_BG_COLOR, click_color:tuple|list|Color=TEXT_BG_COLOR):
+        def mark_dirty(self, rect=None): ... # the button marks its own area when its background changes
+
+    def __init__(self, x:int, y:int, width:int, height:int|None=None, text:str="", bg_color:Color|Image|tuple|int|None=TEXT_BG_COLOR, text_color:Color|tuple|int=TEXT_COLOR, text_size:int=TEXT_SIZE, hover_color:tuple|list|Color=TEXT_BG_COLOR, click_color:tuple|list|Color=TEXT_BG_COLOR, glyph_atlas:bool=GLYPH_ATLAS):
         self.x = x
         self.y = y
         self.width = width
@@ -46,9 +51,10 @@ class Button(UIElement):
         self._uoffy = 0
         #self.held = False
         self.text_size = text_size
-        self.font = pygame.font.Font(FONT, text_size)
+        self.font = FontPool.get(FONT, text_size)
+        self.atlas = GlyphAtlas.get(FONT, text_size) if glyph_atlas else None
         
-        r = self.font.render(self.text, True, tuple(self.text_color))
+        r = self._render_text()
         if self.width == -1:
             self.width = r.get_width()
         
@@ -67,6 +73,7 @@ class Button(UIElement):
         
         self._override = self._overrider(self)
         self._mimic = EditorMimic(None, self._override)
+        self._drawn = None
 
     def _event(self, editor, X, Y):
         for child in self.children[::-1]:
@@ -114,7 +121,15 @@ class Button(UIElement):
                 self.off_right_click(editor)
             self.rheld = False
 
-        
+        rect = (X+self.x, Y+self.y, self.width, self.height)
+        drawn = (rect, self.text, id(self.bg_color), id(self.text_color))
+        if drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(rect)
+            self._drawn = drawn
+        elif isinstance(self.bg_color, Animation):
+            editor.mark_dirty(rect)
 
         #self.update(editor, X, Y)
 
@@ -134,7 +149,7 @@ class Button(UIElement):
                 # self.surface.blit(self.bg_color.surface, (0, 0))
             else:
                 self.surface.fill(tuple(self.bg_color))
-        self.surface.blit(self.font.render(self.text, True, tuple(self.text_color)), (1, 1))
+        self.surface.blit(self._render_text(), (1, 1))
 
         self.pre_blit(editor, X, Y)
 
@@ -143,6 +158,19 @@ class Button(UIElement):
         for child in self.children:
             child._update(editor, X+self.x+self._uoffx, Y+self.y+self._uoffy)
     
+    def _render_text(self) -> pygame.Surface:
+        if self.atlas is not None:
+            return self.atlas.render(self.text, tuple(self.text_color))
+        return self.font.render(self.text, True, tuple(self.text_color))
+
+    def _hitbox(self):
+        if self.children or any(isinstance(c, Animation) for c in (self._bg_color, self.hover_color, self.click_color)):
+            return None
+        return (self.x, self.y, self.width, self.height)
+
+    def _pointer_idle(self):
+        return not (self.hovered or self.lheld or self.rheld)
+
     def pre_blit(self, editor, X, Y): ... # pylint: disable=unused-argument
     def on_left_click(self, editor): ... # pylint: disable=unused-argument
     def off_left_click(self, editor): ... # pylint: disable=unused-argument
@@ -227,7 +255,7 @@ class Tabs(UIElement):
         "text_color_selected", "content_bg_color",
         "tab_buffer", "tab_height", "tab_width",
         "scrollable_tabs", "tab_padding",
-        "_tabs_area", "_tab_objects"
+        "_tabs_area", "_tab_objects", "_drawn_tab"
     ]
 
     def __init__(self, x:int, y:int, width:int, height:int, tab_style:Style=Style.TOP, tab_data:dict[str, list]=..., **options):
@@ -256,6 +284,8 @@ class Tabs(UIElement):
         `scrollable_tabs`: bool (default is False)\n
         
         `tab_padding`: int how much space to put between tabs
+
+        `spatial_index`: bool (default is False) only send events to tabs under the mouse (scrollable tabs only)
         """
         if tab_data is ...: tab_data = {}
         self.x = x
@@ -291,9 +321,10 @@ class Tabs(UIElement):
         self.scrollable_tabs       : bool = options.get("scrollable_tabs", False)
         
         self.tab_padding           : int  = options.get("tab_padding", 0)
+        self._drawn_tab = None
         
         if self.scrollable_tabs:
-            self._tabs_area = Scrollable(self.x, self.y, 1, 1, self.tab_color_empty, left_bound=0, top_bound=0, scroll_speed=40)
+            self._tabs_area = Scrollable(self.x, self.y, 1, 1, self.tab_color_empty, left_bound=0, top_bound=0, scroll_speed=40, spatial_index=options.get("spatial_index", False))
         else:
             self._tab_objects = []
         self.load_tabs()
@@ -325,6 +356,8 @@ class Tabs(UIElement):
     def load_tabs(self):
         if self.scrollable_tabs:
             self._tabs_area.children.clear()
+            if self._tabs_area.spatial_index is not None:
+                self._tabs_area.spatial_index.invalidate()
         else:
             self._tab_objects.clear()
 
@@ -355,7 +388,7 @@ class Tabs(UIElement):
                     t.on_left_click(None)
                 
                 if self.scrollable_tabs:
-                    t.width = t.font.render(t.text, True, (0, 0, 0)).get_width()
+                    t.width = t.font.size(t.text)[0]
                     self._tabs_area.children.append(t)
                     x += t.width + 1 + self.tab_padding
                 else:
@@ -383,7 +416,7 @@ class Tabs(UIElement):
                 t.children = self.tab_children.get(name, list())
                 # print("CHILDREN: ", t.children)
                 if self.scrollable_tabs:
-                    t.width = t.font.render(t.text, True, (0, 0, 0)).get_width()
+                    t.width = t.font.size(t.text)[0]
                     self._tabs_area.children.append(t)
                     x += t.width + 1 + self.tab_padding
                 else:
@@ -411,7 +444,7 @@ class Tabs(UIElement):
                 t.children = self.tab_children.get(name, list())
                 # print("CHILDREN: ", t.children)
                 if self.scrollable_tabs:
-                    t.width = t.font.render(t.text, True, (0, 0, 0)).get_width()
+                    t.width = t.font.size(t.text)[0]
                     self._tabs_area.children.append(t)
                     y += t.width + 1 + self.tab_padding
                 else:
@@ -439,7 +472,7 @@ class Tabs(UIElement):
                 t.children = self.tab_children.get(name, list())
                 # print("CHILDREN: ", t.children)
                 if self.scrollable_tabs:
-                    t.width = t.font.render(t.text, True, (0, 0, 0)).get_width()
+                    t.width = t.font.size(t.text)[0]
                     self._tabs_area.children.append(t)
                     y += t.width + 1 + self.tab_padding
                 else:
@@ -468,7 +501,7 @@ class Tabs(UIElement):
                 t.children = self.tab_children.get(name, list())
                 # print("CHILDREN: ", t.children)
                 if self.scrollable_tabs:
-                    t.width = t.font.render(t.text, True, (0, 0, 0)).get_width()
+                    t.width = t.font.size(t.text)[0]
                     mw = max(t.width, mw)
                     self._tabs_area.children.append(t)
                     #self._tabs_area.right_bound = min(self._tabs_area.right_bound, -t.width)
@@ -570,6 +603,9 @@ class Tabs(UIElement):
             c._update(editor, X, Y)
 
     def _event(self, editor, X, Y):
+        if self.active_tab != self._drawn_tab:
+            self._drawn_tab = self.active_tab
+            editor.mark_dirty() # tab content can be placed anywhere, so redraw everything
         content = self.tab_data.get(self.active_tab, [])
         
         for c in content:
@@ -617,6 +653,8 @@ class Scrollable:
                 assert self.top_bound >= self.bottom_bound, "top bound must be larger than bottom bound (I know, it's wierd)"
             self.mouse_pos = [0, 0]
             self.screen = pygame.Surface((width, height), pygame.SRCALPHA, 32) # pylint: disable=no-member 
+            self._drawn = None
+            self.spatial_index = SpatialIndex() if options.get("spatial_index", False) else None
 
         def set_editor(self, editor):
             self.parent._editor = editor
@@ -624,6 +662,15 @@ class Scrollable:
             self.mouse_pos[0] -= self.x + self.offsetX
             self.mouse_pos[1] -= self.y + self.offsetY
 
+        def mark_dirty(self, rect=None):
+            editor = self.parent._fake_editor
+            if editor is None: return
+            area = pygame.Rect(self.x, self.y, self.width, self.height)
+            if rect is not None:
+                area = pygame.Rect(rect).move(self.x, self.y).clip(area)
+                if not area.width or not area.height: return
+            editor.mark_dirty(area)
+
         def collides(self, mouse, rect) -> bool:
             mx, my = mouse
             x, y, w, h = rect
@@ -647,7 +694,11 @@ class Scrollable:
                 else:
                     self.screen.fill(tuple(self.bg_color))
             #self.update(editor, self.offsetX, self.offsetY)
-            for child in self.children:
+            if self.spatial_index is not None:
+                children = self.spatial_index.visible(self.children, -self.offsetX, -self.offsetY, self.width, self.height)
+            else:
+                children = self.children
+            for child in children:
                 child._update(self.parent, self.offsetX, self.offsetY)
             editor.screen.blit(self.screen, (X+self.x, Y+self.y))
 
@@ -664,8 +715,11 @@ class Scrollable:
         def _event(self, editor, X, Y):
             _x, _y = editor.mouse_pos
             self.set_editor(editor)
-            for child in self.children[::-1]:
-                child._event(self.parent, 0, 0)
+            if self.spatial_index is not None:
+                self.spatial_index.dispatch(self.parent, self.children, 0, 0)
+            else:
+                for child in self.children[::-1]:
+                    child._event(self.parent, 0, 0)
 
             #print(f"Scrollable: {_y-self.y=} {_y-self.y==self.mouse_pos[1]=}")
 
@@ -695,6 +749,13 @@ class Scrollable:
                 self.offsetY = self.top_bound or 0
                 editor.cancel_mouse_event()
 
+            drawn = (self.x, self.y, self.width, self.height, self.offsetX, self.offsetY)
+            if drawn != self._drawn:
+                if self._drawn is not None:
+                    editor.mark_dirty(self._drawn[0:4])
+                editor.mark_dirty(drawn[0:4])
+                self._drawn = drawn
+
     def __init__(self, x, y, width, height, bg_color=TEXT_BG_COLOR, **options):
         super().__setattr__("_fake_editor", None)
         super().__setattr__("_scrollable", Scrollable._Scrollable(self, x, y, width, height, bg_color, **options))
@@ -784,6 +845,7 @@ class Collapsable:
 
             self.screen = pygame.Surface((self.width, self.height))
             self.mouse_pos = [0, 0]
+            self._drawn = None
 
             if self.split_type == Collapsable.SplitType.VERTICAL_LEFT:
                 self.main_area = Scrollable(0, 0, width - self.split_size, height, scroll_speed=self.scroll_speed)
@@ -847,6 +909,15 @@ class Collapsable:
             self.mouse_pos[0] -= self.x
             self.mouse_pos[1] -= self.y
 
+        def mark_dirty(self, rect=None):
+            editor = self.parent._fake_editor
+            if editor is None: return
+            area = pygame.Rect(self.x, self.y, self.width, self.height)
+            if rect is not None:
+                area = pygame.Rect(rect).move(self.x, self.y).clip(area)
+                if not area.width or not area.height: return
+            editor.mark_dirty(area)
+
         def collides(self, mouse, rect) -> bool:
             mx, my = mouse
             x, y, w, h = rect
@@ -958,6 +1029,13 @@ class Collapsable:
             self.split.x = min(max(-2, self.split.x), self.width-2)
             self.split.y = min(max(-2, self.split.y), self.height-2)
 
+            drawn = (self.x, self.y, self.width, self.height, self.split.x, self.split.y, self.split.hovered, self.split_visible)
+            if drawn != self._drawn:
+                if self._drawn is not None:
+                    editor.mark_dirty(self._drawn[0:4])
+                editor.mark_dirty(drawn[0:4])
+                self._drawn = drawn
+
         def _update(self, editor, X, Y):
             self.set_editor(editor)
             self.screen = pygame.Surface((self.width, self.height))
@@ -16,7 +16,7 @@ class Box(UIElement):
     
     __slots__ = [
         "x", "y", "width", "height",
-        "color", "children", "hovered"
+        "color", "children", "hovered", "_drawn"
     ]
 
     def __init__(self, x, y, width, height, color:Color|Image|tuple|int=TEXT_COLOR):
@@ -27,6 +27,7 @@ class Box(UIElement):
         self.color = Color.color(color)
         self.children = []
         self.hovered = False
+        self._drawn = None
 
     def _update(self, editor, X, Y):
         if isinstance(self.color, (Image, Animation)):
@@ -46,7 +47,15 @@ class Box(UIElement):
         for child in self.children[::-1]:
             child._event(editor, X + self.x, Y + self.y)
 
-        
+        drawn = (X+self.x, Y+self.y, self.width, self.height, id(self.color))
+        if drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0:4])
+            editor.mark_dirty(drawn[0:4])
+            self._drawn = drawn
+        elif isinstance(self.color, Animation):
+            editor.mark_dirty(drawn[0:4])
+
         if editor.collides((_x, _y), (X+self.x, Y+self.y, self.width, self.height)):
             if editor._hovering is None:
                 self.hovered = editor._hovered = True
@@ -54,6 +63,14 @@ class Box(UIElement):
         else:
             self.hovered = False
 
+    def _hitbox(self):
+        if self.children or isinstance(self.color, Animation):
+            return None
+        return (self.x, self.y, self.width, self.height)
+
+    def _pointer_idle(self):
+        return not self.hovered
+
 class Polygon(UIElement):
     closest_point_disp = Box(-1, -1, 3, 3, (200, 20, 20))
     second_closest_disp = Box(-1, -1, 3, 3, (200, 200, 20))
@@ -111,6 +128,7 @@ class Polygon(UIElement):
         self.point_displays = []
         self.refresh()
         self.children = []
+        self._drawn = None
 
     def refresh(self):
         self.poly = Poly(self.mesh)
@@ -309,6 +327,13 @@ class Polygon(UIElement):
                         self.mesh += new
                         self.refresh()
 
+        drawn = ((self.minX-3, self.minY-3, self.width+6, self.height+6), self.surface, len(self.point_displays))
+        if self._drawn is None or drawn[0] != self._drawn[0] or drawn[1] is not self._drawn[1] or drawn[2] or self._drawn[2]:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(drawn[0])
+            self._drawn = drawn
+
 class Poly3D(UIElement):
     FOV = 90 # degrees
     width = 1280
@@ -592,6 +617,7 @@ class Poly3D(UIElement):
         self.controllers = controllers or []
         self.data = data or {}
         self.texture_mapping = texture_mapping or []
+        self._drawn = None
 
 
     def mod_color(self, v1, v2, v3, color=None) -> tuple:
@@ -756,7 +782,20 @@ class Poly3D(UIElement):
     def _event(self, editor, X, Y):
         for c in self.controllers:
             c(self)
+        if self.controllers:
+            editor.request_frame()
         self.calc_render()
+
+        rects = [
+            pygame.Rect(X+x+(self.width/2)-self.cam_position[0], Y+y+(self.height/2)-self.cam_position[1], *surface.get_size())
+            for _, surface, x, y in self.surfaces
+        ]
+        drawn = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        if self.controllers or drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn)
+            editor.mark_dirty(drawn)
+            self._drawn = drawn
     
     def _update(self, editor, X, Y):
         for _, surface, x, y in self.surfaces:
@@ -0,0 +1,83 @@
+# pylint: disable=W,R,C,no-member
+
+from Options import FONT, TEXT_SIZE
+from FontPool import FontPool
+from TextMetrics import TextMetrics
+
+import pygame
+
+class GlyphAtlas:
+    """
+    Caches rendered glyph runs per (text, color) for a font and composes lines from them with a
+    single `Surface.blits` call, so the same characters aren't re-rasterized by FreeType every frame.
+
+    Text is cached per space separated run (a word or token, down to single glyphs) rather than per
+    character, one blit per character costs more than a FreeType render of the whole line in pygame.
+
+    Atlases are shared per (font path, size), use `GlyphAtlas.get()` to get one.
+    Text widgets opt in with `glyph_atlas=True` (or `"glyph_atlas": true` in editor_settings.json).
+    """
+
+    _atlases: dict[tuple[str, int], "GlyphAtlas"] = {}
+
+    RUN_LIMIT = 16384 # the cache is dropped when it grows past this many runs
+
+    __slots__ = [
+        "font", "runs", "metrics", "advance", "height"
+    ]
+
+    @classmethod
+    def get(cls, path:str=FONT, size:int=TEXT_SIZE) -> "GlyphAtlas":
+        key = (path, size)
+        if key not in cls._atlases:
+            cls._atlases[key] = cls(FontPool.get(path, size), TextMetrics.get(path, size))
+        return cls._atlases[key]
+
+    def __init__(self, font:pygame.font.Font, metrics:TextMetrics|None=None):
+        self.font = font
+        self.runs: dict[tuple[str, tuple], tuple[pygame.Surface, int]] = {}
+        self.metrics = metrics or TextMetrics(font)
+        self.height = self.metrics.height
+        self.advance = self.metrics.advance
+
+    def char_width(self, char:str) -> int:
+        return self.metrics.char_width(char)
+
+    def width(self, text:str) -> int:
+        return self.metrics.width(text)
+
+    def size(self, text:str) -> tuple[int, int]:
+        """(advance width, line height) of `text`"""
+        return self.metrics.width(text), self.height
+
+    def run(self, text:str, color:tuple) -> tuple[pygame.Surface, int]:
+        """the cached (surface, advance) of a run of text without spaces"""
+        key = (text, color)
+        if (run := self.runs.get(key)) is None:
+            if len(self.runs) >= self.RUN_LIMIT:
+                self.runs.clear()
+            run = self.runs[key] = (self.font.render(text, True, color), self.width(text))
+        return run
+
+    def draw(self, surface:pygame.Surface, segments:list[tuple[tuple, str]], x:int=0, y:int=0) -> int:
+        """blits `(color, text)` segments onto `surface` starting at (x, y). returns the x after the last character"""
+        blits = []
+        space = self.advance
+        runs = self.runs
+        for color, text in segments:
+            color = tuple(color)
+            for word in text.split(" "):
+                if word:
+                    run = runs.get((word, color)) or self.run(word, color)
+                    blits.append((run[0], (x, y)))
+                    x += run[1]
+                x += space
+            x -= space
+        surface.blits(blits, False)
+        return x
+
+    def render(self, text:str, color:tuple) -> pygame.Surface:
+        """same as `font.render(text, True, color)`"""
+        surface = pygame.Surface((max(1, self.width(text) + 1), self.height), pygame.SRCALPHA, 32)
+        self.draw(surface, [(color, text)])
+        return surface
@@ -0,0 +1,130 @@
+# pylint: disable=W,R,C,no-member
+
+from UIElement import UIElement
+from RenderPrimitives import Color
+from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, FONT
+from Util import visible_rows
+from TextMetrics import TextMetrics
+from FontPool import FontPool
+
+import pygame
+
+class Gutter(UIElement):
+    """
+    Line number column of `NumberedTextArea`. Only the numbers of the visible lines are drawn, from a cache of
+    rendered number strings, and nothing is re-laid out unless the line count changes.
+
+    With `wrap` (the `LineWrap` of the text box) numbers are drawn on the first row of every line. With `folds`
+    (the `LineFolds` of the text box) folded lines are skipped, the lines `foldable(line)` is true for get a marker
+    and clicking a number calls the `on_fold` function with its line.
+    """
+
+    NUMBER_LIMIT = 4096 # the cache is dropped when it grows past this many numbers
+
+    __slots__ = [
+        "x", "y", "min_width", "min_height", "text_color", "text_bg_color",
+        "font", "metrics", "digits", "line_count", "wrap", "folds", "foldable", "_on_fold", "_numbers",
+        "_line_height", "_text_width", "_text_height", "_version", "_drawn"
+    ]
+
+    def __init__(self, x:int, y:int, min_width:int=1, min_height:int=1, text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE, digits:int=9):
+        self.x = x
+        self.y = y
+        self.min_width = min_width
+        self.min_height = min_height
+        self.text_color = Color.color(text_color)
+        self.text_bg_color = Color.color(text_bg_color)
+        self.font = FontPool.get(FONT, text_size)
+        self.metrics = TextMetrics.get(FONT, text_size)
+        self.digits = digits # numbers are right aligned to this many characters
+        self._numbers: dict[int, pygame.Surface] = {}
+        self._line_height = self.metrics.height
+        self._version = 0
+        self._drawn = None
+        self.wrap = None
+        self.folds = None
+        self.foldable = None
+        self._on_fold = None
+        self.line_count = 0
+        self._text_width = self.min_width
+        self._text_height = self.min_height
+        self.set_line_count(1)
+
+    def set_line_count(self, count:int):
+        if count == self.line_count:
+            return
+        self.line_count = count
+        self._text_width = max(self.metrics.width(" " * max(self.digits, len(str(count)))) + 5, self.min_width)
+        self._text_height = max(count * self._line_height, self.min_height)
+        self._version += 1
+
+    def on_fold(self, function):
+        """`function(line)` is called when the number of `line` is clicked"""
+        self._on_fold = function
+        return function
+
+    def _rows(self) -> int:
+        rows = self.line_count if self.wrap is None else self.wrap.row_count(self.line_count)
+        return rows - self.folds.hidden_rows() if self.folds else rows
+
+    def _number(self, n:int) -> pygame.Surface:
+        if (s := self._numbers.get(n)) is None:
+            if len(self._numbers) >= self.NUMBER_LIMIT:
+                self._numbers.clear()
+            s = self._numbers[n] = self.font.render(str(n), True, tuple(self.text_color))
+        return s
+
+    def _event(self, editor, X, Y):
+        version = (self._version, self.wrap and self.wrap.version, self.folds and self.folds.version)
+        self._text_height = max(self._rows() * self._line_height, self.min_height)
+        rect = (X+self.x-1, Y+self.y-1, max(self._text_width, self.min_width)+2, max(self._text_height, self.min_height)+2)
+        if self._on_fold is not None and editor.left_mouse_down() and editor.collides(editor.mouse_pos, rect):
+            row = (editor.mouse_pos[1] - (Y+self.y)) // self._line_height
+            for _, line, _ in self._visible(row, row+1):
+                self._on_fold(line)
+        if self._drawn is None or rect != self._drawn[0] or version != self._drawn[1]:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(rect)
+            self._drawn = (rect, version)
+
+    def _update(self, editor, X, Y):
+        if self.text_bg_color:
+            editor.screen.fill(tuple(self.text_bg_color), (X+self.x-1, Y+self.y-1, self._text_width+2, self._text_height+2))
+
+        width = self.metrics.width
+        right = X + self.x + 1 + self.digits * self.metrics.advance
+        blits = []
+        first, last = visible_rows(editor.screen, Y+self.y, self._line_height, self._rows())
+        if self.wrap is None and not self.folds:
+            for l in range(first, last):
+                blits.append((self._number(l+1), (right - width(str(l+1)), Y+self.y+l*self._line_height)))
+        else:
+            for row, l, index in self._visible(first, last):
+                if not index:
+                    blits.append((self._number(l+1), (right - width(str(l+1)), Y+self.y+row*self._line_height)))
+        editor.screen.blits(blits, False)
+        if self.foldable is not None:
+            self._draw_markers(editor, X, Y, first, last)
+
+    def _visible(self, first:int, last:int):
+        """`(row, line, index of the row within the line)` of rows [first, last)"""
+        if self.folds is not None:
+            return self.folds.rows(first, last, self.line_count)
+        if self.wrap is not None:
+            return self.wrap.rows(first, last, self.line_count)
+        return ((l, l, 0) for l in range(first, min(last, self.line_count)))
+
+    def _draw_markers(self, editor, X, Y, first:int, last:int):
+        """a triangle pointing right at folded lines and down at lines that can be folded"""
+        h = self._line_height
+        s = max(2, h // 4)
+        color = tuple(self.text_color)
+        for row, l, index in self._visible(first, last):
+            if index:
+                continue
+            x, y = X + self.x + 2, Y + self.y + row * h + h // 2
+            if self.folds is not None and self.folds.folded(l) is not None:
+                pygame.draw.polygon(editor.screen, color, [(x, y - s), (x + s, y), (x, y + s)])
+            elif self.foldable(l):
+                pygame.draw.polygon(editor.screen, color, [(x - 1, y - s // 2), (x + s, y - s // 2), (x + s // 2, y + s // 2 + 1)])
@@ -0,0 +1,210 @@
+# pylint: disable=W,R,C,no-member
+
+from StyledText import to_ansi
+
+import re
+
+class Highlighter:
+    """
+    Incremental, line based syntax highlighting.
+
+    Subclasses implement `highlight_line(line, state) -> (runs, state)`, where `runs` are the line's sorted
+    `(start, end, color)` style runs (see StyledText.py) and `state` is whatever the lexer needs to
+    carry into the next line (an open `/*` comment for example), or `None`.
+
+    Every line caches its runs, the state it was highlighted from and the state it ends in. After an edit only the
+    edited lines are dropped, and highlighting walks forward from the first of them, re-tokenizing a line only
+    when it was edited or its start state changed. Once the states re-converge the cached lines are reused,
+    so the cost of an edit scales with the edit, not the file. Lines are highlighted lazily, up to the last
+    line that was asked for.
+    """
+
+    __slots__ = [
+        "_runs", "_starts", "_ends", "_valid"
+    ]
+
+    def __init__(self):
+        self.reset(0)
+
+    def highlight_line(self, line:str, state):
+        return [], None
+
+    def reset(self, count:int):
+        """forgets every cached line, the document now has `count` lines"""
+        self._runs: list[list|None] = [None] * count
+        self._starts: list = [None] * count
+        self._ends: list = [None] * count
+        self._valid = 0
+
+    def lines_changed(self, first:int, old:int, new:int):
+        """lines [first, first+old) were replaced by `new` lines"""
+        self._runs[first:first+old] = [None] * new
+        self._starts[first:first+old] = [None] * new
+        self._ends[first:first+old] = [None] * new
+        self._valid = min(self._valid, first)
+
+    def line(self, source, line:int) -> list[tuple]:
+        """runs of `line`. `source` is the document (anything with `line(i) -> str`, like a TextBuffer)"""
+        if line >= self._valid:
+            self._advance(source, line)
+        return self._runs[line]
+
+    def _advance(self, source, target:int):
+        i = self._valid
+        state = self._ends[i-1] if i else None
+        runs, starts, ends = self._runs, self._starts, self._ends
+        while i <= target:
+            if runs[i] is None or starts[i] != state:
+                runs[i], ends[i] = self.highlight_line(source.line(i), state)
+                starts[i] = state
+            state = ends[i]
+            i += 1
+        self._valid = i
+
+    def highlight(self, text:str) -> list[list[tuple]]:
+        """highlights a whole document, one list of runs per line"""
+        out = []
+        state = None
+        for line in text.split("\n"):
+            runs, state = self.highlight_line(line, state)
+            out.append(runs)
+        return out
+
+    def ansi(self, text:str) -> str:
+        """`text` with the highlighting as `\\033[38;2;R;G;Bm` escapes"""
+        return to_ansi(text.split("\n"), self.highlight(text))
+
+
+class JsonHighlighter(Highlighter):
+    __slots__ = []
+
+    KEY = (156, 220, 254)
+    STRING = (206, 145, 120)
+    ESCAPE = (215, 186, 125)
+    KEYWORD = (86, 156, 214)
+    NUMBER = (181, 206, 168)
+
+    _token = re.compile(r"(?P<key>\"(?:\\.|[^\"\\])*\":)|(?P<string>\"(?:\\.|[^\"\\])*\")|\d+(\.\d+)?|\b(true|false|null)\b")
+    _escape = re.compile(r"(\\.)")
+
+    def _string(self, runs:list, line:str, start:int, end:int, color:tuple):
+        pos = start
+        if line.find("\\", start, end) != -1:
+            for m in self._escape.finditer(line, start, end):
+                if m.start() > pos:
+                    runs.append((pos, m.start(), color))
+                runs.append((m.start(), m.end(), self.ESCAPE))
+                pos = m.end()
+        if pos < end:
+            runs.append((pos, end, color))
+
+    def highlight_line(self, line:str, state):
+        runs = []
+        for m in self._token.finditer(line):
+            start, end = m.span()
+            if m.group("key"):
+                self._string(runs, line, start, end - 1, self.KEY)
+            elif m.group("string"):
+                self._string(runs, line, start, end, self.STRING)
+            elif line[start].isdigit():
+                runs.append((start, end, self.NUMBER))
+            else:
+                runs.append((start, end, self.KEYWORD))
+        return runs, None
+
+
+class DsHighlighter(Highlighter):
+    """dungeon script. `/* */` comments can span lines"""
+    __slots__ = []
+
+    COMMENT = (106, 153, 85)
+    STRING = (206, 145, 120)
+    ESCAPE = (215, 186, 125)
+    NAMESPACE = (86, 156, 214)
+    PATH = (156, 220, 254)
+    NAME = (220, 220, 170)
+    TAG = (79, 193, 255)
+    CONTROL = (197, 134, 192)
+    KEYWORD = (86, 156, 214)
+    NUMBER = (181, 206, 168)
+    VARIABLES = {"#": (209, 105, 105), "%": (79, 193, 255), "$": (220, 220, 170)}
+    VARIABLE = (78, 201, 176)
+
+    _token = re.compile(r"(\/\*(?:\\.|\*[^/]|[^*])*\*\/|\/\/.*|(?P<open>\/\*.*)|(?:\"(?:\\.|[^\"\\])*\"|\'(?:\\.|[^\'\\])*\')|\[[^:]+:[^\]]+\]|<=|>=|<<|>>|==|!=|<[^>]+>|@[^:]+:|\$[a-zA-Z_0-9]+|\d+(?:\.\d+)?|\b(and|if|or|not|elif|else|not|return|break|pass|for|in)\b|#|%)")
+    _comment_end = re.compile(r"(?:\\.|\*[^/]|[^*])*\*\/")
+    _string_part = re.compile(r"(\\.|`[^`]*`)")
+    _reference = re.compile(r"\[([^:]+:)((?:[^/\]]+/)*)([^\]]+)\]")
+    _variable = re.compile(r"<([^>]+)>")
+    _variable_part = re.compile(r"([./])")
+    _tag = re.compile(r"(@[^:]*:|#|%|\$[a-zA-Z_][a-zA-Z0-9_]*)")
+    _control = re.compile(r"\b(if|elif|else|break|return|pass|for|in)\b")
+    _keyword = re.compile(r"\b(true|false|none|not|and|or)\b")
+    _number = re.compile(r"\d+(?:\.\d+)?")
+
+    def _parts(self, runs:list, pattern:re.Pattern, t:str, start:int, color:tuple|None, match_color:tuple|None):
+        """colors the matches of `pattern` in `t` (which starts at column `start`) with `match_color`, the rest with `color`"""
+        pos = 0
+        for m in pattern.finditer(t):
+            if m.start() > pos and color is not None:
+                runs.append((start + pos, start + m.start(), color))
+            if match_color is not None:
+                runs.append((start + m.start(), start + m.end(), match_color))
+            pos = m.end()
+        if pos < len(t) and color is not None:
+            runs.append((start + pos, start + len(t), color))
+
+    def _colored(self, runs:list, t:str, start:int):
+        end = start + len(t)
+        if t.startswith(("/*", "//")):
+            runs.append((start, end, self.COMMENT))
+        elif t[0] in "\"'":
+            self._parts(runs, self._string_part, t, start, self.STRING, self.ESCAPE)
+        elif m := self._reference.match(t):
+            for group, color in enumerate((self.NAMESPACE, self.PATH, self.NAME), 1):
+                if m.start(group) < m.end(group):
+                    runs.append((start + m.start(group), start + m.end(group), color))
+        elif m := self._variable.match(t):
+            v = m.groups()[0]
+            self._parts(runs, self._variable_part, v, start + 1, self.VARIABLES.get(v[0], self.VARIABLE), None)
+        elif self._tag.match(t):
+            runs.append((start, end, self.TAG))
+        elif self._control.match(t):
+            runs.append((start, end, self.CONTROL))
+        elif self._keyword.match(t):
+            runs.append((start, end, self.KEYWORD))
+        elif self._number.match(t):
+            runs.append((start, end, self.NUMBER))
+
+    def highlight_line(self, line:str, state):
+        runs = []
+        pos = 0
+        if state == "/*":
+            if not (m := self._comment_end.match(line)):
+                return ([(0, len(line), self.COMMENT)] if line else []), "/*"
+            runs.append((0, m.end(), self.COMMENT))
+            pos = m.end()
+        state = None
+        for m in self._token.finditer(line, pos):
+            if m.group("open"):
+                runs.append((m.start(), m.end(), self.COMMENT))
+                state = "/*"
+            else:
+                self._colored(runs, m.group(), m.start())
+        return runs, state
+
+
+class MarkdownHighlighter(Highlighter):
+    __slots__ = []
+
+    HEADING = (86, 156, 214)
+    BULLET = (103, 150, 230)
+
+    _heading = re.compile(r" *#{1,6}.*")
+    _bullet = re.compile(r" *(?:-(?!-)|\+|\*|\d+(?:\.|:))")
+
+    def highlight_line(self, line:str, state):
+        if self._heading.match(line):
+            return [(0, len(line), self.HEADING)], None
+        if m := self._bullet.match(line):
+            return [(0, m.end(), self.BULLET)], None
+        return [], None
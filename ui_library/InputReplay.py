@@ -0,0 +1,138 @@
+# pylint: disable=W,R,C,no-member
+
+import json
+import pygame
+
+class InputReplay:
+    """
+    A frame-indexed stream of mouse, keyboard and wheel input for `Editor.run_headless()`.
+
+    Build one with the helper methods (all take the frame the input happens on), load a
+    saved one with `InputReplay.load(path)`, or record a live session by setting
+    `editor.record_input = InputReplay()` before `editor.run()`.
+    """
+
+    __slots__ = [
+        "frame_time", "actions", "_pressed", "_pos"
+    ]
+
+    _KEYS = {"\n": pygame.K_RETURN, "\r": pygame.K_RETURN, "\t": pygame.K_TAB, "\b": pygame.K_BACKSPACE}
+
+    def __init__(self, actions:dict[int, list]|None=None, frame_time:float=1/60):
+        """
+        actions: {frame: [action, ...]} where an action is one of
+        ["move", x, y], ["down", button], ["up", button], ["scroll", x, y], ["key_down", key, unicode], ["key_up", key, unicode]
+        (buttons are 0 left, 1 middle, 2 right)
+
+        frame_time: seconds of virtual time per frame, used for key repeat
+        """
+        self.frame_time = frame_time
+        self.actions: dict[int, list] = {int(f): list(a) for f, a in (actions or {}).items()}
+        self._pressed = [False, False, False]
+        self._pos = (0, 0)
+
+    def length(self) -> int:
+        """number of frames needed to play every action"""
+        return max(self.actions, default=-1) + 1
+
+    def add(self, frame:int, *action):
+        if frame in self.actions:
+            self.actions[frame].append(list(action))
+        else:
+            self.actions[frame] = [list(action)]
+        return self
+
+    def move(self, frame:int, x:int, y:int):
+        return self.add(frame, "move", x, y)
+
+    def mouse_down(self, frame:int, button:int=0):
+        return self.add(frame, "down", button)
+
+    def mouse_up(self, frame:int, button:int=0):
+        return self.add(frame, "up", button)
+
+    def click(self, frame:int, x:int, y:int, button:int=0):
+        """moves to (x, y) and presses on `frame`, releases on the next frame"""
+        self.move(frame, x, y)
+        self.mouse_down(frame, button)
+        return self.mouse_up(frame + 1, button)
+
+    def drag(self, frame:int, start:tuple[int, int], end:tuple[int, int], frames:int=10, button:int=0):
+        """presses at `start`, moves to `end` over `frames` frames and releases"""
+        self.move(frame, *start)
+        self.mouse_down(frame, button)
+        for i in range(1, frames + 1):
+            self.move(frame + i, round(start[0] + (end[0] - start[0]) * i / frames), round(start[1] + (end[1] - start[1]) * i / frames))
+        return self.mouse_up(frame + frames + 1, button)
+
+    def scroll(self, frame:int, y:int, x:int=0):
+        return self.add(frame, "scroll", x, y)
+
+    def key_down(self, frame:int, key:int, unicode:str=""):
+        return self.add(frame, "key_down", key, unicode)
+
+    def key_up(self, frame:int, key:int, unicode:str=""):
+        return self.add(frame, "key_up", key, unicode)
+
+    def key(self, frame:int, key:int, unicode:str=""):
+        """presses a key on `frame` and releases it on the next frame"""
+        self.key_down(frame, key, unicode)
+        return self.key_up(frame + 1, key, unicode)
+
+    def type_text(self, frame:int, text:str, frames_per_key:int=2) -> int:
+        """types `text` one character every `frames_per_key` frames. returns the frame after the last key is released"""
+        for char in text:
+            key = self._KEYS.get(char, ord(char.lower()) if len(char) == 1 else 0)
+            self.key(frame, key, char)
+            frame += max(2, frames_per_key)
+        return frame
+
+    def reset(self):
+        self._pressed = [False, False, False]
+        self._pos = (0, 0)
+
+    def step(self, frame:int) -> tuple[list[bool], tuple[int, int], list[pygame.event.Event]]:
+        """applies the actions of `frame` and returns (mouse buttons, mouse position, events). frames must be stepped in order"""
+        events = []
+        for action in self.actions.get(frame, ()):
+            match action[0]:
+                case "move":
+                    self._pos = (action[1], action[2])
+                case "down":
+                    self._pressed[action[1]] = True
+                case "up":
+                    self._pressed[action[1]] = False
+                case "scroll":
+                    events.append(pygame.event.Event(pygame.MOUSEWHEEL, x=action[1], y=action[2], flipped=False))
+                case "key_down":
+                    events.append(pygame.event.Event(pygame.KEYDOWN, key=action[1], unicode=action[2], mod=0, scancode=0))
+                case "key_up":
+                    events.append(pygame.event.Event(pygame.KEYUP, key=action[1], unicode=action[2], mod=0, scancode=0))
+        return self._pressed.copy(), self._pos, events
+
+    def capture(self, frame:int, pressed:list[bool], pos:tuple[int, int], events:list):
+        """records one frame of live input (called by the editor when `record_input` is set)"""
+        if tuple(pos) != self._pos:
+            self._pos = tuple(pos)
+            self.move(frame, *pos)
+        for button, down in enumerate(pressed[0:3]):
+            if down != self._pressed[button]:
+                self._pressed[button] = down
+                self.add(frame, "down" if down else "up", button)
+        for event in events:
+            if event.type == pygame.MOUSEWHEEL:
+                self.scroll(frame, event.y, event.x)
+            elif event.type == pygame.KEYDOWN:
+                self.key_down(frame, event.key, event.unicode)
+            elif event.type == pygame.KEYUP:
+                self.key_up(frame, event.key, event.unicode)
+
+    def save(self, path:str):
+        with open(path, "w+", encoding="utf-8") as f:
+            json.dump({"frame_time": self.frame_time, "actions": self.actions}, f)
+
+    @classmethod
+    def load(cls, path:str) -> "InputReplay":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["actions"], data.get("frame_time", 1/60))
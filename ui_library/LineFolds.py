@@ -0,0 +1,450 @@
+# pylint: disable=W,R,C,no-member
+
+from LineWrap import LineWrap
+from TextBuffer import _Fenwick
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from operator import sub
+import re
+
+_STRINGS = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'')
+_BRACKETS = re.compile(r"[\[\]{}()]")
+_OPENERS = "[{("
+
+def _depths(text:str) -> tuple[int, int]:
+    """(lowest, final) bracket depth over `text` starting from 0, brackets inside quotes don't count"""
+    if _BRACKETS.search(text) is None:
+        return 0, 0
+    if "'" in text or '"' in text:
+        text = _STRINGS.sub("", text)
+    depth = low = 0
+    for m in _BRACKETS.finditer(text):
+        if m.group() in _OPENERS:
+            depth += 1
+        else:
+            depth -= 1
+            low = min(low, depth)
+    return low, depth
+
+def _indent(text:str) -> int|None:
+    """leading whitespace of `text`, None for a blank line"""
+    stripped = text.lstrip()
+    return len(text) - len(stripped) if stripped else None
+
+def fold_end(buffer, line:int, scan:int=4096) -> int|None:
+    """
+    the last line of the region `line` of `buffer` starts, None when it doesn't start one. a line that leaves a bracket
+    open starts a region up to the line that closes it (not included when it starts with the closing bracket),
+    otherwise a line followed by more indented lines starts a region over them. lines are read `scan` at a time,
+    and batches without brackets (or without a line indented less) are skipped as a whole
+    """
+    count = buffer.line_count()
+    text = buffer.line(line)
+    if (depth := _depths(text)[1]) > 0:
+        start = line + 1
+        while start < count:
+            batch = buffer.lines(start, min(start + scan, count))
+            if _BRACKETS.search("\n".join(batch)) is not None:
+                for i, t in enumerate(batch, start):
+                    low, final = _depths(t)
+                    if depth + low <= 0:
+                        end = i - 1 if t.lstrip()[0:1] in ("]", "}", ")") else i
+                        return end if end > line else None
+                    depth += final
+            start += scan
+    if (base := _indent(text)) is None:
+        return None
+    shallow = re.compile(rf"^[ \t]{{0,{base}}}[^ \t\n]", re.MULTILINE) # a line indented no deeper than `line`
+    end = None
+    start = line + 1
+    while start < count:
+        batch = buffer.lines(start, min(start + scan, count))
+        joined = "\n".join(batch)
+        m = shallow.search(joined)
+        stop = joined.count("\n", 0, m.start()) if m is not None else len(batch)
+        for i in range(stop - 1, -1, -1):
+            if batch[i].strip():
+                end = start + i
+                break
+        if m is not None:
+            return end
+        start += scan
+    return end
+
+def foldable(buffer, line:int, lookahead:int=64) -> bool:
+    """whether `line` likely starts a region (for drawing fold markers), `fold_end` finds out for sure"""
+    text = buffer.line(line)
+    # only the end of a long line is looked at, a minified file would otherwise be scanned every frame
+    if _depths(text[-1024:])[1] > 0:
+        return True
+    if (base := _indent(text)) is None:
+        return False
+    for t in buffer.lines(line + 1, min(line + 1 + lookahead, buffer.line_count())):
+        if (indent := _indent(t)) is not None:
+            return indent > base
+    return False
+
+
+class Fold:
+    """
+    lines `start`+1 to `end` folded under the line `start`, `inner` are the folds that were folded inside it.
+    edits don't move `inner` while the fold is folded, it's moved by how far `start` moved since when it's restored
+    """
+
+    __slots__ = [
+        "start", "end", "inner", "_origin"
+    ]
+
+    def __init__(self, start:int, end:int, inner:list["Fold"]|None=None):
+        self.start = start
+        self.end = end
+        self.inner = inner or []
+        self._origin = start # `start` when `inner` was last moved
+
+    def __repr__(self):
+        return f"Fold({self.start}, {self.end})"
+
+
+class LineFolds:
+    """
+    Folded regions of a text widget and the mapping between the rows of the text and the rows left visible.
+
+    Only the outermost folds are stored, sorted and disjoint, in blocks of at most `2 * BLOCK` folds. Like the chunks
+    of `TextBuffer`, three Fenwick trees over the blocks index their fold counts, their hidden rows and the line shifts
+    edits left for them, so folding, unfolding and editing change one block and update the trees in O(log n). A block
+    that outgrows its size or empties is re-split with its neighbours and the trees are rebuilt from the blocks.
+    The folds of a block are only moved by the edits before it when the block is read again, an edit never walks the
+    folds after it. Rows are lines, or the rows of `wrap` when the text is soft wrapped. Edits unfold the folds they touch.
+    """
+
+    BLOCK = 64
+
+    __slots__ = [
+        "wrap", "version", "_blocks", "_starts", "_ends", "_rows", "_base", "_counts", "_hidden", "_shifts", "_indexed"
+    ]
+
+    def __init__(self, wrap:LineWrap|None=None):
+        self.wrap = wrap
+        self.version = 0
+        self._indexed = self._key() # the wrap width `_rows` were counted at
+        self._set([])
+
+    def __len__(self):
+        return self._counts.prefix(len(self._blocks))
+
+    @property
+    def folds(self) -> list[Fold]:
+        """every stored fold, sorted"""
+        return self._slice(0, len(self))
+
+    def set_wrap(self, wrap:LineWrap|None):
+        self.wrap = wrap
+        self._indexed = None
+
+    def _key(self) -> int:
+        return self.wrap.width if self.wrap is not None else -1
+
+    def _size(self, fold:Fold) -> int:
+        """rows `fold` hides"""
+        if self.wrap is None:
+            return fold.end - fold.start
+        return self.wrap.row_of(fold.end + 1) - self.wrap.row_of(fold.start + 1)
+
+    def _top(self, start:int) -> int:
+        """first row hidden by a fold starting at `start`"""
+        return self.wrap.row_of(start + 1) if self.wrap is not None else start + 1
+
+    def _set(self, folds:list[Fold]):
+        size = self.BLOCK
+        self._blocks = [folds[i:i+size] for i in range(0, len(folds), size)]
+        self._starts = [[f.start for f in block] for block in self._blocks]
+        self._ends = [[f.end for f in block] for block in self._blocks]
+        self._rows = [list(map(self._size, block)) for block in self._blocks]
+        self._rebuild([0] * len(self._blocks))
+
+    def _rebuild(self, pending:list[int]):
+        """builds the trees from the blocks, `pending` are the shifts each block wasn't moved by yet"""
+        self._base = [0] * len(self._blocks)
+        self._counts = _Fenwick(list(map(len, self._blocks)))
+        self._hidden = _Fenwick(list(map(sum, self._rows)))
+        self._shifts = _Fenwick(list(map(sub, pending, [0, *pending[0:-1]])))
+
+    def _index(self):
+        """counts the hidden rows again after the wrap width changed"""
+        key = self._key()
+        if self._indexed == key:
+            return
+        self._indexed = key
+        for b in range(len(self._blocks)):
+            self._rows[b] = list(map(self._size, self._normalize(b)))
+        self._hidden = _Fenwick(list(map(sum, self._rows)))
+
+    def _normalize(self, b:int) -> list[Fold]:
+        """moves the folds of block `b` by the shifts the edits before it left, returns the block"""
+        if delta := self._shifts.prefix(b + 1) - self._base[b]:
+            self._base[b] += delta
+            for f in self._blocks[b]:
+                f.start += delta
+                f.end += delta
+            self._starts[b] = [s + delta for s in self._starts[b]]
+            self._ends[b] = [e + delta for e in self._ends[b]]
+        return self._blocks[b]
+
+    def _first(self, b:int) -> int:
+        """the start of the first fold of block `b`"""
+        return self._starts[b][0] + self._shifts.prefix(b + 1) - self._base[b]
+
+    def _find(self, line:int) -> tuple[int, int]:
+        """(block, index within it) of the last fold starting at or before `line`, (-1, -1) when there's none"""
+        lo, hi = 0, len(self._blocks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first(mid) <= line:
+                lo = mid + 1
+            else:
+                hi = mid
+        if not lo:
+            return -1, -1
+        self._normalize(lo - 1)
+        return lo - 1, bisect_right(self._starts[lo-1], line) - 1
+
+    def _find_visible(self, visible:int) -> tuple[int, int, int]:
+        """(block, index within it, hidden rows before it) of the last fold hidden at or before the visible row `visible`"""
+        lo, hi = 0, len(self._blocks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._top(self._first(mid)) - self._hidden.prefix(mid) <= visible:
+                lo = mid + 1
+            else:
+                hi = mid
+        if not lo:
+            return -1, -1, 0
+        b = lo - 1
+        self._normalize(b)
+        before = list(accumulate(self._rows[b], initial=self._hidden.prefix(b)))
+        starts = self._starts[b]
+        lo, hi = 1, len(starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._top(starts[mid]) - before[mid] <= visible:
+                lo = mid + 1
+            else:
+                hi = mid
+        return b, lo - 1, before[lo-1]
+
+    def _position(self, index:int) -> tuple[int, int]:
+        """(block, index within it) of the fold at `index`"""
+        b, before = self._counts.find(index)
+        return b, index - before
+
+    def _count_before(self, line:int) -> int:
+        """how many folds start before `line`"""
+        b, k = self._find(line - 1)
+        return self._counts.prefix(b) + k + 1 if b >= 0 else 0
+
+    def _slice(self, i:int, j:int) -> list[Fold]:
+        """the folds [i, j)"""
+        out = []
+        if i < j:
+            b, k = self._position(i)
+            while len(out) < j - i:
+                out += self._normalize(b)[k:k + j - i - len(out)]
+                b += 1
+                k = 0
+        return out
+
+    def fold(self, start:int, end:int) -> Fold|None:
+        """folds lines `start`+1 to `end` under `start`, folds inside the region are kept inside the new one"""
+        if end <= start or self.hidden(start) is not None:
+            return None
+        if (fold := self.folded(start)) is not None:
+            return fold
+        i = self._count_before(start)
+        j = self._count_before(end + 1)
+        fold = Fold(start, end, [f for f in self._slice(i, j) if f.end <= end])
+        self._splice(i, j, [fold])
+        return fold
+
+    def unfold(self, line:int) -> Fold|None:
+        """unfolds the fold under `line`, folds that were folded inside it stay folded"""
+        b, k = self._find(line)
+        if b < 0 or self._starts[b][k] != line:
+            return None
+        fold = self._blocks[b][k]
+        if delta := fold.start - fold._origin:
+            for f in fold.inner:
+                f.start += delta
+                f.end += delta
+        fold._origin = fold.start
+        index = self._counts.prefix(b) + k
+        self._splice(index, index + 1, fold.inner)
+        fold.inner = []
+        return fold
+
+    def _splice(self, i:int, j:int, folds:list[Fold]):
+        """replaces the folds [i, j) with `folds`"""
+        self.version += 1
+        blocks = self._blocks
+        if not blocks:
+            return self._set(folds)
+        rows = list(map(self._size, folds))
+        if i < len(self):
+            b1, k1 = self._position(i)
+        else:
+            b1 = len(blocks) - 1
+            k1 = len(blocks[b1])
+        b2, k2 = b1, k1
+        if j > i:
+            b2, k2 = self._position(j - 1)
+            k2 += 1
+        if b1 == b2:
+            block = self._normalize(b1)
+            removed = sum(self._rows[b1][k1:k2])
+            block[k1:k2] = folds
+            self._starts[b1][k1:k2] = [f.start for f in folds]
+            self._ends[b1][k1:k2] = [f.end for f in folds]
+            self._rows[b1][k1:k2] = rows
+            if 0 < len(block) <= 2 * self.BLOCK:
+                self._counts.add(b1, len(folds) - (k2 - k1))
+                self._hidden.add(b1, sum(rows) - removed)
+                return
+            merged, merged_rows = block, self._rows[b1]
+        else:
+            for b in range(b1, b2 + 1):
+                self._normalize(b)
+            merged = blocks[b1][0:k1] + folds + blocks[b2][k2:]
+            merged_rows = self._rows[b1][0:k1] + rows + self._rows[b2][k2:]
+        pending = [self._shifts.prefix(b + 1) - self._base[b] for b in range(len(blocks))]
+        size = self.BLOCK
+        pieces = [merged[k:k+size] for k in range(0, len(merged), size)]
+        blocks[b1:b2+1] = pieces
+        self._starts[b1:b2+1] = [[f.start for f in piece] for piece in pieces]
+        self._ends[b1:b2+1] = [[f.end for f in piece] for piece in pieces]
+        self._rows[b1:b2+1] = [merged_rows[k:k+size] for k in range(0, len(merged), size)]
+        pending[b1:b2+1] = [0] * len(pieces)
+        self._rebuild(pending)
+
+    def _move(self, index:int, delta:int):
+        """moves the folds from `index` on by `delta` lines, the blocks after the first one only in the shift tree"""
+        if index >= len(self):
+            return
+        b, k = self._position(index)
+        for f in self._normalize(b)[k:]:
+            f.start += delta
+            f.end += delta
+        self._starts[b][k:] = [s + delta for s in self._starts[b][k:]]
+        self._ends[b][k:] = [e + delta for e in self._ends[b][k:]]
+        if b + 1 < len(self._blocks):
+            self._shifts.add(b + 1, delta)
+        self.version += 1
+
+    def unfold_all(self):
+        if self._blocks:
+            self._set([])
+            self.version += 1
+
+    def folded(self, line:int) -> Fold|None:
+        """the fold under `line`"""
+        b, k = self._find(line)
+        return self._blocks[b][k] if b >= 0 and self._starts[b][k] == line else None
+
+    def hidden(self, line:int) -> Fold|None:
+        """the fold hiding `line`"""
+        b, k = self._find(line - 1)
+        return self._blocks[b][k] if b >= 0 and line <= self._ends[b][k] else None
+
+    def reveal(self, line:int) -> bool:
+        """unfolds every fold hiding `line`, returns whether any did"""
+        revealed = False
+        while (fold := self.hidden(line)) is not None:
+            self.unfold(fold.start)
+            revealed = True
+        return revealed
+
+    def visible_line(self, line:int, forward:bool=True) -> int:
+        """`line` if it's visible, otherwise the line after (or the header of) the fold hiding it"""
+        if (fold := self.hidden(line)) is None:
+            return line
+        return fold.end + 1 if forward else fold.start
+
+    def lines_changed(self, first:int, old:int, new:int):
+        """lines [first, first+old) were replaced by `new` lines. edits inside a fold unfold it, editing its header only keeps it"""
+        if not self._blocks:
+            return
+        b, k = self._find(first)
+        i = self._counts.prefix(b) + k + (self._ends[b][k] < first) if b >= 0 else 0 # folds before i end before the edit
+        j = self._count_before(first + old) # folds from j start after it
+        touched = self._slice(i, j)
+        kept = [f for f in touched if f.start == first and old == new == 1]
+        if len(kept) < len(touched):
+            self._splice(i, j, kept)
+        if new != old:
+            self._move(i + len(kept), new - old)
+
+    def rows_changed(self, line:int):
+        """`line` was wrapped again without an edit (it's measured when first drawn), the fold hiding it counts its rows again"""
+        if (fold := self.hidden(line)) is not None and self._indexed == self._key():
+            b, k = self._find(fold.start)
+            rows = self._size(fold)
+            self._hidden.add(b, rows - self._rows[b][k])
+            self._rows[b][k] = rows
+            self.version += 1
+
+    def hidden_rows(self) -> int:
+        self._index()
+        return self._hidden.prefix(len(self._blocks))
+
+    def visible_row(self, row:int) -> int:
+        """the visible row of `row`, hidden rows map to the last row of their fold's header"""
+        if not self._blocks:
+            return row
+        self._index()
+        line = self.wrap.position(row)[0] if self.wrap is not None else row
+        b, k = self._find(line - 1)
+        if b < 0:
+            return row
+        before = self._hidden.prefix(b) + sum(self._rows[b][0:k])
+        if line <= self._ends[b][k]:
+            return self._top(self._starts[b][k]) - before - 1
+        return row - before - self._rows[b][k]
+
+    def row(self, visible:int) -> int:
+        """the row shown as row `visible`"""
+        if not self._blocks:
+            return visible
+        self._index()
+        b, k, before = self._find_visible(visible)
+        return visible + before + self._rows[b][k] if b >= 0 else visible
+
+    def rows(self, first:int, last:int, line_count:int):
+        """yields `(visible row, line, index of the row within the line)` for the visible rows [first, last)"""
+        self._index()
+        wrap = self.wrap
+        blocks = self._blocks
+        b, k, offset = self._find_visible(first)
+        if b >= 0:
+            offset += self._rows[b][k] # hidden rows before `first`
+        else:
+            b = 0
+        k += 1 # the next fold
+        row = first
+        while row < last:
+            if b < len(blocks) and k >= len(blocks[b]):
+                b += 1
+                k = 0
+            end = last
+            if b < len(blocks):
+                self._normalize(b)
+                end = min(self._top(self._starts[b][k]) - offset, last)
+            # visible rows [row, end) are contiguous rows of the text
+            if wrap is None:
+                for line in range(row + offset, min(end + offset, line_count)):
+                    yield line - offset, line, 0
+            else:
+                for r, line, index in wrap.rows(row + offset, end + offset, line_count):
+                    yield r - offset, line, index
+            row = end
+            if b < len(blocks):
+                offset += self._rows[b][k]
+                k += 1
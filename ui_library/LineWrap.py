@@ -0,0 +1,198 @@
+# pylint: disable=W,R,C,no-member
+
+from TextMetrics import TextMetrics
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+class LineWrap:
+    """
+    Soft wrap layout of a text widget: which visual rows every logical line takes at `width` pixels.
+
+    Only the lines wider than `width` are stored (sorted line numbers, with the start columns of their
+    rows after the first), every other line is one row. Mapping between lines and rows is a bisect over
+    the wrapped lines, and edits only re-break the edited lines and shift the line numbers after them.
+
+    Rows break after the last space that fits (which may hang past the edge), or at the edge when a
+    row has no space. `version` changes whenever the layout does.
+    """
+
+    __slots__ = [
+        "metrics", "width", "version", "_lines", "_breaks", "_before", "_starts"
+    ]
+
+    def __init__(self, metrics:TextMetrics, width:int):
+        self.metrics = metrics
+        self.width = width
+        self.version = 0
+        self._lines: list[int] = []
+        self._breaks: list[list[int]] = []
+        self._before: list[int]|None = [0] # extra rows before each wrapped line, and in total
+        self._starts: list[int]|None = [] # first row of each wrapped line
+
+    def breaks_of(self, text:str) -> list[int]:
+        """start columns of the rows after the first one of `text`, empty when it fits in one row"""
+        metrics = self.metrics
+        if (len(text) <= max(1, self.width // metrics.advance)) if metrics.monospace and text.isascii() else (metrics.width(text) <= self.width):
+            return []
+        return list(self._breaks_from(text, 0))
+
+    def _breaks_from(self, text:str, pos:int):
+        """yields the start columns of the rows after the one starting at `pos`"""
+        metrics = self.metrics
+        width = self.width
+        length = len(text)
+        fixed = metrics.monospace and text.isascii()
+        per_row = max(1, width // metrics.advance)
+        char_width = metrics.char_width
+        while True:
+            if fixed:
+                end = pos + per_row
+            else:
+                end, x = pos, 0
+                while end < length and x + (w := char_width(text[end])) <= width:
+                    x += w
+                    end += 1
+                end = max(end, pos + 1)
+            if end >= length:
+                return
+            if (space := text.rfind(" ", pos, end + 1)) > pos:
+                end = space + 1
+            yield end
+            pos = end
+
+    def _changed(self):
+        self._before = self._starts = None
+        self.version += 1
+
+    def _index(self):
+        if self._before is None:
+            self._before = [0, *accumulate(map(len, self._breaks))]
+            self._starts = [line + before for line, before in zip(self._lines, self._before)]
+
+    def set_lines(self, lines:list[tuple[int, str]]):
+        """wraps exactly these sorted `(line, text)`, the lines wider than `width`"""
+        self._lines = []
+        self._breaks = []
+        for line, text in lines:
+            if breaks := self.breaks_of(text):
+                self._lines.append(line)
+                self._breaks.append(breaks)
+        self._changed()
+
+    def set_line(self, line:int, text:str):
+        """re-wraps one line"""
+        i = bisect_left(self._lines, line)
+        breaks = self.breaks_of(text)
+        if i < len(self._lines) and self._lines[i] == line:
+            if breaks:
+                self._breaks[i] = breaks
+            else:
+                del self._lines[i], self._breaks[i]
+        elif breaks:
+            self._lines.insert(i, line)
+            self._breaks.insert(i, breaks)
+        else:
+            return
+        self._changed()
+
+    def line_edited(self, line:int, text:str, col:int, delta:int):
+        """
+        re-wraps `line` (now `text`) after `delta` characters were inserted (or removed when negative) at `col`.
+        rows are re-broken from the one before the edit until a break lines up with an old one, the rest are shifted
+        """
+        i = bisect_left(self._lines, line)
+        if i == len(self._lines) or self._lines[i] != line:
+            return self.set_line(line, text)
+        old = self._breaks[i]
+        k = max(bisect_right(old, col) - 1, 0) # rows before the one before the edit can't reach it
+        out = old[0:k]
+        edited = col + max(delta, 0)
+        for b in self._breaks_from(text, out[-1] if out else 0):
+            if b >= edited:
+                j = bisect_left(old, b - delta)
+                if j < len(old) and old[j] == b - delta:
+                    out.append(b)
+                    out += [x + delta for x in old[j+1:]] if delta else old[j+1:]
+                    break
+            out.append(b)
+        if not out:
+            del self._lines[i], self._breaks[i]
+        elif out == old:
+            return
+        else:
+            self._breaks[i] = out
+        self._changed()
+
+    def lines_changed(self, first:int, old:int, new:int, lines:list[tuple[int, str]]):
+        """lines [first, first+old) were replaced by `new` lines, of which `lines` are the `(line, text)` that may need wrapping"""
+        i = bisect_left(self._lines, first)
+        j = bisect_left(self._lines, first + old)
+        if i == j and not lines and old == new:
+            return
+        wrapped = []
+        breaks = []
+        for line, text in lines:
+            if b := self.breaks_of(text):
+                wrapped.append(line)
+                breaks.append(b)
+        after = self._lines[j:]
+        if new != old:
+            after = [line + new - old for line in after]
+        self._lines[i:] = wrapped + after
+        self._breaks[i:j] = breaks
+        self._changed()
+
+    def breaks(self, line:int) -> list[int]:
+        """start columns of the rows after the first one of `line`"""
+        i = bisect_left(self._lines, line)
+        if i < len(self._lines) and self._lines[i] == line:
+            return self._breaks[i]
+        return []
+
+    def wrapped(self) -> list[int]:
+        """the lines that take more than one row"""
+        return list(self._lines)
+
+    def span(self, line:int, index:int, length:int) -> tuple[int, int]:
+        """[start, end) columns of row `index` of `line`, a line of `length` characters"""
+        breaks = self.breaks(line)
+        return (breaks[index-1] if index else 0), (breaks[index] if index < len(breaks) else length)
+
+    def row_count(self, line_count:int) -> int:
+        self._index()
+        return line_count + self._before[-1]
+
+    def row_of(self, line:int, col:int=0) -> int:
+        """the row showing column `col` of `line`"""
+        self._index()
+        i = bisect_left(self._lines, line)
+        row = line + self._before[i]
+        if col and i < len(self._lines) and self._lines[i] == line:
+            row += bisect_right(self._breaks[i], col)
+        return row
+
+    def position(self, row:int) -> tuple[int, int]:
+        """(line, index of the row within the line) of `row`"""
+        self._index()
+        j = bisect_right(self._starts, row) - 1
+        if j >= 0 and row <= self._starts[j] + len(self._breaks[j]):
+            return self._lines[j], row - self._starts[j]
+        return row - self._before[j+1], 0
+
+    def rows(self, first:int, last:int, line_count:int):
+        """yields `(row, line, index within the line)` for rows [first, last)"""
+        line, index = self.position(first)
+        lines, breaks = self._lines, self._breaks
+        k = bisect_left(lines, line)
+        for row in range(first, last):
+            if line >= line_count:
+                return
+            yield row, line, index
+            count = len(breaks[k]) + 1 if k < len(lines) and lines[k] == line else 1
+            index += 1
+            if index >= count:
+                line += 1
+                index = 0
+                if k < len(lines) and lines[k] < line:
+                    k += 1
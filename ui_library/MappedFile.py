@@ -0,0 +1,106 @@
+# pylint: disable=W,R,C,no-member
+
+from TextBuffer import LazyChunk
+
+from collections import deque
+import threading
+import mmap
+import time
+
+class MappedFile:
+    """
+    Memory maps a UTF-8 file and splits it into `LazyChunk`s of about `BLOCK` bytes on a background
+    thread. Chunks end right after a newline, their line and character counts are all a `TextBuffer`
+    needs to index them, the text itself is only decoded when a line of the chunk is shown.
+
+    `take()` hands over the chunks found since the last call, `done` is set once the whole file is indexed
+    (read it before calling `take()` to know whether that was the last batch).
+    """
+
+    BLOCK = 65536
+
+    __slots__ = [
+        "path", "size", "map", "done", "_pending", "_position", "_thread", "_closed"
+    ]
+
+    def __init__(self, path:str):
+        self.path = path
+        with open(path, "rb") as f: # the map keeps its own handle of the file
+            self.size = f.seek(0, 2)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.done = False
+        self._pending: deque[LazyChunk] = deque()
+        self._position = 0
+        self._thread = None
+        self._closed = False
+
+    def index(self, count:int|None=1) -> list[LazyChunk]:
+        """
+        indexes up to `count` chunks (None for the rest of the file) on the calling thread and returns every
+        pending chunk. used for the first screen, and to finish early after stopping the background thread
+        """
+        while count is None or count > 0:
+            if not self._next():
+                break
+            if count is not None:
+                count -= 1
+        return self.take()
+
+    def start(self):
+        """indexes the rest of the file on a background thread"""
+        if self._thread is None and not self.done:
+            self._thread = threading.Thread(target=self._run, name=f"index {self.path}", daemon=True)
+            self._thread.start()
+
+    def take(self) -> list[LazyChunk]:
+        out = []
+        pending = self._pending
+        while pending:
+            out.append(pending.popleft())
+        return out
+
+    def _run(self):
+        while not self._closed and self._next():
+            time.sleep(0) # let the UI thread have the GIL between blocks
+
+    def _next(self) -> bool:
+        start = self._position
+        if start >= self.size:
+            if not self.done:
+                if not self.size:
+                    self._pending.append(LazyChunk(self.map, 0, 0, 1, 1))
+                self.done = True
+            return False
+        end = start + self.BLOCK
+        if end < self.size:
+            end = self.map.find(b"\n", end)
+            end = self.size if end == -1 else end + 1
+        else:
+            end = self.size
+        data = self.map[start:end]
+        if data.isascii():
+            chars = len(data) - data.count(b"\r\n")
+        else:
+            chars = len(str(data, "utf-8", "replace").replace("\r\n", "\n"))
+        lines = data.count(b"\n")
+        if end == self.size:
+            lines += 1
+            chars += 1
+        self._pending.append(LazyChunk(self.map, start, end, lines, chars))
+        self._position = end
+        if end == self.size:
+            self.done = True
+        return end < self.size
+
+    def stop(self):
+        """stops the background thread, `index()` can finish the file afterwards"""
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """closes the map. the buffer must not hold chunks of it anymore (see `TextBuffer.materialize()`)"""
+        self.stop()
+        if self.size:
+            self.map.close()
@@ -0,0 +1,219 @@
+# pylint: disable=W,R,C,no-member
+
+from UIElement import UIElement
+from RenderPrimitives import Color
+from Options import TEXT_BG_COLOR
+from StyledText import to_segments, slice_runs
+
+import pygame
+import re
+
+_WORD = re.compile(r"\S+")
+
+class Minimap(UIElement):
+    """
+    Scaled down view of the whole text of a `MultilineTextBox` in its highlighting colors, every line
+    `LINE_HEIGHT` pixels high and every character a pixel wide, with the part shown by the text box as a
+    rectangle that can be dragged (or clicked to jump to). Texts taller than the minimap scroll along with the view.
+
+    Every line is cached as the pixel spans of its words, built from the same style runs the text box draws,
+    and lines are drawn onto tiles of `TILE_LINES` lines the first time the tile is shown, at most `KEPT` tiles
+    stay rendered. The text box calls `lines_changed` on edits, which only drops the edited lines and the tiles
+    showing them (every tile after them too when lines were added or removed), so a frame never costs more than
+    the lines on the minimap.
+    """
+
+    LINE_HEIGHT = 2
+    TILE_LINES = 128
+    KEPT = 24
+
+    __slots__ = [
+        "x", "y", "width", "height", "box", "bg_color", "view_color", "top", "view",
+        "_spans", "_runs", "_tiles", "_on_scroll", "_grab", "_view_surface", "_version", "_checked", "_drawn"
+    ]
+
+    def __init__(self, x:int, y:int, width:int, height:int, box, bg_color:Color|tuple|int=TEXT_BG_COLOR, view_color:Color|tuple|int=Color(255, 255, 255, 32)):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.box = box # the MultilineTextBox shown
+        self.bg_color = Color.color(bg_color)
+        self.view_color = Color.color(view_color)
+        self.top = 0 # first line on the minimap
+        self.view = (0, 1) # (first line, line count) shown by the text box
+        self._spans: list[list|None] = [] # per line (x, width, color) of its words, None until drawn
+        self._runs: list[list|None] = [] # the style runs `_spans` were built from
+        self._tiles: dict[int, pygame.Surface] = {}
+        self._on_scroll = None
+        self._grab = None # pixels between the top of the view rectangle and the mouse while it's dragged
+        self._view_surface = None
+        self._version = 0
+        self._checked = None # (top, version) the runs were last re-read at
+        self._drawn = None
+        self.reset(box.buffer.line_count())
+        box.minimap = self
+
+    def on_scroll(self, function):
+        """`function(line)` is called with the line to show at the top of the text box when the view is dragged"""
+        self._on_scroll = function
+        return function
+
+    def set_view(self, first:int, count:int):
+        """the text box shows `count` lines from `first`"""
+        self.view = (first, max(1, count))
+
+    def reset(self, count:int):
+        """forgets every cached line, the text now has `count` lines"""
+        self._spans = [None] * count
+        self._runs = [None] * count
+        self._tiles.clear()
+        self._version += 1
+
+    def lines_changed(self, first:int, old:int, new:int):
+        """lines [first, first+old) were replaced by `new` lines"""
+        self._spans[first:first+old] = [None] * new
+        self._runs[first:first+old] = [None] * new
+        # tiles after the edit only show other lines when lines were added or removed
+        self._drop(first, first + old if old == new else None)
+
+    def _drop(self, first:int, last:int|None):
+        """drops the tiles showing lines [first, last), or every line from `first` on"""
+        size = self.TILE_LINES
+        for i in [i for i in self._tiles if (i + 1) * size > first and (last is None or i * size < last)]:
+            del self._tiles[i]
+        self._version += 1
+
+    def _rows(self) -> int:
+        """lines the minimap has room for"""
+        return max(1, self.height // self.LINE_HEIGHT)
+
+    def _scale(self, count:int) -> float:
+        """pixels the view rectangle moves per line the view does"""
+        rows = self._rows()
+        first, shown = self.view
+        if count <= rows or rows <= shown:
+            return self.LINE_HEIGHT
+        return self.LINE_HEIGHT * (rows - shown) / (count - shown)
+
+    def _top(self, count:int) -> int:
+        """the first line on the minimap, the minimap scrolls as much further through the text as the view did"""
+        rows = self._rows()
+        first, shown = self.view
+        if count <= rows or rows <= shown:
+            return 0
+        return max(0, min(count - rows, round(first * (count - rows) / (count - shown))))
+
+    def _line_runs(self, line:int) -> list[tuple]:
+        box = self.box
+        return box.highlighter.line(box.buffer, line) if box.highlighter is not None else box._line_runs(line)
+
+    def _line(self, line:int, text:str) -> list[tuple[int, int, tuple]]:
+        """(x, width, color) of the words of `line` (which is `text`), characters past the width of the minimap are left out"""
+        if (spans := self._spans[line]) is None:
+            runs = self._runs[line] = self._line_runs(line)
+            text = text[0:self.width]
+            spans = []
+            x = 0
+            for color, segment in to_segments(text, slice_runs(runs, 0, len(text)), tuple(self.box.text_color)):
+                if " " not in segment and "\t" not in segment:
+                    if segment:
+                        spans.append((x, len(segment), color))
+                else:
+                    for m in _WORD.finditer(segment):
+                        spans.append((x + m.start(), m.end() - m.start(), color))
+                x += len(segment)
+            self._spans[line] = spans
+        return spans
+
+    def _refresh(self, first:int, last:int):
+        """re-reads the style runs of the drawn lines in [first, last), an edit can change the highlighting of lines after it"""
+        spans = self._spans
+        runs = self._runs
+        for l in range(first, last):
+            if spans[l] is not None and (line := self._line_runs(l)) is not runs[l]:
+                if line != runs[l]:
+                    spans[l] = None
+                    self._drop(l, l + 1)
+                runs[l] = line
+
+    def _render(self, index:int) -> pygame.Surface:
+        h = self.LINE_HEIGHT
+        first = index * self.TILE_LINES
+        last = min(first + self.TILE_LINES, len(self._spans))
+        surface = pygame.Surface((self.width, self.TILE_LINES * h), pygame.SRCALPHA)
+        fill = surface.fill
+        for l, text in enumerate(self.box.buffer.lines(first, last), first):
+            y = (l - first) * h
+            for x, width, color in self._line(l, text):
+                fill(color, (x, y, width, h - 1 or 1))
+        return surface
+
+    def _event(self, editor, X, Y):
+        count = self.box.buffer.line_count()
+        self.top = self._top(count)
+        if self._checked != (self.top, self._version):
+            # runs only change after an edit
+            self._refresh(self.top, min(count, self.top + self._rows()))
+            self._checked = (self.top, self._version)
+        h = self.LINE_HEIGHT
+        rect = (X+self.x, Y+self.y, self.width, self.height)
+        scale = self._scale(count)
+        first, shown = self.view
+        if self._grab is None and editor.left_mouse_down() and editor.collides(editor.mouse_pos, rect):
+            y = editor.mouse_pos[1] - rect[1]
+            top = (first - self.top) * h
+            if not top <= y < top + shown * h:
+                # clicking outside the view rectangle centers the view on the line clicked
+                first = max(0, min(count - 1, self.top + y // h - shown // 2))
+                if self._on_scroll is not None:
+                    self._on_scroll(first)
+                top = first * scale
+            self._grab = y - top
+        elif self._grab is not None:
+            if not editor.mouse[0]:
+                self._grab = None
+            elif self._on_scroll is not None:
+                # the rectangle is drawn at (first - top) * LINE_HEIGHT, which is first * scale
+                line = max(0, min(count - 1, round((editor.mouse_pos[1] - rect[1] - self._grab) / scale)))
+                if line != first:
+                    self._on_scroll(line)
+        version = (rect, self._version, self.top, self.view)
+        if self._drawn is None or version != self._drawn[1]:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(rect)
+            self._drawn = (rect, version)
+
+    def _update(self, editor, X, Y):
+        X += self.x
+        Y += self.y
+        if self.bg_color:
+            editor.screen.fill(tuple(self.bg_color), (X, Y, self.width, self.height))
+        h = self.LINE_HEIGHT
+        size = self.TILE_LINES
+        top = self.top
+        last = min(len(self._spans), top + self._rows())
+        tiles = self._tiles
+        blits = []
+        for i in range(top // size, (last - 1) // size + 1):
+            if (tile := tiles.get(i)) is None:
+                tile = tiles[i] = self._render(i)
+            # only the part of the tile on the minimap
+            start = max(0, top - i * size)
+            end = min(size, last - i * size)
+            blits.append((tile, (X, Y + (i * size + start - top) * h), (0, start * h, self.width, (end - start) * h)))
+        if len(tiles) > self.KEPT:
+            shown = range(top // size, (last - 1) // size + 1)
+            for i in [i for i in tiles if i not in shown][0:len(tiles) - self.KEPT]:
+                del tiles[i]
+        editor.screen.blits(blits, False)
+
+        first, count = self.view
+        y = max(0, (first - top) * h)
+        height = min(self.height, (first + count - top) * h) - y
+        if height > 0 and self.view_color:
+            if self._view_surface is None or self._view_surface.get_size() != (self.width, height):
+                self._view_surface = pygame.Surface((self.width, height), pygame.SRCALPHA)
+                self._view_surface.fill(tuple(self.view_color))
+            editor.screen.blit(self._view_surface, (X, Y + y))
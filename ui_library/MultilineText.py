@@ -2,21 +2,27 @@
 
 from UIElement import UIElement
 from RenderPrimitives import Color
-from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, FONT
+from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, FONT, GLYPH_ATLAS, TILE_WIDTH
+from Util import visible_rows
+from StyledText import from_ansi, to_segments, slice_runs
+from LineWrap import LineWrap
+from TiledLine import TiledLine
+from GlyphAtlas import GlyphAtlas
+from FontPool import FontPool
+from TextMetrics import TextMetrics
 
 import pygame
-import re
 
 class MultilineText(UIElement):
     
     __slots__ = [
         "x", "y", "min_width", "min_height", "content",
-        "colored_content", "text_color", "text_bg_color",
-        "font", "surfaces", "_text_width", "_text_height",
-        "surface"
+        "text_color", "text_bg_color", "font", "surfaces",
+        "_lines", "_runs", "_line_height", "_version",
+        "_text_width", "_text_height", "_drawn", "atlas", "metrics", "wrap"
     ]
     
-    def __init__(self, x:int, y:int, min_width:int=1, min_height:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size=TEXT_SIZE):
+    def __init__(self, x:int, y:int, min_width:int=1, min_height:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size=TEXT_SIZE, glyph_atlas:bool=GLYPH_ATLAS, wrap:bool=False):
         assert min_width >= 1, "Min width must be 1 or more"
         assert min_height >= 1, "Min height must be 1 or more"
         self.x = x
@@ -24,12 +30,18 @@ class MultilineText(UIElement):
         self.min_width = min_width
         self.min_height = min_height
         self.content = content
-        self.colored_content = content
         self.text_color = Color.color(text_color)
         self.text_bg_color = Color.color(text_bg_color)
-        self.font = pygame.font.Font(FONT, text_size)
-        self.surfaces = []
-        self.surface = None
+        self.font = FontPool.get(FONT, text_size)
+        self.atlas = GlyphAtlas.get(FONT, text_size) if glyph_atlas else None
+        self.metrics = TextMetrics.get(FONT, text_size)
+        self.surfaces: list[pygame.Surface|TiledLine|list|None] = [] # per line, None until the line is drawn
+        self._lines: list[str] = content.split("\n")
+        self._runs: list[list[tuple]] = [[] for _ in self._lines] # (start, end, color) style runs per line
+        self._line_height = self.metrics.height
+        self._version = 0
+        self._drawn = None
+        self.wrap = LineWrap(self.metrics, min_width - 2) if wrap else None
 
         self._text_width = self.min_width
         self._text_height = self.min_height
@@ -41,86 +53,92 @@ class MultilineText(UIElement):
         #     self.surfaces.append(s)
 
     def get_lines(self):
-        return self.content.split("\n")
+        return list(self._lines)
+
+    def get_runs(self) -> list[list[tuple]]:
+        return self._runs
 
     def _refresh_surfaces(self):
-        # self.surfaces.clear()
         self._text_width = 0
-        self._text_height = 0
-        sl = []
-        for line in self.get_lines():
-            s = self.font.render(line or " ", True, (0, 0, 0))
-            a, b = s.get_size()
-            s = pygame.Surface([a+5, b], pygame.SRCALPHA) # pylint: disable=no-member
-            # s.fill(tuple(self.text_bg_color))
-            sl.append(s)
-            self._text_width = max(self._text_width, s.get_width(), self.min_width)
-            self._text_height += s.get_height()
-        self._text_height = max(self._text_height, self.min_height)
-        
-        # self.surface = pygame.Surface((self._text_width, self._text_height), pygame.SRCALPHA, 32)
-        
-        self.surfaces = sl
+        for line in self._lines:
+            self._text_width = max(self._text_width, self.text_size_of(line or " ")[0] + 5)
+        self._text_width = max(self._text_width, self.min_width)
+        rows = len(self._lines)
+        if self.wrap is not None:
+            # lines wider than min_width are wrapped onto several rows
+            self.wrap.width = self.min_width - 2
+            width = self.metrics.width
+            self.wrap.set_lines([(i, line) for i, line in enumerate(self._lines) if width(line) > self.wrap.width])
+            self._text_width = self.min_width
+            rows = self.wrap.row_count(rows)
+        self._text_height = max(rows * self._line_height, self.min_height)
+        self.surfaces = [None] * len(self._lines)
+
+    def set_wrap(self, wrap:bool):
+        """soft wraps lines wider than `min_width` onto several rows, re-wrapping when `min_width` changes"""
+        self.wrap = LineWrap(self.metrics, self.min_width - 2) if wrap else None
+        self.refresh_surfaces()
+
+    def text_size_of(self, text:str) -> tuple[int, int]:
+        """(width, height) of `text` without rendering it"""
+        return self.metrics.size(text)
+
+    def set_styled_content(self, content:str, runs:list[list[tuple]]):
+        """sets the content with one list of sorted `(start, end, color)` runs per line (see StyledText.py)"""
+        self.content = content
+        self._lines = content.split("\n")
+        self._runs = runs
+        self.refresh_surfaces()
 
     def set_colored_content(self, text:str):
-        self.content = re.sub(r"\033\[(\d+;?)*m", "", text)
-        self.colored_content = text
+        """sets the content from text colored with `\\033[38;2;R;G;Bm` escapes"""
+        lines, runs = from_ansi(text)
+        self.content = "\n".join(lines)
+        self._lines = lines
+        self._runs = runs
         self.refresh_surfaces()
 
-    def color_text(self, text:str) -> str:
-        return self.colored_content #re.sub(r"(#.*)", "\033[38;2;106;153;85m\\1\033[0m", text)
-
-    def format_text(self, text:str, default_color:Color|list|tuple) -> list[tuple[Color|list|tuple, str]]:
-
-        col = default_color
-
-        raw = re.split("(\033\\[(?:\\d+;?)+m|\n)", self.color_text(text))
-        data = []
-        curr_line = []
-
-        for r in raw:
-            # print(f"{r!r}")
-            if m := re.match(r"\033\[38;2;(?P<R>\d+);(?P<G>\d+);(?P<B>\d+)m", r):
-                # print("is color")
-                d = m.groupdict()
-                col = (int(d["R"]), int(d["G"]), int(d["B"]))
-            elif r == "\033[0m":
-                # print("is color reset")
-                col = default_color
-            elif r == "\n":
-                data.append(curr_line)
-                curr_line = []
-            else:
-                curr_line.append((col, r))
-        
-        if curr_line:
-            data.append(curr_line)
-                
-
-        return data #[[(default_color, l)] for l in text.split("\n")]
+    def format_text(self, text:str, default_color:Color|list|tuple) -> list[list[tuple[Color|list|tuple, str]]]:
+        """`(color, text)` segments per line of ANSI colored `text`"""
+        lines, runs = from_ansi(text)
+        return [to_segments(line, r, default_color) for line, r in zip(lines, runs)]
 
     def refresh_surfaces(self):
+        """re-measures every line, lines are rendered when they are drawn"""
         self._refresh_surfaces()
-        data = self.format_text(self.content, self.text_color)
-
-        surf = pygame.Surface((self._text_width, self._text_height), pygame.SRCALPHA, 32) # pylint: disable=no-member
-        # print(s.get_size())
-        h = 0
-        for line, surface in zip(data, self.surfaces):
-            x = 1
-            for col, segment in line:
-
-                s = self.font.render(segment, True, tuple(col))
-                surface.blit(s, (x, 0))
-                x += s.get_width()
-                
-            surf.blit(surface, (0, h))
-            h += surface.get_height()
-        
-        self.surface = surf
+        self._version += 1
+
+    def _render_line(self, line:int) -> pygame.Surface|TiledLine:
+        text = self._lines[line]
+        runs = self._runs[line] if line < len(self._runs) else []
+        a = self.text_size_of(text or " ")[0]
+        if a+5 > TILE_WIDTH:
+            return TiledLine(text, runs, self.text_color, a+5, self.metrics, self.font, self.atlas)
+        return self._draw_segments(to_segments(text, runs, self.text_color), a+5)
+
+    def _render_row(self, line:int, index:int) -> pygame.Surface:
+        """row `index` of a wrapped line"""
+        text = self._lines[line]
+        start, end = self.wrap.span(line, index, len(text))
+        segments = to_segments(text[start:end], slice_runs(self._runs[line], start, end) if line < len(self._runs) else [], self.text_color)
+        return self._draw_segments(segments, self.text_size_of(text[start:end])[0]+5)
+
+    def _draw_segments(self, segments:list[tuple], width:int) -> pygame.Surface:
+        surface = pygame.Surface([width, self._line_height], pygame.SRCALPHA) # pylint: disable=no-member
+        if self.atlas is not None:
+            self.atlas.draw(surface, segments, 1, 0)
+            return surface
+        x = 1
+        for col, segment in segments:
+            s = self.font.render(segment, True, tuple(col))
+            surface.blit(s, (x, 0))
+            x += s.get_width()
+        return surface
 
     def set_content(self, content:str=""):
         self.content = content
+        self._lines = content.split("\n")
+        self._runs = [[] for _ in self._lines]
 
         self.refresh_surfaces()
         # self.surfaces.clear()
@@ -128,24 +146,44 @@ class MultilineText(UIElement):
         #     s = self.font.render(line, True, tuple(self.text_color))
         #     self.surfaces.append(s)
 
-    def _event(self, *_):
-        pass
+    def _event(self, editor, X, Y):
+        if self.wrap is not None and self.wrap.width != self.min_width - 2:
+            self.refresh_surfaces()
+        rect = (X+self.x-1, Y+self.y-1, max(self._text_width, self.min_width)+2, max(self._text_height, self.min_height)+2)
+        if self._drawn is None or rect != self._drawn[0] or self._version != self._drawn[1]:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(rect)
+            self._drawn = (rect, self._version)
 
     def _update(self, editor, X, Y):
-        w = self.min_width
-        h = 0
-        for s in self.surfaces:
-            s:pygame.Surface
-            w = max(w, s.get_width())
-            h += s.get_height()
-        h = max(self.min_height, h)
-
         if self.text_bg_color:
-            editor.screen.fill(tuple(self.text_bg_color), (X+self.x-1, Y+self.y-1, w+2, h+2))
-
-        if self.surface:
-            editor.screen.blit(self.surface, (X+self.x, Y+self.y))
-        # h = 0
-        # for s in self.surfaces:
-        #     editor.screen.blit(s, (X+self.x, Y+self.y+h))
-        #     h += s.get_height()
+            editor.screen.fill(tuple(self.text_bg_color), (X+self.x-1, Y+self.y-1, self._text_width+2, self._text_height+2))
+
+        surfaces = self.surfaces
+        blits = []
+        clip = editor.screen.get_clip()
+        if (wrap := self.wrap) is None:
+            first, last = visible_rows(editor.screen, Y+self.y, self._line_height, len(surfaces))
+            for l in range(first, last):
+                if (s := surfaces[l]) is None:
+                    s = surfaces[l] = self._render_line(l)
+                if s.__class__ is TiledLine:
+                    blits += s.blits(X+self.x, Y+self.y+l*self._line_height, clip.left, clip.right)
+                else:
+                    blits.append((s, (X+self.x, Y+self.y+l*self._line_height)))
+        else:
+            # a wrapped line keeps a list with a surface per row
+            first, last = visible_rows(editor.screen, Y+self.y, self._line_height, wrap.row_count(len(surfaces)))
+            for row, l, index in wrap.rows(first, last, len(surfaces)):
+                if (s := surfaces[l]) is None:
+                    s = surfaces[l] = [None] * (len(breaks) + 1) if (breaks := wrap.breaks(l)) else self._render_line(l)
+                if s.__class__ is list:
+                    if (r := s[index]) is None:
+                        r = s[index] = self._render_row(l, index)
+                    s = r
+                elif s.__class__ is TiledLine:
+                    blits += s.blits(X+self.x, Y+self.y+row*self._line_height, clip.left, clip.right)
+                    continue
+                blits.append((s, (X+self.x, Y+self.y+row*self._line_height)))
+        editor.screen.blits(blits, False)
@@ -3,11 +3,24 @@
 from UIElement import UIElement
 from RenderPrimitives import Color, Image, Animation
 from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, \
-    FONT, CURSOR_BLINK_TIME, PATH, CURSOR_COLOR
-from Util import Cursor, Selection, expand_text_lists
+    FONT, CURSOR_BLINK_TIME, PATH, CURSOR_COLOR, GLYPH_ATLAS, UNDO_STEPS, UNDO_MEMORY, TILE_WIDTH
+from Util import Cursor, Selection, visible_rows
+from TextBuffer import TextBuffer
+from EditHistory import EditHistory
+from TextSearch import TextSearch
+from LineWrap import LineWrap
+from LineFolds import LineFolds, Fold, fold_end, foldable
+from TiledLine import TiledLine
+from Highlighter import Highlighter
+from StyledText import from_ansi, to_segments, slice_runs
+from GlyphAtlas import GlyphAtlas
+from FontPool import FontPool
+from TextMetrics import TextMetrics
 
 import pygame
 import re
+from bisect import bisect_left, bisect_right
+from itertools import compress
 import time
 import pyperclip
 
@@ -15,7 +28,7 @@ class MultilineTextBox(UIElement):
 
     _focused = None
 
-    def __init__(self, x:int, y:int, min_width:int=1, min_height:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|Image|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE, cursor_color:Color|tuple|int=CURSOR_COLOR, single_line:bool=False):
+    def __init__(self, x:int, y:int, min_width:int=1, min_height:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|Image|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE, cursor_color:Color|tuple|int=CURSOR_COLOR, single_line:bool=False, glyph_atlas:bool=GLYPH_ATLAS, wrap:bool=False):
         self.x = x
         self.y = y
         self.min_width = min_width
@@ -23,11 +36,14 @@ class MultilineTextBox(UIElement):
         self._text_width = 0
         self._text_height = 0
         self.single_line = single_line
-        self._lines = [[*line] for line in content.split("\n")]
+        self.buffer = TextBuffer(content)
         self.text_color = Color.color(text_color)
         self.text_bg_color = Color.color(text_bg_color)
         self.text_size = text_size
-        self.font = pygame.font.Font(FONT, text_size)
+        self.font = FontPool.get(FONT, text_size)
+        self.atlas = GlyphAtlas.get(FONT, text_size) if glyph_atlas else None
+        self.metrics = TextMetrics.get(FONT, text_size)
+        self._width, self._height = self.metrics.advance, self.metrics.height
         self.cursor_location = Cursor(0, 0)
         self._blink = CURSOR_BLINK_TIME
         self._cursor_tick = 0
@@ -35,52 +51,62 @@ class MultilineTextBox(UIElement):
         self._cursor_color = Color.color(cursor_color)
         self._cursor_surface = pygame.Surface((1, text_size+2))
         self._cursor_surface.fill(tuple(self._cursor_color))
-        self.surfaces = []
+        self.surfaces: list[pygame.Surface|TiledLine|list|None] = [] # per line, None until the line is drawn
+        self._runs: list[list|None] = [] # per line (start, end, color) style runs, None until known
+        self._line_widths: list[int] = []
+        self._dirty_lines: tuple[int, int]|None = None # [first, last) lines edited since the last refresh
+        self.highlighter: Highlighter|None = None
+        self.search: TextSearch|None = None
+        self.wrap: LineWrap|None = None
+        self.folds = LineFolds()
+        self.minimap = None # a Minimap showing this box, told about every edit
         self.focused = False
         self.hovered = False
         self._text_selection_start = None
         self._text_selection_end = None
-        self._highlight_offset = [0, 0]
         self._highlight = pygame.image.load(f"{PATH}/highlight.png")#pygame.Surface((1, 1), pygame.SRCALPHA, 24) # pylint: disable=no-member
-        self.highlights = []
+        self._highlight_sizes: dict[int, pygame.Surface] = {} # self._highlight scaled to a width, one line high
+        self._selection_spans: dict[int, tuple] = {} # line: ((start, end), spans) of the selected part of lines drawn so far
         self._save = self._default_save_event
+        self._save_snapshot = False
         self._on_enter = self._default_on_enter_event
         
         self.char_whitelist: list[str] = None
         self.char_blacklist: list[str] = None
+        self._drawn = None
+        self.history = EditHistory(UNDO_STEPS, UNDO_MEMORY)
 
         self.set_content(content)
-
-        self._history: list = []
-        self._future: list = []
+        self.set_wrap(wrap)
 
         self._history_triggers = " \n:.,/;'\"[]{}-=_+<>?|\\~`!@#$%^&*()"
 
-        self._width, self._height = self.font.render("_", True, (0, 0, 0)).get_size()
-
     def save_history(self):
-        content = self.get_content()
-        if self._history:
-            if self._history[0] != content:
-                self._history.insert(0, content)
-                self._future.clear()
-        else:
-            self._history.insert(0, content)
-            self._future.clear()
+        """ends the current undo step, the next edit starts a new one"""
+        self.history.seal()
 
     def undo(self):
-        if len(self._history) > 1:
-            self.set_content(p := self._history.pop(0))
-            self._future.insert(0, p)
-        elif len(self._history) == 1:
-            self.set_content(self._history[0])
+        if (step := self.history.undo()) is None:
+            return
+        for edit in reversed(step):
+            end = TextBuffer.end_of(edit.line, edit.col, edit.inserted)
+            self.cursor_location = Cursor(*self._replace((edit.line, edit.col), end, edit.removed, False))
+        self._after_history()
 
     def redo(self):
-        if self._future:
-            self.set_content(p := self._future.pop(0))
-            self._history.insert(0, p)
-
-    def on_save(self, function):
+        if (step := self.history.redo()) is None:
+            return
+        for edit in step:
+            end = TextBuffer.end_of(edit.line, edit.col, edit.removed)
+            self.cursor_location = Cursor(*self._replace((edit.line, edit.col), end, edit.inserted, False))
+        self._after_history()
+
+    def _after_history(self):
+        self._text_selection_start = self._text_selection_end = None
+        self._refresh_dirty()
+        self._drawn = None
+
+    def on_save(self, function=None, snapshot:bool=False):
         """Decorator for a function
         
         This function is called whenever the text box detects the CTRL+S keybind
@@ -90,8 +116,14 @@ class MultilineTextBox(UIElement):
             content (str): the entire text content of the text box
             selection (Selection | None): a Selection object containing the text box's selected text, and it's start and end text indices
             cursorPos (Cursor): the text box's current cursor position
+
+        with `snapshot=True` (`@box.on_save(snapshot=True)`), content is a `TextBuffer.snapshot()` instead of a str,
+        which doesn't join the whole document on the UI thread
         """
+        if function is None:
+            return lambda function: self.on_save(function, snapshot)
         self._save = function
+        self._save_snapshot = snapshot
         return function
 
     def on_enter(self, function):
@@ -105,201 +137,628 @@ class MultilineTextBox(UIElement):
         pass
 
     def refresh_highlight(self):
-        self.highlights.clear()
-        if (s := self._text_selection_start) and (e := self._text_selection_end):
-            ll = min(s.line, e.line)
-            gl = max(s.line, e.line)
-            if gl == ll:
-                lc = min(s.col, e.col)
-                gc = max(s.col, e.col)
-            elif s.line < e.line:
-                lc = s.col
-                gc = e.col
-            else:
-                lc = e.col
-                gc = s.col
-            
-
-            letter = self.font.render("_", True, (0, 0, 0)) # This is not shown on screen, only used to get width
-            w = letter.get_width()# - 1
-            h = letter.get_height()
-
-            if ll == gl:
-                line = self.get_lines()[ll]
-                pre = len(line[0:lc]) * w
-                self._highlight_offset = [pre, (ll * h)]
-                self.highlights.append(pygame.transform.scale(self._highlight, ((gc-lc)*w, h)))
+        """
+        the selection is drawn straight from its range, only for the lines on screen. this drops the cached
+        highlights of lines outside of it, lines whose selected part didn't change keep theirs
+        """
+        if (selection := self._selection_range()) is None:
+            self._selection_spans.clear()
+            return
+        (ll, _), (gl, _) = selection
+        spans = self._selection_spans
+        for line in [l for l in spans if not ll <= l <= gl]:
+            del spans[line]
+
+    def _selection_range(self) -> tuple[tuple[int, int], tuple[int, int]]|None:
+        if (s := self._text_selection_start) and (e := self._text_selection_end) and s != e:
+            s, e = min(s, e), max(s, e)
+            return (s.line, s.col), (e.line, e.col)
+        return None
 
-            else:
-                lines = self.get_lines()
-                line = lines[ll]
-                pre = len(line[0:lc]) * w
-                self._highlight_offset = [pre, (ll * h) + 2]
-                self.highlights.append(pygame.transform.scale(self._highlight, ((len(line[lc:])+1)*w, h)))
-                for l in range(ll+1, gl):
-                    line = lines[l]
-                    self.highlights.append(pygame.transform.scale(self._highlight, ((len(line)+1)*w, h)))
-                
-                line = lines[gl]
-                self.highlights.append(pygame.transform.scale(self._highlight, (len(line[0:gc])*w, h)))
+    def _selected_spans(self, line:int, start:int, end:int|None) -> list[tuple[int, int, int]]:
+        """(row, x, width) highlights of columns [start, end) of `line`, with the newline when `end` is None"""
+        key = (start, end)
+        if (cached := self._selection_spans.get(line)) is not None and cached[0] == key:
+            return cached[1]
+        text = self.buffer.line(line)
+        spans = self._spans(line, start, len(text) if end is None else end, text)
+        if end is None:
+            row, x, width = spans[-1]
+            spans[-1] = (row, x, width + self._width)
+        if len(self._selection_spans) >= 4096:
+            self._selection_spans.clear()
+        self._selection_spans[line] = (key, spans)
+        return spans
+
+    def _spans(self, line:int, start:int, end:int, text:str) -> list[tuple[int, int, int]]:
+        """(row, x, width) of columns [start, end) of `line` (whose text is `text`) on every row they cover"""
+        width = self.metrics.width
+        if self.wrap is None or not (breaks := self.wrap.breaks(line)):
+            return [(self.row_of(line), width(text[0:start]), width(text[start:end]))]
+        row = self.row_of(line)
+        i = bisect_right(breaks, start)
+        out = []
+        while True:
+            s = breaks[i-1] if i else 0
+            e = breaks[i] if i < len(breaks) else len(text)
+            a, b = max(start, s), min(end, e)
+            out.append((row + i, width(text[s:a]), width(text[a:b])))
+            if end <= e or i == len(breaks):
+                return out
+            i += 1
+
+    def _highlight_of(self, width:int) -> pygame.Surface:
+        if (s := self._highlight_sizes.get(width)) is None:
+            if len(self._highlight_sizes) >= 256:
+                self._highlight_sizes.clear()
+            s = self._highlight_sizes[width] = pygame.transform.scale(self._highlight, (width, self._height))
+        return s
+
+    def select(self, start:tuple[int, int], end:tuple[int, int]):
+        """selects the text between two (line, col) positions and puts the cursor at `end`"""
+        def clamp(line, col):
+            line = max(0, min(line, self.buffer.line_count()-1))
+            return Cursor(line, max(0, min(col, self.buffer.line_length(line))))
+        self._text_selection_start = clamp(*start)
+        self._text_selection_end = clamp(*end)
+        self.cursor_location = self._text_selection_end.copy()
+        if self.folds.reveal(self._text_selection_start.line) | self.folds.reveal(self.cursor_location.line):
+            self._resized()
+        self.refresh_highlight()
+
+    def set_wrap(self, wrap:bool):
+        """
+        soft wraps lines wider than the box (`min_width`) onto several rows. the layout follows edits and
+        changes of `min_width`, and the cursor, clicks and the up/down keys move by rows
+        """
+        if wrap == (self.wrap is not None):
+            return
+        if wrap:
+            self.wrap = LineWrap(self.metrics, self.min_width - 2)
+            self.folds.set_wrap(self.wrap)
+            self._rewrap()
+        else:
+            self.wrap = None
+            self.folds.set_wrap(None)
+            self.surfaces = [None] * len(self.surfaces)
+            self._resized()
+
+    def _rewrap(self):
+        """re-breaks the lines wider than the box after `min_width` changed, narrower lines stay one row"""
+        wrap = self.wrap
+        old = wrap.wrapped()
+        wrap.width = self.min_width - 2
+        line = self.buffer.line
+        widths = self._line_widths
+        wrap.set_lines([(l, line(l)) for l in compress(range(len(widths)), map((wrap.width + 2).__lt__, widths))])
+        surfaces = self.surfaces
+        for l in old + wrap.wrapped():
+            surfaces[l] = None
+        self._resized()
+
+    def _resized(self):
+        self._text_height = self.row_count() * self._height
+        self._selection_spans.clear()
+        self._drawn = None
+
+    def row_count(self) -> int:
+        """rows the text takes, the line count unless lines are wrapped or folded"""
+        rows = self.buffer.line_count() if self.wrap is None else self.wrap.row_count(self.buffer.line_count())
+        return rows - self.folds.hidden_rows() if self.folds else rows
+
+    def row_of(self, line:int, col:int=0) -> int:
+        """the row showing (line, col), a folded line is shown by the line it's folded under"""
+        return self.folds.visible_row(line if self.wrap is None else self.wrap.row_of(line, col))
+
+    def line_at(self, row:int) -> int:
+        """the line shown on `row`"""
+        row = self.folds.row(row)
+        return row if self.wrap is None else self.wrap.position(row)[0]
+
+    def _point(self, line:int, col:int) -> tuple[int, int]:
+        """(row, x) of (line, col)"""
+        text = self.buffer.line(line)
+        if self.wrap is None:
+            return self.folds.visible_row(line), self.metrics.width(text[0:col])
+        row = self.wrap.row_of(line, col)
+        start = self.wrap.span(line, row - self.wrap.row_of(line), len(text))[0]
+        return self.folds.visible_row(row), self.metrics.width(text[start:col])
+
+    def _column_at(self, row:int, x:float) -> tuple[int, int]:
+        """the (line, col) closest to `x` on `row`"""
+        row = self.folds.row(row)
+        if self.wrap is None:
+            return row, self.metrics.column_at(self.buffer.line(row), x)
+        line, index = self.wrap.position(row)
+        text = self.buffer.line(line)
+        start, end = self.wrap.span(line, index, len(text))
+        col = start + self.metrics.column_at(text[start:end], x)
+        if end < len(text):
+            col = min(col, end - 1) # the end of a row is the start of the next one
+        return line, col
+
+    def fold(self, line:int) -> Fold|None:
+        """
+        folds the region `line` starts (see `fold_end` in LineFolds.py), keeping `line` visible.
+        a cursor inside the region moves to the end of `line`
+        """
+        if self.folds.hidden(line) is not None or (end := fold_end(self.buffer, line)) is None:
+            return None
+        fold = self.folds.fold(line, end)
+        if line < self.cursor_location.line <= end:
+            self.cursor_location = Cursor(line, self.buffer.line_length(line))
+        self._resized()
+        return fold
+
+    def unfold(self, line:int) -> Fold|None:
+        """unfolds the fold under `line`"""
+        if (fold := self.folds.unfold(line)) is not None:
+            self._resized()
+        return fold
+
+    def toggle_fold(self, line:int) -> bool:
+        """unfolds `line` if it's folded, folds it otherwise. returns whether anything changed"""
+        return (self.unfold(line) or self.fold(line)) is not None
+
+    def unfold_all(self):
+        self.folds.unfold_all()
+        self._resized()
+
+    def foldable(self, line:int) -> bool:
+        """whether `line` is folded or looks like it starts a region"""
+        return self.folds.folded(line) is not None or foldable(self.buffer, line)
+
+    def _move_rows(self, delta:int) -> bool:
+        """moves the cursor `delta` rows keeping its x, False (without moving) past the first or last row"""
+        row, x = self._point(self.cursor_location.line, self.cursor_location.col)
+        if not 0 <= row + delta < self.row_count():
+            return False
+        self.cursor_location.line, self.cursor_location.col = self._column_at(row + delta, x)
+        return True
+
+    def find(self, pattern:str, regex:bool=False, case:bool=True) -> TextSearch:
+        """
+        searches the text on a background thread, matches are highlighted as they are found and
+        followed by edits. raises re.error for an invalid regex
+        """
+        if self.search is not None:
+            self.search.cancel()
+        self.search = TextSearch(pattern, regex, case)
+        self.search.start(self.buffer)
+        self._drawn = None
+        return self.search
+
+    def clear_search(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+            self._drawn = None
+
+    def find_next(self) -> tuple[int, int]|None:
+        """selects the first match after the cursor (wrapping around), returns its (line, col)"""
+        if self.search is None:
+            return None
+        return self._select_match(self.search.next_index(self.cursor_location.line, self.cursor_location.col))
+
+    def find_previous(self) -> tuple[int, int]|None:
+        """selects the last match before the cursor or selection (wrapping around), returns its (line, col)"""
+        if self.search is None:
+            return None
+        c = self.cursor_location
+        if self._text_selection_start and self._text_selection_end:
+            c = min(self._text_selection_start, self._text_selection_end)
+        return self._select_match(self.search.previous_index(c.line, c.col))
+
+    def _select_match(self, index:int|None) -> tuple[int, int]|None:
+        if index is None:
+            return None
+        line, start, end = self.search.matches[index]
+        self.select((line, start), (line, end))
+        return line, start
+
+    def replace_all(self, replacement:str) -> int:
+        """
+        replaces every match of the current search (like `re.sub`), returns how many were replaced.
+        every match is its own edit, made from the last one up so the others don't move, and all of them are one undo step
+        """
+        search = self.search
+        if search is None or not (lines := search.lines(self.buffer)):
+            return 0
+        template = search.template(replacement)
+        total = added = 0
+        self.search = None # the matches are patched once afterwards instead of after every edit
+        self.history.begin()
+        for line in reversed(lines):
+            for start, end, text in reversed(search.replacements(self.buffer.line(line), template)):
+                self._replace((line, start), (line, end), text)
+                added += text.count("\n")
+                total += 1
+        self.history.end()
+        self.search = search
+        search.lines_changed(self.buffer, lines[0], lines[-1] - lines[0] + 1, lines[-1] - lines[0] + 1 + added)
+        self._text_selection_start = self._text_selection_end = None
+        self.cursor_location.line = min(self.cursor_location.line, self.buffer.line_count()-1)
+        self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
+        self._refresh_dirty()
+        self._drawn = None
+        return total
 
     def get_selection(self):
         if (s := self._text_selection_start) and (e := self._text_selection_end):
-            ll = min(s.line, e.line)
-            gl = max(s.line, e.line)
-            if s.line == e.line:
-                lc = min(s.col, e.col)
-                gc = max(s.col, e.col)
-            elif s.line > e.line:
-                lc = e.col
-                gc = s.col
-            else:
-                lc = s.col
-                gc = e.col
-
-            lc = min(s.col, e.col)
-            gc = max(s.col, e.col)
-
-            lines = self.get_lines()[ll:gl+1]
-            # print(lines[-1], len(lines[-1]))
-            lines[-1] = lines[-1][0:gc]
-            lines[0] = lines[0][lc:]
-            return "\n".join(lines)
+            s, e = min(s, e), max(s, e)
+            return self.buffer.get_range((s.line, s.col), (e.line, e.col))
         return None
 
     def set_selection(self, text:str):
         if (s := self._text_selection_start) is not None and (e := self._text_selection_end) is not None:
-            ll = min(s.line, e.line)
-            gl = max(s.line, e.line)
-            lc = min(s.col, e.col)
-            gc = max(s.col, e.col)
-            
-            mp = min(s, e).copy()
-
-            lines = self.get_lines()
-            pre = lines[0:ll+1]
-            pre[-1] = pre[-1][0:lc]
-
-            post = lines[gl:]
-            post[0] = post[0][gc:]
-            self.set_content("\n".join(pre) + text + "\n".join(post))
-            self.cursor_location = mp
+            s, e = min(s, e), max(s, e)
+            self.history.begin()
+            self._delete((s.line, s.col), (e.line, e.col))
+            self._insert(s.line, s.col, text)
+            self.history.end()
+            self.cursor_location = s.copy()
             self._text_selection_start = self._text_selection_end = None
+            self._refresh_dirty()
+            self._drawn = None
+
+    def insert_text(self, text:str, position:tuple[int, int]|None=None) -> tuple[int, int]:
+        """
+        inserts `text`, any number of lines, as one undo step and returns the (line, col) after it. it takes time
+        proportional to `text`, not to the document. without a `position` the text replaces the selection and the
+        cursor moves past it, otherwise the cursor keeps its place in the text around it
+        """
+        text = text.replace("\r\n", "\n")
+        if self.single_line:
+            text = re.sub("\n+", " ", text)
+        self.history.begin()
+        if position is None:
+            if (s := self._text_selection_start) is not None and (e := self._text_selection_end) is not None:
+                s, e = min(s, e), max(s, e)
+                self._delete((s.line, s.col), (e.line, e.col))
+                self.cursor_location = s.copy()
+            self._text_selection_start = self._text_selection_end = None
+            line, col = self.cursor_location.line, self.cursor_location.col
+        else:
+            line = max(0, min(position[0], self.buffer.line_count()-1))
+            col = max(0, min(position[1], self.buffer.line_length(line)))
+        end = self._insert(line, col, text) if text else (line, col)
+        self.history.end()
+        c = self.cursor_location
+        if position is None:
+            c.line, c.col = end
+        elif (c.line, c.col) >= (line, col):
+            if c.line == line:
+                c.col += end[1] - col
+            c.line += end[0] - line
+        self.refresh_highlight()
+        self._refresh_dirty()
+        self._drawn = None
+        return end
 
     def get_index(self, cursor:Cursor):
-        return sum(len(l) for l in self._lines[0:cursor.line]) + len(self._lines[cursor.line][0:cursor.col])
+        return self.buffer.offset(cursor.line, cursor.col)
 
     def get_content(self):
-        return "\n".join(["".join(line) for line in self._lines])
+        return self.buffer.text()
 
     def get_lines(self):
-        return ["".join(line) for line in self._lines]
+        return self.buffer.lines()
 
     def set_content(self, content:str):
-        self._lines = [[*line] for line in content.split("\n")]
-        self.cursor_location.line = min(self.cursor_location.line, len(self._lines)-1)
-        if self._lines:
-            self.cursor_location.col = min(self.cursor_location.col, len(self._lines[self.cursor_location.line])-1)
+        """replaces the whole text, this clears the undo history"""
+        self.buffer.set_text(content)
+        self.history.clear()
+        self.cursor_location.line = min(self.cursor_location.line, self.buffer.line_count()-1)
+        self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
         self.refresh_surfaces()
+        self._drawn = None
 
-    def _refresh_surfaces(self):
-        self.surfaces.clear()
-        self._text_width = 0
-        self._text_height = 0
-        for line in self.get_lines():
-            s = self.font.render(line or " ", True, (0, 0, 0))
-            a, b = s.get_size()
-            s = pygame.Surface((a+2, b), pygame.SRCALPHA)
-            # s.fill(tuple(self.text_bg_color))
-            self.surfaces.append(s)
-            self._text_width = max(self._text_width, s.get_width())
-            self._text_height += s.get_height()
-
-    def color_text(self, text:str) -> str:
-        return text #re.sub(r"(#.*)", "\033[38;2;106;153;85m\\1\033[0m", text)
-
-    def format_text(self, text:str, default_color:Color|list|tuple) -> list[tuple[Color|list|tuple, str]]:
-
-        col = default_color
-
-        raw = re.split("(\033\\[(?:\\d+;?)+m|\n)", self.color_text(text))
-        data = []
-        curr_line = []
-
-        for r in raw:
-            # print(f"{r!r}")
-            if m := re.match(r"\033\[38;2;(?P<R>\d+);(?P<G>\d+);(?P<B>\d+)m", r):
-                # print("is color")
-                d = m.groupdict()
-                col = (int(d["R"]), int(d["G"]), int(d["B"]))
-            elif r == "\033[0m":
-                # print("is color reset")
-                col = default_color
-            elif r == "\n":
-                data.append(curr_line)
-                curr_line = []
+    def set_chunks(self, chunks:list):
+        """
+        replaces the whole text with `TextBuffer` chunks (lists of lines or `LazyChunk`s from a `MappedFile`).
+        lines are only read and measured when they are drawn, this clears the undo history
+        """
+        self.buffer.set_chunks(chunks)
+        self.history.clear()
+        self.cursor_location.line = min(self.cursor_location.line, self.buffer.line_count()-1)
+        self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
+        self.refresh_surfaces(False)
+        self._drawn = None
+
+    def append_chunks(self, chunks:list):
+        """adds `TextBuffer` chunks after the last line, like `set_chunks` they are read when drawn"""
+        first = self.buffer.line_count()
+        self.buffer.append_chunks(chunks)
+        self._lines_changed(first, 0, self.buffer.line_count() - first, False)
+        self._drawn = None
+
+    def _insert(self, line:int, col:int, text:str, record:bool=True, coalesce:bool=False) -> tuple[int, int]:
+        end = self.buffer.insert(line, col, text)
+        self._lines_changed(line, 1, end[0] - line + 1, edit=(col, len(text)))
+        if record and text:
+            self.history.record(line, col, "", text, coalesce)
+        return end
+
+    def _delete(self, start:tuple[int, int], end:tuple[int, int], record:bool=True, coalesce:bool=False) -> str:
+        removed = self.buffer.delete(start, end)
+        self._lines_changed(start[0], end[0] - start[0] + 1, 1, edit=(start[1], -len(removed)))
+        if record and removed:
+            self.history.record(start[0], start[1], removed, "", coalesce)
+        return removed
+
+    def _replace(self, start:tuple[int, int], end:tuple[int, int], text:str, record:bool=True) -> tuple[int, int]:
+        """replaces the text between two positions as one edit"""
+        removed = self.buffer.get_range(start, end)
+        after = self.buffer.replace(start, end, text)
+        # `edit` describes a pure insert or delete, a wrapped line is re-broken whole otherwise
+        edit = (start[1], len(text) - len(removed)) if not (removed and text) else None
+        self._lines_changed(start[0], end[0] - start[0] + 1, after[0] - start[0] + 1, edit=edit)
+        if record and (removed or text):
+            self.history.record(start[0], start[1], removed, text)
+        return after
+
+    def _lines_changed(self, first:int, old:int, new:int, measure:bool=True, edit:tuple[int, int]|None=None):
+        """
+        lines [first, first+old) were replaced by `new` lines. without `measure` they are measured when drawn.
+        `edit` is the (col, length change) of an edit within one line, so a wrapped line is only re-broken from there
+        """
+        self.surfaces[first:first+old] = [None] * new
+        self._runs[first:first+old] = [None] * new
+        self._selection_spans.clear()
+        removed = self._line_widths[first:first+old]
+        if measure:
+            texts = self.buffer.lines(first, first+new)
+            space = self.metrics.width(" ") + 2 # empty lines are one space wide
+            widths = [w + 2 if w else space for w in self.metrics.widths(texts)]
+        else:
+            texts = []
+            widths = [0] * new
+        self._line_widths[first:first+old] = widths
+        if widths and max(widths) >= self._text_width:
+            self._text_width = max(widths)
+        elif removed and max(removed) >= self._text_width:
+            self._text_width = max(self._line_widths)
+        if self.wrap is not None:
+            limit = self.wrap.width + 2
+            if edit is not None and old == new == 1 and widths[0] > limit:
+                self.wrap.line_edited(first, texts[0], *edit)
             else:
-                curr_line.append((col, r))
-        
-        if curr_line:
-            data.append(curr_line)
-                
-
-        return data #[[(default_color, l)] for l in text.split("\n")]
+                self.wrap.lines_changed(first, old, new, [(first+i, texts[i]) for i, w in enumerate(widths) if w > limit])
+        self.folds.lines_changed(first, old, new)
+        self._text_height = self.row_count() * self._height
+        if self.highlighter is not None:
+            self.highlighter.lines_changed(first, old, new)
+        if self.search is not None:
+            self.search.lines_changed(self.buffer, first, old, new)
+        if self.minimap is not None:
+            self.minimap.lines_changed(first, old, new)
+
+        if self._dirty_lines is None:
+            self._dirty_lines = (first, first + new)
+        else:
+            lo, hi = self._dirty_lines
+            if hi > first + old:
+                hi += new - old
+            self._dirty_lines = (min(lo, first), max(hi, first + new))
+
+    def _colored(self) -> bool:
+        """True when `color_text` was replaced, its colors can depend on every line of the document"""
+        if self.highlighter is not None:
+            return False
+        return "color_text" in self.__dict__ or type(self).color_text is not MultilineTextBox.color_text
+
+    def _refresh_dirty(self):
+        """
+        re-colors the document after edits and drops the surfaces of every line whose runs changed.
+        without a `color_text` the edited lines were already dropped and are styled when they are drawn
+        """
+        if self._dirty_lines is None:
+            return
+        self._dirty_lines = None
+        if not self._colored():
+            return
+        _, lines = from_ansi(self.color_text(self.get_content()))
+        runs = self._runs
+        surfaces = self.surfaces
+        for i, line in zip(range(len(runs)), lines):
+            if runs[i] != line:
+                runs[i] = line
+                surfaces[i] = None
+
+    def _measure(self, line:int) -> int:
+        """the width of `line`, lines loaded without measuring are measured (and wrapped) here"""
+        if not (width := self._line_widths[line]):
+            text = self.buffer.line(line)
+            width = self._line_widths[line] = self.text_size_of(text or " ")[0] + 2
+            self._text_width = max(self._text_width, width)
+            if self.wrap is not None and width > self.wrap.width + 2:
+                self.wrap.set_line(line, text)
+                self.folds.rows_changed(line)
+                self._text_height = self.row_count() * self._height
+                self._drawn = None
+        return width
+
+    def _line_runs(self, line:int) -> list:
+        if (runs := self._runs[line]) is None:
+            runs = self._runs[line] = self.highlighter.line(self.buffer, line) if self.highlighter is not None else []
+        return runs
+
+    def _render_line(self, line:int) -> pygame.Surface|TiledLine:
+        width = self._measure(line)
+        if width > TILE_WIDTH:
+            return TiledLine(self.buffer.line(line), self._line_runs(line), self.text_color, width, self.metrics, self.font, self.atlas)
+        return self._draw_segments(to_segments(self.buffer.line(line), self._line_runs(line), self.text_color), width)
+
+    def _render_row(self, line:int, index:int) -> pygame.Surface:
+        """row `index` of a wrapped line"""
+        text = self.buffer.line(line)
+        start, end = self.wrap.span(line, index, len(text))
+        segments = to_segments(text[start:end], slice_runs(self._line_runs(line), start, end), self.text_color)
+        return self._draw_segments(segments, self.metrics.width(text[start:end]) + 2)
+
+    def _draw_segments(self, segments:list[tuple], width:int) -> pygame.Surface:
+        surface = pygame.Surface((width, self._height), pygame.SRCALPHA)
+        if self.atlas is not None:
+            self.atlas.draw(surface, segments, 1, 0)
+            return surface
+        x = 1
+        for col, segment in segments:
+            s = self.font.render(segment, True, tuple(col))
+            surface.blit(s, (x, 0))
+            x += s.get_width()
+        return surface
+
+    def set_highlighter(self, highlighter:Highlighter|None):
+        """highlights the content with `highlighter` (replaces `color_text`)"""
+        self.highlighter = highlighter
+        self.refresh_surfaces()
+        self._drawn = None
 
-    def refresh_surfaces(self):
-        self._refresh_surfaces()
-        data = self.format_text("\n".join(self.get_lines()), self.text_color)
+    def text_size_of(self, text:str) -> tuple[int, int]:
+        """(width, height) of `text` without rendering it"""
+        return self.metrics.size(text)
 
-        for line, surface in zip(data, self.surfaces):
-            x = 1
-            for col, segment in line:
+    def color_text(self, text:str) -> str:
+        return text #re.sub(r"(#.*)", "\033[38;2;106;153;85m\\1\033[0m", text)
 
-                s = self.font.render(segment, True, tuple(col))
-                surface.blit(s, (x, 0))
-                x += s.get_width()
+    def format_text(self, text:str, default_color:Color|list|tuple) -> list[list[tuple[Color|list|tuple, str]]]:
+        """`(color, text)` segments per line of `color_text(text)`"""
+        lines, runs = from_ansi(self.color_text(text))
+        return [to_segments(line, r, default_color) for line, r in zip(lines, runs)]
+
+    def refresh_surfaces(self, measure:bool=True):
+        """re-formats and re-measures every line, without `measure` lines are measured when they are drawn"""
+        count = self.buffer.line_count()
+        self.surfaces = [None] * count
+        self._runs = [None] * count
+        self._line_widths = [0] * count
+        self._text_width = 0
+        self._dirty_lines = None
+        if self.highlighter is not None:
+            self.highlighter.reset(count)
+        if self.minimap is not None:
+            self.minimap.reset(count)
+        self._lines_changed(0, count, count, measure)
+        self._refresh_dirty()
 
     def format_content(self, content):
         return content
 
-    def _update(self, editor, X, Y):
-        h = 0
+    def _size(self) -> tuple[int, int]:
+        """(width, height) of the box, wrapped text is never wider than `min_width`"""
+        width = self.min_width if self.wrap is not None else max(self._text_width, self.min_width)
+        return width, max(self._text_height, self.min_height)
 
+    def _update(self, editor, X, Y):
+        width, height = self._size()
         if self.text_bg_color:
             if isinstance(self.text_bg_color, (Image, Animation)):
                 self.text_bg_color.x = self.x - 1
                 self.text_bg_color.y = self.y - 1
-                self.text_bg_color.width = max(self._text_width, self.min_width) + 2
-                self.text_bg_color.height = max(self._text_height, self.min_height) + 2
+                self.text_bg_color.width = width + 2
+                self.text_bg_color.height = height + 2
                 self.text_bg_color._update(editor, X, Y)
             else:
-                editor.screen.fill(tuple(self.text_bg_color), (X+self.x-1, Y+self.y-1, max(self._text_width, self.min_width)+2, max(self._text_height, self.min_height)+2))
-
-        l = 0
-        for s in self.surfaces:
-            s:pygame.Surface
-            editor.screen.blit(s, (X+self.x, Y+self.y+h))
-            if l == self.cursor_location.line and self._cursor_visible:
-                _h = self.font.render(self.get_lines()[self.cursor_location.line][0:self.cursor_location.col], True, (0, 0, 0)) # This is not shown on screen, only used to get width
-                editor.screen.blit(self._cursor_surface, (X+self.x+_h.get_width(), Y+self.y+h+2))
-            h += self._height#s.get_height()
-            l += 1
-
-        if self._text_selection_start and self._text_selection_end and self.highlights:
-            # letter = self.font.render("_", True, (0, 0, 0)) # This is not shown on screen, only used to get width
-            #w = letter.get_width()# - 1
-            _h = self._height # letter.get_height()
-            h = self.highlights[0]
-            _x, _y = self._highlight_offset
-            #print(f"highlight at: {X+self.x+_x}, {Y+self.y+_y}  mouse: {editor.mouse_pos} {h.get_size()}")
-            editor.screen.blit(h, (X+self.x+_x, Y+self.y+_y))
-            height = _h
-            for h in self.highlights[1:]:
-                editor.screen.blit(h, (X+self.x, Y+self.y+_y+height))
-                height += _h
-
-    def refresh_lines(self):
-        self._lines = expand_text_lists(self._lines)
+                editor.screen.fill(tuple(self.text_bg_color), (X+self.x-1, Y+self.y-1, width+2, height+2))
+
+        wrap = self.wrap
+        first, last = visible_rows(editor.screen, Y+self.y, self._height, self.row_count())
+        if wrap is None and not self.folds:
+            rows = None
+            ranges = [(first, last)]
+        else:
+            # (row, line, index of the row within the line) of the visible rows, folds leave gaps between their lines
+            rows = list(self.folds.rows(first, last, len(self.surfaces)))
+            ranges = self._line_ranges(rows)
+        surfaces = self.surfaces
+        if (highlighter := self.highlighter) is not None:
+            runs = self._runs
+            for first_line, last_line in ranges:
+                for l in range(first_line, last_line):
+                    # edits can change the highlighting of lines after them (opening a comment for example)
+                    if (line := highlighter.line(self.buffer, l)) is not runs[l] and line != runs[l]:
+                        runs[l] = line
+                        surfaces[l] = None
+        blits = []
+        clip = editor.screen.get_clip()
+        if rows is None:
+            for l in range(first, last):
+                if (s := surfaces[l]) is None:
+                    s = surfaces[l] = self._render_line(l)
+                if s.__class__ is TiledLine:
+                    blits += s.blits(X+self.x, Y+self.y+l*self._height, clip.left, clip.right)
+                else:
+                    blits.append((s, (X+self.x, Y+self.y+l*self._height)))
+        else:
+            # a wrapped line keeps a list with a surface per row
+            for row, l, index in rows:
+                if (s := surfaces[l]) is None:
+                    if wrap is not None:
+                        self._measure(l)
+                    s = surfaces[l] = [None] * (len(breaks) + 1) if wrap is not None and (breaks := wrap.breaks(l)) else self._render_line(l)
+                if s.__class__ is list:
+                    if (r := s[index]) is None:
+                        r = s[index] = self._render_row(l, index)
+                    s = r
+                elif s.__class__ is TiledLine:
+                    blits += s.blits(X+self.x, Y+self.y+row*self._height, clip.left, clip.right)
+                    continue
+                blits.append((s, (X+self.x, Y+self.y+row*self._height)))
+        editor.screen.blits(blits, False)
+        if self.search is not None and self.search.matches:
+            for first_line, last_line in ranges:
+                self._draw_matches(editor, X, Y, first_line, last_line)
+        if self._cursor_visible:
+            row, _w = self._point(self.cursor_location.line, self.cursor_location.col)
+            if first <= row < last:
+                editor.screen.blit(self._cursor_surface, (X+self.x+_w, Y+self.y+row*self._height+2))
+
+        if (selection := self._selection_range()) is not None:
+            for first_line, last_line in ranges:
+                self._draw_selection(editor, X, Y, selection, first_line, last_line)
+
+    @staticmethod
+    def _line_ranges(rows:list[tuple[int, int, int]]) -> list[list[int]]:
+        """[first, last) ranges of consecutive lines shown by `rows`"""
+        ranges = []
+        for _, line, _ in rows:
+            if ranges and line < ranges[-1][1]:
+                continue
+            if ranges and line == ranges[-1][1]:
+                ranges[-1][1] += 1
+            else:
+                ranges.append([line, line + 1])
+        return ranges
+
+    def _draw_selection(self, editor, X, Y, selection:tuple, first:int, last:int):
+        (ll, lc), (gl, gc) = selection
+        _y = Y + self.y + (2 if ll != gl else 0)
+        blits = []
+        for line in range(max(first, ll), min(last, gl+1)):
+            for row, x, width in self._selected_spans(line, lc if line == ll else 0, gc if line == gl else None):
+                self._clipped_highlight(editor, blits, X+self.x+x, _y+row*self._height, width)
+        editor.screen.blits(blits, False)
+
+    def _clipped_highlight(self, editor, blits:list, x:int, y:int, width:int):
+        """adds the part of a highlight at (x, y) that is inside the drawn area, long lines can be wider than a surface can be"""
+        clip = editor.screen.get_clip()
+        left, right = max(x, clip.left), min(x + width, clip.right)
+        if right > left:
+            blits.append((self._highlight_of(right - left), (left, y)))
+
+    def _draw_matches(self, editor, X, Y, first:int, last:int):
+        matches = self.search.matches
+        blits = []
+        line = text = None
+        for i in range(bisect_left(matches, (first,)), len(matches)):
+            l, start, end = matches[i]
+            if l >= last:
+                break
+            if l != line:
+                line, text = l, self.buffer.line(l)
+            for row, x, width in self._spans(l, start, end, text):
+                self._clipped_highlight(editor, blits, X+self.x+x, Y+self.y+row*self._height, width)
+        editor.screen.blits(blits, False)
 
     @classmethod
     def set_focus(cls, box):
@@ -309,8 +768,20 @@ class MultilineTextBox(UIElement):
         
         cls._focused = box
 
+    def _move_cursor_to(self, dx:float, dy:float):
+        """puts the cursor at the character closest to (dx, dy) from the top left of the text"""
+        row = max(min(int(dy//self._height), self.row_count()-1), 0)
+        self.cursor_location.line, self.cursor_location.col = self._column_at(row, dx)
+
     def _event(self, editor, X, Y):
-        w, h = max(self.min_width, self._text_width), max(self.min_height, self._text_height)
+        if self.search is not None:
+            if self.search.poll(self.buffer):
+                self._drawn = None
+            if not self.search.done:
+                editor.request_frame(0.05)
+        if self.wrap is not None and self.wrap.width != self.min_width - 2:
+            self._rewrap()
+        w, h = self._size()
         _x, _y = editor.mouse_pos
         # print(X+self.x, Y+self.y, w, h, _x, _y)
         #if max(editor.X, X + self.x) <= _x <= min(X + self.x + w, editor.Width) and max(editor.Y, Y + self.y) <= _y <= min(Y + self.y + h, editor.Height):
@@ -324,14 +795,10 @@ class MultilineTextBox(UIElement):
         if editor.left_mouse_down():
             if self.hovered:
                 #if self.focused:
-                letter = self.font.render("_", True, (0, 0, 0)) # This is not shown on screen, only used to get width
-                w = letter.get_width()# - 1
-                h = letter.get_height()
                 dx = _x - (X + self.x)
                 dy = _y - (Y + self.y)
                 _old = self.cursor_location.copy()
-                self.cursor_location.line = min(int(dy//h), len(self._lines)-1)
-                self.cursor_location.col = max(min(int(round(dx/w)), len(self._lines[self.cursor_location.line])), 0)
+                self._move_cursor_to(dx, dy)
 
                 if pygame.K_LSHIFT in editor.keys:
                     if not self._text_selection_start:
@@ -350,14 +817,10 @@ class MultilineTextBox(UIElement):
                 self._cursor_visible = False
 
         elif editor.mouse[0] and self.hovered:
-            letter = self.font.render("_", True, (0, 0, 0))
-            w = letter.get_width()# - 1
-            h = letter.get_height()
             dx = _x - (X + self.x)
             dy = _y - (Y + self.y)
             _old = self.cursor_location.copy()
-            self.cursor_location.line = min(int(dy//h), len(self._lines)-1)
-            self.cursor_location.col = max(min(int(round(dx/w)), len(self._lines[self.cursor_location.line])), 0)
+            self._move_cursor_to(dx, dy)
 
             if not self._text_selection_start:
                 self._text_selection_start = _old
@@ -370,11 +833,14 @@ class MultilineTextBox(UIElement):
                 # print(f"{key!r}")
                 if key == "$↑":
                     _old = self.cursor_location.copy()
-                    if self.cursor_location.line == 0:
+                    if self.wrap is not None or self.folds:
+                        if not self._move_rows(-1):
+                            self.cursor_location.col = 0
+                    elif self.cursor_location.line == 0:
                         self.cursor_location.col = 0
                     else:
                         self.cursor_location.line -= 1
-                        self.cursor_location.col = min(self.cursor_location.col, len(self._lines[self.cursor_location.line]))
+                        self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
                     if pygame.K_LSHIFT in editor.keys:
                         if not self._text_selection_start:
                             self._text_selection_start = _old
@@ -382,17 +848,22 @@ class MultilineTextBox(UIElement):
                         self.refresh_highlight()
                     elif self._text_selection_start and self._text_selection_end:
                         self.cursor_location = min(self._text_selection_start, self._text_selection_end)
-                        if self.cursor_location.line > 0:
+                        if self.wrap is not None or self.folds:
+                            self._move_rows(-1)
+                        elif self.cursor_location.line > 0:
                             self.cursor_location.line -= 1
-                            self.cursor_location.col = min(self.cursor_location.col, len(self._lines[self.cursor_location.line]))
+                            self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
                         self._text_selection_start = self._text_selection_end = None
                 elif key == "$↓":
                     _old = self.cursor_location.copy()
-                    if self.cursor_location.line == len(self._lines)-1:
-                        self.cursor_location.col = len(self._lines[self.cursor_location.line])
+                    if self.wrap is not None or self.folds:
+                        if not self._move_rows(1):
+                            self.cursor_location.col = self.buffer.line_length(self.cursor_location.line)
+                    elif self.cursor_location.line == self.buffer.line_count()-1:
+                        self.cursor_location.col = self.buffer.line_length(self.cursor_location.line)
                     else:
                         self.cursor_location.line += 1
-                        self.cursor_location.col = min(self.cursor_location.col, len(self._lines[self.cursor_location.line]))
+                        self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
                     if pygame.K_LSHIFT in editor.keys:
                         if not self._text_selection_start:
                             self._text_selection_start = _old
@@ -400,15 +871,17 @@ class MultilineTextBox(UIElement):
                         self.refresh_highlight()
                     elif self._text_selection_start and self._text_selection_end:
                         self.cursor_location = max(self._text_selection_start, self._text_selection_end)
-                        if self.cursor_location.line < len(self._lines)-1:
+                        if self.wrap is not None or self.folds:
+                            self._move_rows(1)
+                        elif self.cursor_location.line < self.buffer.line_count()-1:
                             self.cursor_location.line += 1
-                            self.cursor_location.col = min(self.cursor_location.col, len(self._lines[self.cursor_location.line]))
+                            self.cursor_location.col = min(self.cursor_location.col, self.buffer.line_length(self.cursor_location.line))
                         self._text_selection_start = self._text_selection_end = None
                 elif key == "$→":
                     _old = self.cursor_location.copy()
-                    if self.cursor_location.col == len(self._lines[self.cursor_location.line]):
-                        if self.cursor_location.line < len(self._lines)-1:
-                            self.cursor_location.line += 1
+                    if self.cursor_location.col == self.buffer.line_length(self.cursor_location.line):
+                        if (line := self.folds.visible_line(self.cursor_location.line+1)) < self.buffer.line_count():
+                            self.cursor_location.line = line
                             self.cursor_location.col = 0
                     else:
                         self.cursor_location.col += 1
@@ -424,8 +897,8 @@ class MultilineTextBox(UIElement):
                     _old = self.cursor_location.copy()
                     if self.cursor_location.col == 0:
                         if self.cursor_location.line > 0:
-                            self.cursor_location.line -= 1
-                            self.cursor_location.col = len(self._lines[self.cursor_location.line])
+                            self.cursor_location.line = self.folds.visible_line(self.cursor_location.line-1, False)
+                            self.cursor_location.col = self.buffer.line_length(self.cursor_location.line)
                     else:
                         self.cursor_location.col -= 1
                     if pygame.K_LSHIFT in editor.keys:
@@ -442,37 +915,31 @@ class MultilineTextBox(UIElement):
                         continue
                     if self.get_selection():
                         self.set_selection("")
-                    txt = self._lines[self.cursor_location.line][self.cursor_location.col:]
-                    self._lines[self.cursor_location.line] = self._lines[self.cursor_location.line][0:self.cursor_location.col]
+                    self._insert(self.cursor_location.line, self.cursor_location.col, "\n")
                     self.cursor_location.line += 1
                     self.cursor_location.col = 0
-                    self._lines.insert(self.cursor_location.line, txt)
                     self.save_history()
                     self._on_enter(self)
                 elif key == "\t":
-                    pre = "".join(self._lines[self.cursor_location.line][0:self.cursor_location.col])
+                    pre = self.buffer.line(self.cursor_location.line)[0:self.cursor_location.col]
                     if pre.strip() == "":
                         add = " " * (4 - (len(pre) % 4))
                     else:
                         add = "    "
-                    self._lines[self.cursor_location.line].insert(self.cursor_location.col, add)
-                    self.refresh_lines()
+                    self._insert(self.cursor_location.line, self.cursor_location.col, add)
                     self.cursor_location.col += len(add)
                 elif key == "\b":
                     if self.get_selection():
                         self.set_selection("")
                     else:
                         if self.cursor_location.col > 0:
-                            c = self._lines[self.cursor_location.line][self.cursor_location.col-1]
-                            txt = self._lines[self.cursor_location.line][0:self.cursor_location.col-1] + \
-                                self._lines[self.cursor_location.line][self.cursor_location.col:]
-                            self._lines[self.cursor_location.line] = txt
+                            c = self._delete((self.cursor_location.line, self.cursor_location.col-1), (self.cursor_location.line, self.cursor_location.col), coalesce=True)
                             self.cursor_location.col -= 1
                             if c in self._history_triggers:
                                 self.save_history()
                         elif self.cursor_location.line > 0:
-                            self.cursor_location.col = len(self._lines[self.cursor_location.line-1])
-                            self._lines[self.cursor_location.line-1] += self._lines.pop(self.cursor_location.line)
+                            self.cursor_location.col = self.buffer.line_length(self.cursor_location.line-1)
+                            self._delete((self.cursor_location.line-1, self.cursor_location.col), (self.cursor_location.line, 0))
                             self.cursor_location.line -= 1
                             self.save_history()
                     
@@ -480,25 +947,18 @@ class MultilineTextBox(UIElement):
                     if self.get_selection():
                         self.set_selection("")
                     else:
-                        if self.cursor_location.col < len(self._lines[self.cursor_location.line]):
-                            c = self._lines[self.cursor_location.line][self.cursor_location.col]
-                            txt = self._lines[self.cursor_location.line][0:self.cursor_location.col] + \
-                                self._lines[self.cursor_location.line][self.cursor_location.col+1:]
-                            self._lines[self.cursor_location.line] = txt
+                        if self.cursor_location.col < self.buffer.line_length(self.cursor_location.line):
+                            c = self._delete((self.cursor_location.line, self.cursor_location.col), (self.cursor_location.line, self.cursor_location.col+1), coalesce=True)
                             # self.cursor_location.col -= 1
                             if c in self._history_triggers:
                                 self.save_history()
-                        elif self.cursor_location.line < len(self._lines)-1:
-                            # self.cursor_location.col = len(self._lines[self.cursor_location.line-1])
-                            self._lines[self.cursor_location.line] += self._lines.pop(self.cursor_location.line+1)
-                            # self.cursor_location.line -= 1
+                        elif self.cursor_location.line < self.buffer.line_count()-1:
+                            self._delete((self.cursor_location.line, self.buffer.line_length(self.cursor_location.line)), (self.cursor_location.line+1, 0))
                             self.save_history()
                 elif key == "\x1a": # CTRL+Z
                     if pygame.K_LSHIFT in editor.keys:
                         self.redo()
                     else:
-                        if not self._future:
-                            self.save_history()
                         self.undo()
                 elif key == "\x18": # CTRL+X
                     if (self._text_selection_start is not None) and (self._text_selection_end is not None):
@@ -509,40 +969,13 @@ class MultilineTextBox(UIElement):
                     if (self._text_selection_start is not None) and (self._text_selection_end is not None):
                         pyperclip.copy(self.get_selection())
                 elif key == "\x16": # CTRL+V
-                    if self.get_selection():
-                        self.set_selection("")
-                    _l = pyperclip.paste()
-                    if self.single_line:
-                        noline = re.sub("\n+", " ", _l)
-                        self._lines[self.cursor_location.line].insert(self.cursor_location.col, noline)
-                        self.refresh_lines()
-                        self.cursor_location.col += len(noline)
-                        self.save_history()
-                        continue
-                    l = _l.split("\n")
-                    l0 = l[0]
-                    self._lines[self.cursor_location.line].insert(self.cursor_location.col, l0)
-                    
-                    for _line in l[1:-1]:
-                        self.cursor_location.line += 1
-                        self._lines.insert(self.cursor_location.line, [c for c in re.split(r"", _line) if c])
-                    
-                    if len(l) > 1:
-                        self.cursor_location.line += 1
-                        if len(self._lines) <= self.cursor_location.line:
-                            self._lines.append([c for c in re.split(r"", l[-1]) if c])
-                        else:
-                            self._lines.insert(self.cursor_location.line, [])
-                            self._lines[self.cursor_location.line].insert(0, l[-1])
-                    self.refresh_lines()
-                    self.cursor_location.col += len(l[-1])
-                    self.save_history()
+                    self.insert_text(pyperclip.paste())
                 elif key == "\x01": # CTRL+A
                     self._text_selection_start = Cursor(0, 0)
-                    self._text_selection_end = Cursor(len(self._lines)-1, len(self._lines[-1]))
+                    self._text_selection_end = Cursor(self.buffer.line_count()-1, self.buffer.line_length(self.buffer.line_count()-1))
                     self.refresh_highlight()
                 elif key == "\x13": # CTRL+S
-                    content = self.get_content()
+                    content = self.buffer.snapshot() if self._save_snapshot else self.get_content()
                     cursor = self.cursor_location.copy()
                     selection = None
                     if self._text_selection_start and self._text_selection_end:
@@ -559,7 +992,7 @@ class MultilineTextBox(UIElement):
                         continue
                     if self.get_selection():
                         self.set_selection("")
-                    self._lines[self.cursor_location.line].insert(self.cursor_location.col, key)
+                    self._insert(self.cursor_location.line, self.cursor_location.col, key, coalesce=True)
                     self.cursor_location.col += 1
                     if key in self._history_triggers:
                         self.save_history()
@@ -570,6 +1003,7 @@ class MultilineTextBox(UIElement):
                 self._cursor_visible = True
             else:
                 self._cursor_visible = False
+            editor.request_frame(0.5 - (time.time() - self._cursor_tick) % 0.5)
 
             # self._cursor_tick += 1
             # if time.time() % 1 == 0:
@@ -577,5 +1011,13 @@ class MultilineTextBox(UIElement):
             #     self._cursor_visible = not self._cursor_visible
 
 
-            # self.surface = self.font.render(self.get_content(), True, self.text_color)
-            self.refresh_surfaces()
+            self._refresh_dirty()
+
+        w, h = self._size()
+        rect = (X+self.x-1, Y+self.y-1, w+2, h+2)
+        drawn = (rect, self.cursor_location.line, self.cursor_location.col, self._cursor_visible, repr(self._text_selection_start), repr(self._text_selection_end))
+        if drawn != self._drawn or (self.focused and editor.typing):
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0])
+            editor.mark_dirty(rect)
+            self._drawn = drawn
@@ -2,17 +2,16 @@
 
 from UIElement import UIElement
 from RenderPrimitives import Color, Image, Animation
-from Options import TEXT_COLOR, TEXT_BG_COLOR, SCROLL_MULTIPLIER
-from MultilineText import MultilineText
+from Options import TEXT_COLOR, TEXT_BG_COLOR, SCROLL_MULTIPLIER, MINIMAP_WIDTH
+from Gutter import Gutter
 from FunctionalElements import Collapsable
 from MultilineTextBox import MultilineTextBox
+from Minimap import Minimap
+from LineFolds import Fold
 
 class NumberedTextArea(UIElement):
 
-    class Fold:
-        __slots__ = ["lines"]
-        def __init__(self, lines:list):
-            self.lines = lines
+    Fold = Fold # a folded region, see `fold(line)`
 
     def __init__(self, x:int, y:int, width:int, height:int, text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|Image|Animation|tuple|int=TEXT_BG_COLOR, scroll_speed=SCROLL_MULTIPLIER, split_color=None):
         assert width >= 200, "width must be 200 or more (sorry)"
@@ -22,8 +21,12 @@ class NumberedTextArea(UIElement):
         self.height = height
         self.text_color = Color.color(text_color)
         self.text_bg_color = Color.color(text_bg_color)
-        self.lines = MultilineText(0, 0, 75, self.height, f"{'1': >9}", self.text_color, self.text_bg_color)
+        self.lines = Gutter(0, 0, 75, self.height, self.text_color, self.text_bg_color)
         self.editable = MultilineTextBox(2, 0, self.width-75, self.height, "", self.text_color, self.text_bg_color)
+        self.lines.folds = self.editable.folds
+        self.lines.foldable = self.editable.foldable
+        self.lines.on_fold(self.editable.toggle_fold)
+        self.minimap: Minimap|None = None
 
         self.collapsable = Collapsable(
             self.x, self.y,
@@ -51,15 +54,69 @@ class NumberedTextArea(UIElement):
         # print(f"Numbered text area _update_layout!")
         self.lines.min_height = self.editable.min_height = self.height
         self.collapsable.height = self.collapsable.main_area.height = self.collapsable.aside.height = self.height-20
-        self.collapsable.width = self.width-5
-        self.editable.min_width = self.width-75
+        minimap = self.minimap.width if self.minimap is not None else 0
+        self.collapsable.width = self.width-5-minimap
+        self.editable.min_width = self.width-75-minimap
 
 
     def set_content(self, content:str):
         self.editable.set_content(content)
 
+    def set_wrap(self, wrap:bool):
+        """soft wraps the text to the width of the area (see `MultilineTextBox.set_wrap`)"""
+        self.editable.set_wrap(wrap)
+        self.lines.wrap = self.editable.wrap
+
+    def set_minimap(self, show:bool):
+        """shows a `Minimap` of the text on the right of the area, dragging its view rectangle scrolls the text"""
+        if show == (self.minimap is not None):
+            return
+        if show:
+            self.minimap = Minimap(0, 0, MINIMAP_WIDTH, self.collapsable.height, self.editable, self.text_bg_color)
+            self.minimap.on_scroll(self._scroll_to_top)
+            width = -MINIMAP_WIDTH
+        else:
+            width = self.minimap.width
+            self.editable.minimap = None
+            self.minimap = None
+        self.collapsable.width += width
+        self.editable.min_width += width
+
+    def _scroll_to_top(self, line:int):
+        """scrolls so `line` is the first line shown, or as close as the end of the text allows"""
+        area = self.collapsable.main_area
+        offset = -self.editable.row_of(line) * self.editable._height
+        if area.bottom_bound is not None:
+            offset = max(offset, area.bottom_bound)
+        area.offsetY = self.collapsable.aside.offsetY = min(offset, 0)
+
+    def fold(self, line:int) -> Fold|None:
+        """folds the region starting at `line` (by brackets or indentation), clicking a line number does the same"""
+        return self.editable.fold(line)
+
+    def unfold(self, line:int) -> Fold|None:
+        return self.editable.unfold(line)
+
+    def scroll_to_line(self, line:int, col:int=0):
+        """scrolls as little as needed to show `line` (the row with column `col` of it when wrapping)"""
+        h = self.editable._height
+        area = self.collapsable.main_area
+        top = -area.offsetY
+        row = self.editable.row_of(line, col)
+        if row * h < top:
+            offset = -row * h
+        elif (row + 1) * h > top + area.height:
+            offset = -((row + 1) * h - area.height)
+        else:
+            return
+        if area.bottom_bound is not None:
+            offset = max(offset, area.bottom_bound)
+        area.offsetY = self.collapsable.aside.offsetY = min(offset, 0)
+
     def _update(self, editor, X, Y):
         self.collapsable._update(editor, X, Y)
+        if self.minimap is not None:
+            self.minimap._update(editor, X, Y)
         
     def _event(self, editor, X, Y):
         
@@ -72,19 +129,31 @@ class NumberedTextArea(UIElement):
         if self.collapsable.aside.hovered:
             self.collapsable.main_area.offsetY = self.collapsable.aside.offsetY
 
-        lines = len(self.collapsable.main_area.children[0].get_lines())
+        lines = self.editable.buffer.line_count()
 
         # print(f"Numbered Text Area lines: {lines}")
 
-        txt = [f"{i+1: >9}" for i in range(lines)]
-
-        # print(self.collapsable.aside.children[0])
-        self.collapsable.aside.children[0].set_colored_content("\n".join(txt))
+        self.lines.set_line_count(lines)
 
         # if lines == 0:
         #     raise Exception("Numbered Text Editor reached 0 lines, which is meant to be impossible!!")
 
-        d = self.collapsable.main_area.children[0].surfaces[0].get_height()
-
-        self.collapsable.main_area.bottom_bound = -d * (lines-1)
-        self.collapsable.aside.bottom_bound = -d * (lines-1)
+        d = self.editable._height
+        rows = self.editable.row_count()
+
+        self.collapsable.main_area.bottom_bound = -d * (rows-1)
+        self.collapsable.aside.bottom_bound = -d * (rows-1)
+        # folding can leave the view past the end of the text
+        self.collapsable.main_area.clamp()
+        self.collapsable.aside.clamp()
+
+        if self.minimap is not None:
+            area = self.collapsable.main_area
+            self.minimap.x = self.collapsable.x + self.collapsable.width
+            self.minimap.y = self.collapsable.y
+            self.minimap.height = self.collapsable.height
+            top = min(-area.offsetY // d, rows - 1)
+            first = self.editable.line_at(top)
+            last = self.editable.line_at(min(top + area.height // d, rows - 1))
+            self.minimap.set_view(first, last - first + 1)
+            self.minimap._event(editor, X, Y)
@@ -26,4 +26,12 @@ TAB_SIZE = 4
 CURSOR_BLINK_TIME = 50
 CURSOR_COLOR = Color(190, 190, 190)
 SCROLL_MULTIPLIER = 15
+GLYPH_ATLAS = SETTINGS.get("glyph_atlas", False)
+UNDO_STEPS = SETTINGS.get("undo_steps", 1000)
+UNDO_MEMORY = SETTINGS.get("undo_memory", 10_000_000) # characters of text kept by the undo history
+LARGE_FILE_SIZE = SETTINGS.get("large_file_size", 16_000_000) # bytes, FileEditor maps bigger files lazily
+SOFT_WRAP = SETTINGS.get("soft_wrap", False) # whether FileEditor wraps long lines
+TILE_WIDTH = SETTINGS.get("tile_width", 2048) # pixels, wider lines are drawn in tiles of this width (see TiledLine)
+MINIMAP = SETTINGS.get("minimap", False) # whether FileEditor shows a minimap
+MINIMAP_WIDTH = SETTINGS.get("minimap_width", 100) # pixels
 
@@ -36,7 +36,7 @@ class Draggable(UIElement):
     __slots__ = [
         "x", "y", "width", "height", "held",
         "hovered", "hx", "hy", "children",
-        "lock_horizontal", "lock_vertical"
+        "lock_horizontal", "lock_vertical", "_drawn"
     ]
     
     def __init__(self, x:int, y:int, width:int, height:int, lock_horizontal:bool=False, lock_vertical:bool=False, children:list[UIElement]=...):
@@ -51,6 +51,7 @@ class Draggable(UIElement):
         self.children = children if children != ... else []
         self.lock_horizontal = lock_horizontal
         self.lock_vertical = lock_vertical
+        self._drawn = None
     
     def _event(self, editor, X:int, Y:int):
 
@@ -93,6 +94,23 @@ class Draggable(UIElement):
             if not self.lock_horizontal: self.x = (_x - self.hx) - X
             if not self.lock_vertical: self.y = (_y - self.hy) - Y
 
+        self._mark_dirty(editor, (X+self.x, Y+self.y, self.width, self.height))
+
+    def _hitbox(self):
+        if self.children:
+            return None
+        return (self.x, self.y, self.width, self.height)
+
+    def _pointer_idle(self):
+        return not (self.held or self.hovered)
+
+    def _mark_dirty(self, editor, rect):
+        if rect != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn)
+            editor.mark_dirty(rect)
+            self._drawn = rect
+
     def _update(self, editor, X:int, Y:int):
         for child in self.children:
             child._update(editor, X + self.x, Y + self.y)
@@ -183,6 +201,11 @@ class Resizable(Draggable):
         self.width = self.bg.width = self.down_resize.width = self.right_resize.x
         self.height = self.bg.height = self.right_resize.height = self.down_resize.y
 
+        self._mark_dirty(editor, (X+self.x, Y+self.y, self.width+6, self.height+6))
+
+    def _hitbox(self):
+        return None # the resize handles sit outside of the element
+
     def _update(self, editor, X, Y):
         for child in self.children[::-1]:
             child._update(editor, X + self.x, Y + self.y)
@@ -0,0 +1,240 @@
+# pylint: disable=W,R,C,no-member
+
+from UIElement import UIElement
+from Options import FONT
+from FontPool import FontPool
+
+from collections import deque
+from time import perf_counter
+import json
+import pygame
+
+class FrameProfiler:
+    """
+    Records wall time for every element's `_event` and `_update`, plus the editor's own frame phases
+    (`idle`, `pump`, `event`, `render`, `display`, `tick`).
+
+    While enabled, `_event` and `_update` of UIElement and all of its subclasses are wrapped, so nested
+    elements are timed too. `total` times include children, `self` times don't.
+    Classes defined after `enable()` are not wrapped until it's called again.
+    """
+
+    _active = None
+
+    OVERLAY_KEY = pygame.K_F3
+    GRAPH_FRAMES = 120
+
+    __slots__ = [
+        "overlay", "frames", "trace", "classes", "elements", "labels",
+        "_patched", "_stack", "_origin", "_frame", "_frame_start",
+        "_phase", "_phases", "_frame_classes", "_last_classes", "_font"
+    ]
+
+    def __init__(self, overlay:bool=False, history:int=600, trace_limit:int|None=200_000):
+        """
+        overlay: draw the timing overlay on top of the screen (toggled with OVERLAY_KEY while the editor runs)
+        history: how many frames to keep in `frames`
+        trace_limit: how many trace events to keep for `dump_trace()` (oldest are dropped). 0 disables tracing
+        """
+        self.overlay = overlay
+        self.frames: deque[dict] = deque(maxlen=history)
+        self.trace: deque[dict] = deque(maxlen=trace_limit)
+        self.classes: dict[tuple[str, str], list] = {} # (class, phase): [calls, total, self]
+        self.elements: dict[tuple[int, str], list] = {} # (id, phase): [calls, total, self]
+        self.labels: dict[int, str] = {}
+        self._patched: list[tuple[type, str, object]] = []
+        self._stack: list[float] = []
+        self._origin = perf_counter()
+        self._frame = 0
+        self._frame_start = None
+        self._phase: tuple[str, float]|None = None
+        self._phases: dict[str, float] = {}
+        self._frame_classes: dict[str, float] = {}
+        self._last_classes: dict[str, float] = {}
+        self._font = None
+
+    def enable(self):
+        if FrameProfiler._active is not None and FrameProfiler._active is not self:
+            FrameProfiler._active.disable()
+        FrameProfiler._active = self
+
+        patched = {(cls, name) for cls, name, _ in self._patched}
+        classes = [UIElement]
+        while classes:
+            cls = classes.pop()
+            classes += cls.__subclasses__()
+            for name, phase in (("_event", "event"), ("_update", "update")):
+                func = cls.__dict__.get(name, None)
+                if func is None or (cls, name) in patched: continue
+                setattr(cls, name, self._wrap(func, phase))
+                self._patched.append((cls, name, func))
+                patched.add((cls, name))
+
+    def disable(self):
+        for cls, name, func in self._patched:
+            setattr(cls, name, func)
+        self._patched.clear()
+        self._stack.clear()
+        if FrameProfiler._active is self:
+            FrameProfiler._active = None
+
+    @staticmethod
+    def _wrap(func, phase):
+        def timed(element, *args, **kwargs):
+            profiler = FrameProfiler._active
+            if profiler is None:
+                return func(element, *args, **kwargs)
+            stack = profiler._stack
+            stack.append(0.0)
+            start = perf_counter()
+            try:
+                return func(element, *args, **kwargs)
+            finally:
+                duration = perf_counter() - start
+                children = stack.pop()
+                if stack: stack[-1] += duration
+                profiler._record(element, phase, start, duration, duration - children)
+        timed.__name__ = func.__name__
+        timed.__doc__ = func.__doc__
+        timed.__wrapped__ = func
+        return timed
+
+    def _record(self, element, phase, start, duration, self_time):
+        name = type(element).__qualname__
+        key = (name, phase)
+        if key in self.classes:
+            stat = self.classes[key]
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] += self_time
+        else:
+            self.classes[key] = [1, duration, self_time]
+
+        i = id(element)
+        key = (i, phase)
+        if key in self.elements:
+            stat = self.elements[key]
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] += self_time
+        else:
+            self.elements[key] = [1, duration, self_time]
+            self.labels[i] = f"{name}@{i:x}"
+
+        self._frame_classes[name] = self._frame_classes.get(name, 0) + self_time
+
+        if self.trace.maxlen != 0:
+            self.trace.append({
+                "name": name, "cat": phase, "ph": "X",
+                "ts": (start - self._origin) * 1_000_000, "dur": duration * 1_000_000,
+                "pid": 0, "tid": 0, "args": {"element": self.labels[i], "frame": self._frame}
+            })
+
+    def begin_frame(self):
+        self._phase = None
+        self._frame_start = perf_counter()
+        self._phases = {}
+        self._frame_classes = {}
+
+    def end_frame(self):
+        if self._frame_start is None: return
+        self.phase(None)
+        end = perf_counter()
+        self.frames.append({
+            "frame": self._frame,
+            "time": end - self._frame_start,
+            "phases": self._phases
+        })
+        if self.trace.maxlen != 0:
+            self.trace.append({
+                "name": f"frame {self._frame}", "cat": "frame", "ph": "X",
+                "ts": (self._frame_start - self._origin) * 1_000_000, "dur": (end - self._frame_start) * 1_000_000,
+                "pid": 0, "tid": 1
+            })
+        self._last_classes = self._frame_classes
+        self._frame += 1
+        self._frame_start = None
+
+    def phase(self, name:str|None):
+        """ends the current frame phase and starts `name` (None just ends it)"""
+        now = perf_counter()
+        if self._phase is not None:
+            current, start = self._phase
+            self._phases[current] = self._phases.get(current, 0) + now - start
+            if self.trace.maxlen != 0:
+                self.trace.append({
+                    "name": current, "cat": "editor", "ph": "X",
+                    "ts": (start - self._origin) * 1_000_000, "dur": (now - start) * 1_000_000,
+                    "pid": 0, "tid": 1, "args": {"frame": self._frame}
+                })
+        self._phase = None if name is None else (name, now)
+
+    def reset(self):
+        self.frames.clear()
+        self.trace.clear()
+        self.classes.clear()
+        self.elements.clear()
+        self.labels.clear()
+        self._last_classes = {}
+
+    def fps(self, frames:int=60) -> float:
+        recent = list(self.frames)[-frames:]
+        total = sum(f["time"] for f in recent)
+        return len(recent) / total if total else 0.0
+
+    def class_stats(self, by:str="self", limit:int|None=None) -> list[dict]:
+        """per class timings, slowest first. `by` is one of 'self', 'total' or 'calls'"""
+        out = [
+            {"class": name, "phase": phase, "calls": calls, "total": total, "self": self_time}
+            for (name, phase), (calls, total, self_time) in self.classes.items()
+        ]
+        out.sort(key=lambda s: s[by], reverse=True)
+        return out[:limit]
+
+    def element_stats(self, by:str="self", limit:int|None=None) -> list[dict]:
+        """per element timings, slowest first. `by` is one of 'self', 'total' or 'calls'"""
+        out = [
+            {"element": self.labels[i], "phase": phase, "calls": calls, "total": total, "self": self_time}
+            for (i, phase), (calls, total, self_time) in self.elements.items()
+        ]
+        out.sort(key=lambda s: s[by], reverse=True)
+        return out[:limit]
+
+    def dump_trace(self, path:str):
+        """writes the recorded events as Chrome trace-event JSON (open in chrome://tracing or Perfetto)"""
+        with open(path, "w+", encoding="utf-8") as f:
+            json.dump({"traceEvents": list(self.trace), "displayTimeUnit": "ms"}, f)
+
+    def overlay_rect(self, screen:pygame.Surface) -> pygame.Rect:
+        return pygame.Rect(screen.get_width() - 350, 10, 340, 190)
+
+    def draw_overlay(self, screen:pygame.Surface):
+        if self._font is None:
+            self._font = FontPool.get(FONT, 12)
+        rect = self.overlay_rect(screen)
+        panel = pygame.Surface(rect.size, pygame.SRCALPHA, 32)
+        panel.fill((0, 0, 0, 190))
+
+        last = self.frames[-1] if self.frames else {"time": 0, "phases": {}}
+        lines = [f"{self.fps():.1f} fps  {last['time']*1000:.2f} ms"]
+        phases = last["phases"]
+        lines.append("  ".join(f"{k} {phases[k]*1000:.1f}" for k in ("pump", "event", "render", "display") if k in phases))
+        for i, line in enumerate(lines):
+            panel.blit(self._font.render(line, True, (230, 230, 230)), (6, 4 + i * 14))
+
+        # frame time graph, the line is 1/60th of a second
+        graph = pygame.Rect(6, 34, rect.width - 12, 60)
+        pygame.draw.rect(panel, (60, 60, 60), graph, 1)
+        times = [f["time"] for f in list(self.frames)[-self.GRAPH_FRAMES:]]
+        bar = graph.width / self.GRAPH_FRAMES
+        for i, t in enumerate(times):
+            h = min(graph.height, int(t / (1 / 30) * graph.height))
+            color = (90, 200, 90) if t <= 1 / 60 else (220, 180, 60) if t <= 1 / 30 else (220, 70, 70)
+            pygame.draw.rect(panel, color, (graph.x + i * bar, graph.bottom - h, max(1, int(bar)), h))
+        pygame.draw.line(panel, (120, 120, 120), (graph.x, graph.bottom - graph.height // 2), (graph.right - 1, graph.bottom - graph.height // 2))
+
+        top = sorted(self._last_classes.items(), key=lambda c: c[1], reverse=True)[:6]
+        for i, (name, t) in enumerate(top):
+            panel.blit(self._font.render(f"{t*1000:7.2f} ms  {name}", True, (200, 200, 200)), (6, graph.bottom + 4 + i * 14))
+
+        screen.blit(panel, rect.topleft)
@@ -147,7 +147,7 @@ class Animation(UIElement):
         "sprite_height", "source", "offsetX", "offsetY",
         "_sheet", "_rX", "_rY", "_frames" "frames", "surface",
         "order", "loop", "fps", "s", "hovered", "_hovered",
-        "current_frame", "t"
+        "current_frame", "t", "_drawn"
     ]
     
     def __init__(self, x:int, y:int, **options):
@@ -280,6 +280,7 @@ class Animation(UIElement):
 
         self.current_frame = 0
         self.t = None
+        self._drawn = None
 
     def copy(self):
         a = Animation(self.x, self.y, custom=self._frames, order=self.order, loop=self.loop, fps=self.fps)
@@ -352,6 +353,16 @@ class Animation(UIElement):
                     else:
                         self._on_end()
 
+            if self.loop or self.current_frame < len(self.order) - 1:
+                editor.request_frame(self.t + 1/self.fps - t)
+
+        drawn = (X+self.x, Y+self.y, self.sprite_width, self.sprite_height, self.current_frame)
+        if drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0:4])
+            editor.mark_dirty(drawn[0:4])
+            self._drawn = drawn
+
         self._hovered = self.hovered
         if editor.collides((editor.mouse_pos), (X+self.x, Y+self.y, self.sprite_width, self.sprite_height)):
             if editor._hovering is not None:
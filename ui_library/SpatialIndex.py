@@ -0,0 +1,112 @@
+# pylint: disable=W,R,C,no-member
+
+class SpatialIndex:
+    """
+    Uniform grid of child hitboxes, used to only send events to children under the mouse.
+
+    Children opt in by returning a rect from `_hitbox()` (relative to their parent) and
+    True from `_pointer_idle()` when they don't need events while the mouse is elsewhere.
+    Everything else is always dispatched.
+
+    The grid is rebuilt when the children list changes length or identity, when a
+    dispatched child's hitbox moved, or after `invalidate()` is called.
+    Call `invalidate()` if you move children from outside of their `_event`.
+    """
+
+    __slots__ = [
+        "cell_size", "cells", "rects", "others", "positions",
+        "active", "_signature", "_valid"
+    ]
+
+    def __init__(self, cell_size:int=64):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        self.rects: dict[int, tuple] = {}
+        self.others: list[int] = []
+        self.positions: dict[int, int] = {}
+        self.active: set[int] = set() # ids of children that asked for events last frame
+        self._signature = None
+        self._valid = False
+
+    def invalidate(self):
+        self._valid = False
+
+    def _cell_range(self, x, y, w, h):
+        c = self.cell_size
+        return range(int(x // c), int((x + w) // c) + 1), range(int(y // c), int((y + h) // c) + 1)
+
+    def build(self, children:list):
+        self.cells.clear()
+        self.rects.clear()
+        self.others.clear()
+        self.positions.clear()
+
+        for i, child in enumerate(children):
+            self.positions[id(child)] = i
+            rect = child._hitbox() if hasattr(child, "_hitbox") else None
+            if rect is None:
+                self.others.append(i)
+                continue
+            self.rects[i] = rect
+            xs, ys = self._cell_range(*rect)
+            for cx in xs:
+                for cy in ys:
+                    if (cx, cy) in self.cells:
+                        self.cells[(cx, cy)].append(i)
+                    else:
+                        self.cells[(cx, cy)] = [i]
+
+        self._signature = (id(children), len(children))
+        self._valid = True
+
+    def refresh(self, children:list):
+        if (not self._valid) or self._signature != (id(children), len(children)):
+            self.build(children)
+
+    def query_point(self, x, y) -> list[int]:
+        out = []
+        for i in self.cells.get((int(x // self.cell_size), int(y // self.cell_size)), ()):
+            rx, ry, rw, rh = self.rects[i]
+            if rx <= x <= rx + rw and ry <= y <= ry + rh:
+                out.append(i)
+        return out
+
+    def query_rect(self, x, y, w, h) -> set[int]:
+        out = set()
+        xs, ys = self._cell_range(x, y, w, h)
+        if len(xs) * len(ys) > len(self.cells):
+            cells = [c for (cx, cy), c in self.cells.items() if cx in xs and cy in ys]
+        else:
+            cells = [self.cells.get((cx, cy), ()) for cx in xs for cy in ys]
+        for cell in cells:
+            for i in cell:
+                rx, ry, rw, rh = self.rects[i]
+                if rx <= x + w and x <= rx + rw and ry <= y + h and y <= ry + rh:
+                    out.add(i)
+        return out
+
+    def dispatch(self, editor, children:list, X:int, Y:int):
+        """calls `_event` on the children that are under the mouse or still active, in reverse order like a normal event pass"""
+        self.refresh(children)
+        mx, my = editor.mouse_pos
+        targets = set(self.query_point(mx - X, my - Y))
+        targets.update(self.positions[a] for a in self.active if a in self.positions)
+        targets.update(self.others)
+
+        self.active.clear()
+        for i in sorted(targets, reverse=True):
+            if i >= len(children): continue
+            child = children[i]
+            child._event(editor, X, Y)
+            if i in self.rects:
+                if child._hitbox() != self.rects[i]:
+                    self._valid = False
+                if not child._pointer_idle():
+                    self.active.add(id(child))
+
+    def visible(self, children:list, x:int, y:int, w:int, h:int) -> list:
+        """returns the children that intersect the given area (plus every child without a hitbox), in draw order"""
+        self.refresh(children)
+        targets = self.query_rect(x, y, w, h)
+        targets.update(self.others)
+        return [children[i] for i in sorted(targets) if i < len(children)]
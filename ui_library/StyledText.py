@@ -0,0 +1,93 @@
+# pylint: disable=W,R,C,no-member
+"""
+Styled text is plain text plus, per line, a sorted list of non-overlapping `(start, end, style)` runs
+(columns of that line, end exclusive). A style is an `(R, G, B)` color, text outside of any run uses
+the widget's text color.
+
+`MultilineText`, `MultilineTextBox` and the highlighters use runs directly. `\\033[38;2;R;G;Bm` ANSI
+escapes are only supported through `from_ansi` / `to_ansi`.
+"""
+
+import re
+from bisect import bisect_right
+
+_ANSI = re.compile(r"\033\[((?:\d+;?)*)m")
+
+def from_ansi(text:str) -> tuple[list[str], list[list[tuple]]]:
+    """splits ANSI colored text into (lines, runs per line). `\\033[0m` resets to the default color"""
+    lines = []
+    runs = []
+    line = []
+    line_runs = []
+    col = 0
+    color = None
+    pos = 0
+
+    def add(t:str):
+        nonlocal col, line, line_runs
+        parts = t.split("\n")
+        for i, part in enumerate(parts):
+            if i:
+                lines.append("".join(line))
+                runs.append(line_runs)
+                line, line_runs, col = [], [], 0
+            if part:
+                if color is not None:
+                    if line_runs and line_runs[-1][1] == col and line_runs[-1][2] == color:
+                        line_runs[-1] = (line_runs[-1][0], col + len(part), color)
+                    else:
+                        line_runs.append((col, col + len(part), color))
+                line.append(part)
+                col += len(part)
+
+    for m in _ANSI.finditer(text):
+        add(text[pos:m.start()])
+        pos = m.end()
+        codes = m.group(1).split(";")
+        if codes[0:2] == ["38", "2"] and len(codes) >= 5:
+            color = (int(codes[2]), int(codes[3]), int(codes[4]))
+        elif codes in (["0"], [""]):
+            color = None
+    add(text[pos:])
+    lines.append("".join(line))
+    runs.append(line_runs)
+    return lines, runs
+
+def to_ansi(lines:list[str], runs:list[list[tuple]]) -> str:
+    """the inverse of `from_ansi`"""
+    escapes = {}
+    out = []
+    for line, line_runs in zip(lines, runs):
+        pos = 0
+        for start, end, color in line_runs:
+            if (escape := escapes.get(color)) is None:
+                escape = escapes[color] = f"\033[38;2;{color[0]};{color[1]};{color[2]}m"
+            out += (line[pos:start], escape, line[start:end], "\033[0m")
+            pos = end
+        out += (line[pos:], "\n")
+    return "".join(out[0:-1])
+
+def to_segments(line:str, runs:list[tuple], default) -> list[tuple]:
+    """`(color, text)` pieces of a line for drawing, text outside of runs gets `default`"""
+    if not runs:
+        return [(default, line)]
+    segments = []
+    pos = 0
+    for start, end, color in runs:
+        if start > pos:
+            segments.append((default, line[pos:start]))
+        segments.append((color, line[start:end]))
+        pos = end
+    if pos < len(line):
+        segments.append((default, line[pos:]))
+    return segments
+
+def slice_runs(runs:list[tuple], start:int, end:int) -> list[tuple]:
+    """the runs of columns [start, end) of a line, shifted so `start` is column 0"""
+    out = []
+    for i in range(bisect_right(runs, start, key=lambda run: run[1]), len(runs)):
+        s, e, color = runs[i]
+        if s >= end:
+            break
+        out.append((max(s, start) - start, min(e, end) - start, color))
+    return out
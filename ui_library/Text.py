@@ -2,7 +2,9 @@
 
 from UIElement import UIElement
 from RenderPrimitives import Color
-from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, FONT
+from Options import TEXT_COLOR, TEXT_BG_COLOR, TEXT_SIZE, FONT, GLYPH_ATLAS
+from GlyphAtlas import GlyphAtlas
+from FontPool import FontPool
 
 import pygame
 
@@ -10,10 +12,10 @@ class Text(UIElement):
     __slots__ = [
         "x", "y", "content", "_content",
         "min_width", "text_color", "text_bg_color",
-        "text_size", "font", "surface", "width", "height"
+        "text_size", "font", "surface", "width", "height", "_drawn", "atlas"
     ]
 
-    def __init__(self, x:int, y:int, min_width:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE):
+    def __init__(self, x:int, y:int, min_width:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE, glyph_atlas:bool=GLYPH_ATLAS):
         """
         newlines are NOT supported (use MultilineTextBox instead)
         
@@ -26,9 +28,11 @@ class Text(UIElement):
         self.text_color = Color.color(text_color)
         self.text_bg_color = Color.color(text_bg_color)
         self.text_size = text_size
-        self.font = pygame.font.Font(FONT, text_size)
-        self.surface = self.font.render(self.content, True, tuple(self.text_color))
+        self.font = FontPool.get(FONT, text_size)
+        self.atlas = GlyphAtlas.get(FONT, text_size) if glyph_atlas else None
+        self.surface = self._render(self.content)
         self.width, self.height = self.surface.get_size()
+        self._drawn = None
 
     def set_text(self, text:str) -> None:
         """
@@ -37,11 +41,24 @@ class Text(UIElement):
         """
         self.content = text
 
-    def _event(self, *_):
+    def _render(self, text:str) -> pygame.Surface:
+        if self.atlas is not None:
+            return self.atlas.render(text, tuple(self.text_color))
+        return self.font.render(text, True, tuple(self.text_color))
+
+    def _event(self, editor, X, Y):
         if self.content != self._content:
             self._content = self.content
-            self.surface = self.font.render(self.content, True, tuple(self.text_color))
+            self.surface = self._render(self.content)
             self.width = self.surface.get_width()
+
+        _x, _y = self.surface.get_size()
+        drawn = (X+self.x-1, Y+self.y-1, max(_x, self.min_width)+2, _y+2, self._content)
+        if drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0:4])
+            editor.mark_dirty(drawn[0:4])
+            self._drawn = drawn
         
     def _update(self, editor, X, Y):
         _x, _y = self.surface.get_size()
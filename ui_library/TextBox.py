@@ -3,7 +3,11 @@
 from UIElement import UIElement
 from RenderPrimitives import Color, Animation, Image
 from Options import TEXT_COLOR, TEXT_BG_COLOR, \
-    TEXT_SIZE, FONT, CURSOR_BLINK_TIME, PATH, TAB_SIZE
+    TEXT_SIZE, FONT, CURSOR_BLINK_TIME, PATH, TAB_SIZE, GLYPH_ATLAS, TILE_WIDTH
+from GlyphAtlas import GlyphAtlas
+from TiledLine import TiledLine
+from FontPool import FontPool
+from TextMetrics import TextMetrics
 
 import pygame
 import pyperclip
@@ -16,10 +20,10 @@ class TextBox(UIElement):
         "_letters", "cursor_location", "_cursor_surface",
         "_cursor_tick", "_blink", "_cursor_visible",
         "_text_selection_end", "_text_selection_start",
-        "_highlight", "highlight"
+        "_highlight", "highlight", "_drawn", "atlas", "metrics", "_rendered"
     ]
     
-    def __init__(self, x:int, y:int, min_width:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE):
+    def __init__(self, x:int, y:int, min_width:int=1, content:str="", text_color:Color|tuple|int=TEXT_COLOR, text_bg_color:Color|tuple|int=TEXT_BG_COLOR, text_size:int=TEXT_SIZE, glyph_atlas:bool=GLYPH_ATLAS):
         self.x = x
         self.y = y
         assert min_width >= 1, "Min width must be 1 or more"
@@ -28,21 +32,25 @@ class TextBox(UIElement):
         self.text_color = Color.color(text_color)
         self.text_bg_color = Color.color(text_bg_color)
         self.text_size = text_size
-        self.font = pygame.font.Font(FONT, text_size)
-        self.surface = self.font.render(content, True, tuple(self.text_color))
+        self.font = FontPool.get(FONT, text_size)
+        self.atlas = GlyphAtlas.get(FONT, text_size) if glyph_atlas else None
+        self.metrics = TextMetrics.get(FONT, text_size)
+        self._rendered = content # the text `surface` shows
+        self.surface = self._render(content)
         self.focused = False
         self.hovered = False
         self._letters = [l for l in content]
         self.cursor_location = 0
         self._cursor_surface = pygame.Surface((1, text_size))
-        self._cursor_tick = 0
-        self._blink = CURSOR_BLINK_TIME
+        self._cursor_tick = 0 # editor.now() when the cursor was last shown by a click
+        self._blink = CURSOR_BLINK_TIME / 60 # seconds between toggles, CURSOR_BLINK_TIME counts 60 fps frames
         self._cursor_visible = False
         self._text_selection_end = None
         self._text_selection_start = None
         self._highlight = pygame.image.load(f"{PATH}/highlight.png")#pygame.Surface((1, self.text_size), pygame.SRCALPHA, 32) # pylint: disable=no-member
         #self._highlight.fill(TEXT_HIGHLIGHT)
         self.highlight = self._highlight.copy()
+        self._drawn = None
 
     def get_selection(self) -> str|None:
         if self._text_selection_start and self._text_selection_end:
@@ -74,11 +82,20 @@ class TextBox(UIElement):
         if self._text_selection_start and self._text_selection_end:
             a = min(self._text_selection_start, self._text_selection_end)
             b = max(self._text_selection_start, self._text_selection_end)
-            letter = self.font.render("T", True, (0, 0, 0))
-            w = letter.get_width()
-            width = (b - a) * w
+            width = self.metrics.width(self.get_content()[a:b])
             self.highlight = pygame.transform.scale(self._highlight, (width, self.text_size))
 
+    def text_size_of(self, text:str) -> tuple[int, int]:
+        """(width, height) of `text` without rendering it"""
+        return self.metrics.size(text)
+
+    def _render(self, text:str) -> pygame.Surface|TiledLine:
+        if (width := self.metrics.width(text) + 1) > TILE_WIDTH:
+            return TiledLine(text, [], self.text_color, width, self.metrics, self.font, self.atlas)
+        if self.atlas is not None:
+            return self.atlas.render(text, tuple(self.text_color))
+        return self.font.render(text, True, tuple(self.text_color))
+
     def _event(self, editor, X, Y):
         w, h = self.surface.get_size()
         _x, _y = editor.mouse_pos
@@ -93,11 +110,9 @@ class TextBox(UIElement):
 
         if editor.left_mouse_down():
             if self.hovered:
-                letter = self.font.render("T", True, (0, 0, 0))
-                w = letter.get_width()# - 1
                 dx = _x - (X + self.x)
 
-                self.cursor_location = min(int(round(dx/w)), len(self._letters))
+                self.cursor_location = self.metrics.column_at(self.get_content(), dx)
                 
                 if pygame.K_LSHIFT in editor.keys and self._text_selection_start:
                     self._text_selection_end = self.cursor_location
@@ -107,7 +122,7 @@ class TextBox(UIElement):
 
                 self.focused = True
                 self._cursor_visible = True
-                self._cursor_tick = 0
+                self._cursor_tick = editor.now()
                 
             else:
                 self.focused = False
@@ -198,12 +213,21 @@ class TextBox(UIElement):
                     self.cursor_location += 1
                 #print(self.get_content())
 
-            self._cursor_tick += 1
-            if self._cursor_tick >= self._blink:
-                self._cursor_tick = 0
-                self._cursor_visible = not self._cursor_visible
+            elapsed = editor.now() - self._cursor_tick
+            self._cursor_visible = elapsed % (2 * self._blink) < self._blink
+            editor.request_frame(self._blink - elapsed % self._blink) # one frame at the next toggle
 
-            self.surface = self.font.render(self.get_content(), True, tuple(self.text_color))
+            if (content := self.get_content()) != self._rendered:
+                self._rendered = content
+                self.surface = self._render(content)
+
+        _w, _h = self.surface.get_size()
+        drawn = (X+self.x-1, Y+self.y-1, _w+2, _h+2, self.get_content(), self.cursor_location, self._cursor_visible)
+        if drawn != self._drawn:
+            if self._drawn is not None:
+                editor.mark_dirty(self._drawn[0:4])
+            editor.mark_dirty(drawn[0:4])
+            self._drawn = drawn
 
     def _update(self, editor, X, Y):
         _x, _y = self.surface.get_size()
@@ -212,10 +236,14 @@ class TextBox(UIElement):
                 self.text_bg_color.resize(_x+2, _y+2)._update(editor, X+self.x-1, Y+self.y-1)
             else:
                 editor.screen.fill(self.text_bg_color, (X+self.x-1, Y+self.y-1, _x+2, _y+2))
-        editor.screen.blit(self.surface, (X+self.x, Y+self.y))
+        if self.surface.__class__ is TiledLine:
+            clip = editor.screen.get_clip()
+            editor.screen.blits(self.surface.blits(X+self.x, Y+self.y, clip.left, clip.right), False)
+        else:
+            editor.screen.blit(self.surface, (X+self.x, Y+self.y))
 
         if self._cursor_visible:
-            h = self.font.render(self.get_content()[0:self.cursor_location], True, (0, 0, 0)) # This is not shown on screen, only used to get width
-            editor.screen.blit(self._cursor_surface, (X+self.x+h.get_width(), Y+self.y+2))
+            w = self.text_size_of(self.get_content()[0:self.cursor_location])[0]
+            editor.screen.blit(self._cursor_surface, (X+self.x+w, Y+self.y+2))
 
     def on_enter(self, text:str) -> None: ... # pylint: disable=unused-argument
@@ -0,0 +1,371 @@
+# pylint: disable=W,R,C,no-member
+
+from collections import deque
+
+class _Fenwick:
+    """prefix sums over a list of ints with O(log n) point updates and searches"""
+
+    __slots__ = ["tree", "size"]
+
+    def __init__(self, values:list[int]):
+        self.build(values)
+
+    def build(self, values:list[int]):
+        self.size = len(values)
+        tree = [0] + list(values)
+        for i in range(1, self.size + 1):
+            j = i + (i & -i)
+            if j <= self.size:
+                tree[j] += tree[i]
+        self.tree = tree
+
+    def append(self, value:int):
+        self.size += 1
+        i = self.size
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+
+    def add(self, index:int, delta:int):
+        index += 1
+        tree = self.tree
+        while index <= self.size:
+            tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index:int) -> int:
+        """sum of the first `index` values"""
+        total = 0
+        tree = self.tree
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, value:int) -> tuple[int, int]:
+        """(i, prefix(i)) for the first i where prefix(i + 1) > value"""
+        index = 0
+        total = 0
+        step = 1 << self.size.bit_length()
+        tree = self.tree
+        while step:
+            nxt = index + step
+            if nxt <= self.size and total + tree[nxt] <= value:
+                index = nxt
+                total += tree[nxt]
+            step >>= 1
+        return index, total
+
+
+class LazyChunk:
+    """
+    Lines of a TextBuffer that are still in a file, bytes [start, end) of `source` (a bytes-like object
+    such as an mmap). Every chunk but the last one of the file ends with a newline.
+    `lines` and `chars` are the counts the buffer indexes the chunk with (see `MappedFile`).
+    """
+
+    __slots__ = [
+        "source", "start", "end", "lines", "chars", "cache"
+    ]
+
+    def __init__(self, source, start:int, end:int, lines:int, chars:int):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.lines = lines
+        self.chars = chars
+        self.cache: list[str]|None = None
+
+    def load(self) -> list[str]:
+        lines = str(self.source[self.start:self.end], "utf-8", "replace").replace("\r\n", "\n").split("\n")
+        if self.end < len(self.source):
+            lines.pop()
+        return lines
+
+
+class TextBuffer:
+    """
+    Line based rope used as the text storage of `MultilineTextBox`.
+
+    Lines are kept as strings in chunks of at most `2 * CHUNK` lines. Two Fenwick trees over the
+    chunks index line counts and character counts (newlines included), so finding a line, converting
+    between offsets and (line, col), inserting and deleting are O(log n) plus the size of one chunk,
+    instead of joining or re-splitting the whole document. The counts of every chunk are kept too, an edit
+    that splits or merges chunks only counts the chunks it made and rebuilds the trees from the kept counts.
+
+    Offsets count every character of `text()`, newlines included.
+
+    Chunks can also be `LazyChunk`s, which are only decoded when one of their lines is needed. At most
+    `LOADED_CHUNKS` of them keep their decoded lines, an edited chunk becomes a regular one.
+
+    `snapshot()` shares the chunks with the copy and marks them shared in both, a shared chunk is only
+    copied the first time one of the two buffers edits it, so a snapshot costs O(chunks) instead of O(lines).
+    """
+
+    CHUNK = 512
+    LOADED_CHUNKS = 256
+
+    __slots__ = [
+        "_chunks", "_line_counts", "_char_counts", "_line_index", "_char_index", "_line_total", "_char_total", "_loaded", "_shared"
+    ]
+
+    def __init__(self, text:str=""):
+        self._loaded: deque[LazyChunk] = deque()
+        self.set_text(text)
+
+    def set_text(self, text:str):
+        lines = text.split("\n")
+        size = self.CHUNK
+        self._chunks = [lines[i:i+size] for i in range(0, len(lines), size)]
+        self._loaded.clear()
+        self._reindex()
+
+    def set_chunks(self, chunks:list[list[str]|LazyChunk]):
+        """replaces the text with chunks of lines (see `LazyChunk`)"""
+        self._chunks = list(chunks) or [[""]]
+        self._loaded.clear()
+        self._reindex()
+
+    def append_chunks(self, chunks:list[list[str]|LazyChunk]):
+        """adds chunks of lines after the last line"""
+        for chunk in chunks:
+            lines, chars = self._counts(chunk)
+            self._chunks.append(chunk)
+            self._shared.append(False)
+            self._line_counts.append(lines)
+            self._char_counts.append(chars)
+            self._line_index.append(lines)
+            self._char_index.append(chars)
+            self._line_total += lines
+            self._char_total += chars
+
+    def snapshot(self) -> "TextBuffer":
+        """a copy that later edits of this buffer don't change. chunks are shared until either buffer edits them, lazy ones aren't decoded"""
+        copy = TextBuffer.__new__(TextBuffer)
+        copy._loaded = deque()
+        copy._chunks = self._chunks[:]
+        self._shared = [True] * len(self._chunks)
+        copy._shared = self._shared[:]
+        copy._line_counts = self._line_counts[:]
+        copy._char_counts = self._char_counts[:]
+        for name in ("_line_index", "_char_index"):
+            index = _Fenwick.__new__(_Fenwick)
+            index.tree = getattr(self, name).tree[:]
+            index.size = getattr(self, name).size
+            setattr(copy, name, index)
+        copy._line_total = self._line_total
+        copy._char_total = self._char_total
+        return copy
+
+    def chunk_lines(self):
+        """yields the lines of every chunk. lazy chunks are decoded without being kept, so this is safe from another thread on a snapshot"""
+        for c in self._chunks:
+            yield c if c.__class__ is list else (c.cache or c.load())
+
+    def pieces(self):
+        """yields the text one chunk at a time, like `chunk_lines`"""
+        for i, lines in enumerate(self.chunk_lines()):
+            if i:
+                yield "\n"
+            yield "\n".join(lines)
+
+    def encoded(self):
+        """
+        yields the text as UTF-8 one chunk at a time, like `pieces`. the bytes of lazy chunks are copied from
+        their source without being decoded
+        """
+        last = len(self._chunks) - 1
+        for i, c in enumerate(self._chunks):
+            if c.__class__ is list:
+                yield "\n".join(c).encode("utf-8")
+                if i < last:
+                    yield b"\n"
+                continue
+            data = c.source[c.start:c.end]
+            if b"\r" in data:
+                data = data.replace(b"\r\n", b"\n")
+            # every chunk of the file but its last one ends with the newline that separates it from the next
+            ends = c.end < len(c.source)
+            yield data if ends == (i < last) else data[0:-1] if ends else data + b"\n"
+
+    def materialize(self):
+        """decodes every `LazyChunk`, after this the buffer doesn't read from their source anymore"""
+        for i, c in enumerate(self._chunks):
+            if c.__class__ is not list:
+                self._own(i)
+
+    @staticmethod
+    def _counts(chunk:list[str]|LazyChunk) -> tuple[int, int]:
+        if chunk.__class__ is list:
+            return len(chunk), sum(map(len, chunk)) + len(chunk)
+        return chunk.lines, chunk.chars
+
+    def _lines_of(self, chunk:int) -> list[str]:
+        c = self._chunks[chunk]
+        if c.__class__ is list:
+            return c
+        if (lines := c.cache) is None:
+            lines = c.cache = c.load()
+            self._loaded.append(c)
+            if len(self._loaded) > self.LOADED_CHUNKS:
+                self._loaded.popleft().cache = None
+        return lines
+
+    def _own(self, chunk:int) -> list[str]:
+        """the lines of a chunk as a list that can be edited, copied first if a snapshot shares it"""
+        c = self._chunks[chunk]
+        if c.__class__ is not list or self._shared[chunk]:
+            c = self._chunks[chunk] = list(self._lines_of(chunk))
+            self._shared[chunk] = False
+        return c
+
+    def _reindex(self):
+        """counts every chunk and builds the trees"""
+        counts = [self._counts(c) for c in self._chunks]
+        self._shared = [False] * len(self._chunks)
+        self._line_counts = [c[0] for c in counts]
+        self._char_counts = [c[1] for c in counts]
+        self._rebuild()
+
+    def _rebuild(self):
+        """builds the trees from the kept counts, O(chunks) without reading any line"""
+        self._line_index = _Fenwick(self._line_counts)
+        self._char_index = _Fenwick(self._char_counts)
+        self._line_total = sum(self._line_counts)
+        self._char_total = sum(self._char_counts) - 1
+
+    def _locate(self, line:int) -> tuple[int, int]:
+        """(chunk, line within chunk) of `line`"""
+        if not 0 <= line < self._line_total:
+            raise IndexError(f"line {line} out of range")
+        chunk, before = self._line_index.find(line)
+        return chunk, line - before
+
+    def __len__(self) -> int:
+        return self._char_total
+
+    def line_count(self) -> int:
+        return self._line_total
+
+    def line(self, line:int) -> str:
+        chunk, i = self._locate(line)
+        c = self._chunks[chunk]
+        return (c if c.__class__ is list else self._lines_of(chunk))[i]
+
+    def line_length(self, line:int) -> int:
+        chunk, i = self._locate(line)
+        return len(self._lines_of(chunk)[i])
+
+    def lines(self, start:int=0, end:int|None=None) -> list[str]:
+        """lines [start, end)"""
+        end = self._line_total if end is None else min(end, self._line_total)
+        if start >= end:
+            return []
+        chunk, i = self._locate(start)
+        out = []
+        count = end - start
+        while len(out) < count:
+            out += self._lines_of(chunk)[i:i + count - len(out)]
+            chunk += 1
+            i = 0
+        return out
+
+    def text(self) -> str:
+        return "\n".join("\n".join(self._lines_of(c)) for c in range(len(self._chunks)))
+
+    def offset(self, line:int, col:int) -> int:
+        """(line, col) to an offset"""
+        chunk, i = self._locate(line)
+        lines = self._lines_of(chunk)
+        return self._char_index.prefix(chunk) + sum(map(len, lines[0:i])) + i + min(col, len(lines[i]))
+
+    def position(self, offset:int) -> tuple[int, int]:
+        """offset to (line, col)"""
+        offset = max(0, min(offset, self._char_total))
+        chunk, before = self._char_index.find(offset)
+        if chunk >= len(self._chunks):
+            return self._line_total - 1, len(self.line(self._line_total - 1))
+        line = self._line_index.prefix(chunk)
+        offset -= before
+        lines = self._lines_of(chunk)
+        for l in lines:
+            if offset <= len(l):
+                return line, offset
+            offset -= len(l) + 1
+            line += 1
+        return line - 1, len(lines[-1])
+
+    def get_range(self, start:tuple[int, int], end:tuple[int, int]) -> str:
+        """text between two (line, col) positions"""
+        (sl, sc), (el, ec) = start, end
+        if sl == el:
+            return self.line(sl)[sc:ec]
+        lines = self.lines(sl, el + 1)
+        lines[0] = lines[0][sc:]
+        lines[-1] = lines[-1][0:ec]
+        return "\n".join(lines)
+
+    def get_text(self, start:int, end:int) -> str:
+        """text between two offsets"""
+        return self.get_range(self.position(start), self.position(end))
+
+    @staticmethod
+    def end_of(line:int, col:int, text:str) -> tuple[int, int]:
+        """the (line, col) right after `text` if it was inserted at (line, col)"""
+        if (n := text.count("\n")):
+            return line + n, len(text) - text.rfind("\n") - 1
+        return line, col + len(text)
+
+    def insert(self, line:int, col:int, text:str) -> tuple[int, int]:
+        """inserts `text` at (line, col), returns the (line, col) right after it"""
+        current = self.line(line)
+        new = (current[0:col] + text + current[col:]).split("\n")
+        self._splice(line, line, new)
+        return line + len(new) - 1, len(new[-1]) - (len(current) - col)
+
+    def delete(self, start:tuple[int, int], end:tuple[int, int]) -> str:
+        """removes the text between two (line, col) positions and returns it"""
+        (sl, sc), (el, ec) = start, end
+        removed = self.get_range(start, end)
+        self._splice(sl, el, [self.line(sl)[0:sc] + self.line(el)[ec:]])
+        return removed
+
+    def replace(self, start:tuple[int, int], end:tuple[int, int], text:str) -> tuple[int, int]:
+        """replaces the text between two positions, returns the (line, col) after the new text"""
+        (sl, sc), (el, ec) = start, end
+        first = self.line(sl)
+        last = first if el == sl else self.line(el)
+        new = (first[0:sc] + text + last[ec:]).split("\n")
+        self._splice(sl, el, new)
+        return sl + len(new) - 1, len(new[-1]) - (len(last) - ec)
+
+    def _splice(self, first:int, last:int, new:list[str]):
+        """replaces lines [first, last] with `new`"""
+        c1, i1 = self._locate(first)
+        c2, i2 = (c1, i1) if last == first else self._locate(last)
+        chunks = self._chunks
+        if c1 == c2:
+            chunk = self._own(c1)
+            old_chars = sum(map(len, chunk[i1:i2+1])) + (i2 - i1 + 1)
+            chunk[i1:i2+1] = new
+            if 0 < len(chunk) <= 2 * self.CHUNK:
+                line_delta = len(new) - (i2 - i1 + 1)
+                char_delta = sum(map(len, new)) + len(new) - old_chars
+                self._line_index.add(c1, line_delta)
+                self._char_index.add(c1, char_delta)
+                self._line_counts[c1] += line_delta
+                self._char_counts[c1] += char_delta
+                self._line_total += line_delta
+                self._char_total += char_delta
+                return
+            merged = chunk
+        else:
+            merged = self._lines_of(c1)[0:i1] + new + self._lines_of(c2)[i2+1:]
+        size = self.CHUNK
+        pieces = [merged[i:i+size] for i in range(0, len(merged), size)]
+        if not pieces and len(chunks) == c2 - c1 + 1:
+            pieces = [[""]]
+        chunks[c1:c2+1] = pieces
+        self._shared[c1:c2+1] = [False] * len(pieces)
+        counts = [self._counts(c) for c in pieces]
+        self._line_counts[c1:c2+1] = [c[0] for c in counts]
+        self._char_counts[c1:c2+1] = [c[1] for c in counts]
+        self._rebuild()
@@ -0,0 +1,76 @@
+# pylint: disable=W,R,C,no-member
+
+from Options import FONT, TEXT_SIZE
+from FontPool import FontPool
+
+import pygame
+
+class TextMetrics:
+    """
+    Measures text for a font without rendering it: cached per character advances, x <-> column
+    mapping and the line height. Monospace fonts are measured with arithmetic only.
+
+    Metrics are shared per (font path, size), use `TextMetrics.get()` to get one.
+    """
+
+    _metrics: dict[tuple[str, int], "TextMetrics"] = {}
+
+    __slots__ = [
+        "font", "advances", "advance", "height", "monospace"
+    ]
+
+    @classmethod
+    def get(cls, path:str=FONT, size:int=TEXT_SIZE) -> "TextMetrics":
+        key = (path, size)
+        if (metrics := cls._metrics.get(key)) is None:
+            metrics = cls._metrics[key] = cls(FontPool.get(path, size))
+        return metrics
+
+    def __init__(self, font:pygame.font.Font):
+        self.font = font
+        self.advances: dict[str, int] = {}
+        self.height = font.size("_")[1]
+        self.advance = self.char_width(" ")
+        self.monospace = self.char_width("i") == self.char_width("W") == self.advance
+
+    def char_width(self, char:str) -> int:
+        """horizontal advance of a single character"""
+        if (w := self.advances.get(char)) is None:
+            metrics = self.font.metrics(char)
+            w = self.advances[char] = metrics[0][4] if metrics and metrics[0] else self.font.size(char)[0]
+        return w
+
+    def width(self, text:str) -> int:
+        if self.monospace and text.isascii():
+            return len(text) * self.advance
+        char_width = self.char_width
+        return sum(char_width(c) for c in text)
+
+    def widths(self, lines:list[str]) -> list[int]:
+        """`width` of each line, monospace ASCII lines are measured in bulk"""
+        if self.monospace and all(map(str.isascii, lines)):
+            advance = self.advance
+            return [n * advance for n in map(len, lines)]
+        return list(map(self.width, lines))
+
+    def size(self, text:str) -> tuple[int, int]:
+        """(advance width, line height) of `text`"""
+        return self.width(text), self.height
+
+    def x_of(self, text:str, col:int) -> int:
+        """x offset of column `col` of `text`"""
+        return self.width(text[0:col])
+
+    def column_at(self, text:str, x:float) -> int:
+        """the column of `text` closest to the x offset `x`"""
+        if x <= 0:
+            return 0
+        if self.monospace and text.isascii():
+            return min(int(round(x / self.advance)), len(text))
+        pos = 0
+        for col, c in enumerate(text):
+            w = self.char_width(c)
+            if x < pos + w / 2:
+                return col
+            pos += w
+        return len(text)
@@ -0,0 +1,156 @@
+# pylint: disable=W,R,C,no-member
+
+from bisect import bisect_left
+from collections import deque
+import threading
+import time
+import re
+
+class TextSearch:
+    """
+    Finds every match of a regex or literal pattern in a `TextBuffer` on a worker thread, over a
+    `snapshot()` of the buffer so the UI thread can keep editing. Matches never span lines.
+
+    `matches` holds sorted `(line, start, end)` tuples of the non empty matches and grows as `poll()`
+    picks up the batches the worker found so far. Starting a new search (or `cancel()`) abandons the running one.
+    The text box calls `lines_changed` on every edit: the matches of a finished search are patched by rescanning
+    only the edited lines, a running one is restarted (see `invalidate()`).
+    """
+
+    RESTART_DELAY = 0.25
+
+    __slots__ = [
+        "pattern", "regex", "case", "matches", "done",
+        "_compiled", "_generation", "_results", "_stale", "_empty"
+    ]
+
+    def __init__(self, pattern:str, regex:bool=False, case:bool=True):
+        self.pattern = pattern
+        self.regex = regex
+        self.case = case
+        self._compiled = re.compile(pattern if regex else re.escape(pattern), 0 if case else re.IGNORECASE)
+        self.matches: list[tuple[int, int, int]] = []
+        self.done = False
+        self._generation = 0
+        self._results: deque[tuple[int, list|None]] = deque()
+        self._stale: float|None = None # time.monotonic() of the last edit the running search missed
+        self._empty = False # whether an empty match was skipped, `matches` then don't list every line `subn` changes
+
+    def start(self, buffer):
+        """searches a snapshot of `buffer` from the top, the previous search is cancelled"""
+        self._generation += 1
+        self.matches = []
+        self.done = False
+        self._stale = None
+        self._empty = False
+        threading.Thread(target=self._run, args=(buffer.snapshot(), self._generation), name="text search", daemon=True).start()
+
+    def cancel(self):
+        self._generation += 1
+        self.done = True
+
+    def invalidate(self):
+        """
+        the buffer changed, `matches` are re-found by the first `poll()` after `RESTART_DELAY` seconds without
+        another change, so typing doesn't restart the search on every key
+        """
+        self._stale = time.monotonic()
+        self.done = False
+
+    def lines_changed(self, buffer, first:int, old:int, new:int):
+        """lines [first, first+old) of `buffer` were replaced by `new` lines"""
+        if not self.done:
+            # the worker counts lines of its snapshot, which the edit didn't change
+            self.invalidate()
+            return
+        matches = self.matches
+        i = bisect_left(matches, (first,))
+        j = bisect_left(matches, (first + old,), i)
+        found = self._scan(buffer.lines(first, first + new), first)
+        if new == old:
+            matches[i:j] = found
+        else:
+            shift = new - old
+            matches[i:] = found + [(line + shift, start, end) for line, start, end in matches[j:]]
+
+    def poll(self, buffer) -> bool:
+        """picks up new matches (restarting the search if the buffer changed), returns whether `matches` changed"""
+        changed = False
+        if self._stale is not None and time.monotonic() - self._stale >= self.RESTART_DELAY:
+            self.start(buffer)
+            changed = True
+        results = self._results
+        while results:
+            generation, batch = results.popleft()
+            if generation != self._generation:
+                continue
+            if batch is None:
+                self.done = True
+            else:
+                self.matches += batch
+            changed = True
+        return changed
+
+    def current(self) -> bool:
+        """True when `matches` are complete and the buffer wasn't edited since"""
+        return self.done and self._stale is None
+
+    def _scan(self, lines:list[str], line:int) -> list[tuple[int, int, int]]:
+        """the matches of `lines`, the first of which is `line`"""
+        finditer = self._compiled.finditer
+        batch = []
+        for text in lines:
+            for m in finditer(text):
+                if m.end() > m.start():
+                    batch.append((line, m.start(), m.end()))
+                else:
+                    self._empty = True
+            line += 1
+        return batch
+
+    def _run(self, snapshot, generation:int):
+        line = 0
+        for lines in snapshot.chunk_lines():
+            if generation != self._generation:
+                return
+            if batch := self._scan(lines, line):
+                self._results.append((generation, batch))
+            line += len(lines)
+        self._results.append((generation, None))
+
+    def next_index(self, line:int, col:int) -> int|None:
+        """index of the first match starting at or after (line, col), wrapping around"""
+        if not self.matches:
+            return None
+        i = bisect_left(self.matches, (line, col))
+        return i if i < len(self.matches) else 0
+
+    def previous_index(self, line:int, col:int) -> int|None:
+        """index of the last match starting before (line, col), wrapping around"""
+        if not self.matches:
+            return None
+        return (bisect_left(self.matches, (line, col)) - 1) % len(self.matches)
+
+    def template(self, replacement:str) -> str:
+        """`replacement` as a `re.sub` template. regex replacements can use group references like `\\1`, literal ones are taken as is"""
+        return replacement if self.regex else replacement.replace("\\", "\\\\")
+
+    def replacements(self, text:str, template:str) -> list[tuple[int, int, str]]:
+        """(start, end, replacement) of every match in `text`, the replacements `re.sub` makes"""
+        if "\\" not in template: # no group references or escapes, every match gets the template itself
+            return [(m.start(), m.end(), template) for m in self._compiled.finditer(text)]
+        return [(m.start(), m.end(), m.expand(template)) for m in self._compiled.finditer(text)]
+
+    def lines(self, buffer) -> list[int]:
+        """the lines of `buffer` with matches. uses `matches` when they are current and complete, otherwise searches right away"""
+        if self.current() and not self._empty:
+            return sorted({m[0] for m in self.matches})
+        search = self._compiled.search
+        out = []
+        line = 0
+        for lines in buffer.chunk_lines():
+            for text in lines:
+                if search(text) is not None:
+                    out.append(line)
+                line += 1
+        return out
@@ -0,0 +1,86 @@
+# pylint: disable=W,R,C,no-member
+
+from Options import TILE_WIDTH
+from StyledText import to_segments, slice_runs
+from GlyphAtlas import GlyphAtlas
+from TextMetrics import TextMetrics
+
+import pygame
+from bisect import bisect_right
+from itertools import accumulate
+
+class TiledLine:
+    """
+    A line of text wider than `TILE_WIDTH` pixels, drawn as fixed width tiles instead of one surface as wide
+    as the line (SDL can't allocate surfaces past its size limit, and most of a long line is off screen anyway).
+
+    Tiles are rendered the first time they are drawn and `blits()` only returns the ones inside the horizontal
+    window being drawn, at most `KEPT` tiles stay rendered. Text starts 1 pixel in like the surfaces of short
+    lines, and a character crossing a tile edge is drawn on both tiles, so positions match `TextMetrics`.
+    """
+
+    KEPT = 32
+
+    __slots__ = [
+        "text", "runs", "color", "width", "height", "metrics", "font", "atlas", "_tiles", "_offsets"
+    ]
+
+    def __init__(self, text:str, runs:list[tuple], color, width:int, metrics:TextMetrics, font:pygame.font.Font, atlas:GlyphAtlas|None=None):
+        self.text = text
+        self.runs = runs
+        self.color = color
+        self.width = width
+        self.height = metrics.height
+        self.metrics = metrics
+        self.font = font
+        self.atlas = atlas
+        self._tiles: dict[int, pygame.Surface] = {}
+        self._offsets: list[int]|None = None # x of every column, only for text that isn't monospace ASCII
+
+    def get_size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def _columns(self, left:int, right:int) -> tuple[int, int, int]:
+        """(first, last, x of first) of the columns drawn between the pixels [left, right) of the line"""
+        metrics = self.metrics
+        text = self.text
+        if metrics.monospace and text.isascii():
+            advance = metrics.advance
+            first = max(0, (left - 1) // advance - 1)
+            return first, min(len(text), (right - 1) // advance + 2), first * advance
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(map(metrics.char_width, text))]
+        offsets = self._offsets
+        first = max(0, bisect_right(offsets, left - 1) - 2)
+        return first, min(len(text), bisect_right(offsets, right - 1) + 1), offsets[first]
+
+    def _render(self, index:int) -> pygame.Surface:
+        left = index * TILE_WIDTH
+        right = min(left + TILE_WIDTH, self.width)
+        first, last, x = self._columns(left, right)
+        segments = to_segments(self.text[first:last], slice_runs(self.runs, first, last), self.color)
+        surface = pygame.Surface((right - left, self.height), pygame.SRCALPHA)
+        x += 1 - left
+        if self.atlas is not None:
+            self.atlas.draw(surface, segments, x, 0)
+            return surface
+        for col, segment in segments:
+            s = self.font.render(segment, True, tuple(col))
+            surface.blit(s, (x, 0))
+            x += s.get_width()
+        return surface
+
+    def blits(self, x:int, y:int, left:int, right:int) -> list[tuple[pygame.Surface, tuple[int, int]]]:
+        """`(tile, position)` of the tiles between the screen x `left` and `right` of the line drawn at (x, y)"""
+        tiles = self._tiles
+        first = max(0, (left - x) // TILE_WIDTH)
+        last = min(-(-self.width // TILE_WIDTH), -((x - right) // TILE_WIDTH))
+        out = []
+        for i in range(first, last):
+            if (tile := tiles.get(i)) is None:
+                tile = tiles[i] = self._render(i)
+            out.append((tile, (x + i * TILE_WIDTH, y)))
+        if len(tiles) > self.KEPT:
+            for i in [i for i in tiles if not first <= i < last][0:len(tiles) - self.KEPT]:
+                del tiles[i]
+        return out
@@ -4,3 +4,9 @@ class UIElement:
         raise NotImplementedError(f"Please implement '_event' for {self}")
     def _update(self, editor, X, Y):
         raise NotImplementedError(f"Please implement '_update' for {self}")
+    def _hitbox(self):
+        """(x, y, width, height) relative to the parent, used by SpatialIndex. None means the element always gets events"""
+        return None
+    def _pointer_idle(self):
+        """True when the element doesn't need events while the mouse is outside of its hitbox"""
+        return False
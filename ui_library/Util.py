@@ -155,6 +155,16 @@ def warp(surf: pygame.Surface,
     # swap x and y once again...
     return out, pixel_rect
 
+def visible_rows(surface:pygame.Surface, top:int, row_height:int, count:int) -> tuple[int, int]:
+    """
+    [first, last) of `count` rows of `row_height` pixels, drawn from y = `top` downwards,
+    that land inside the clip area of `surface` (the window of a Scrollable when drawn inside one)
+    """
+    clip = surface.get_clip()
+    first = min(count, max(0, (clip.top - top) // row_height))
+    last = min(count, max(first, -((top - clip.bottom) // row_height)))
+    return first, last
+
 
 class Selection:
     
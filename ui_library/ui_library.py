@@ -16,22 +16,26 @@ import random
 # 3D rendering
 from shapely.geometry.polygon import Polygon as Poly
 
-# Things needed to move and resize pygame window
-import mouse
-from ctypes import windll, WINFUNCTYPE, POINTER
-from ctypes.wintypes import BOOL, HWND, RECT
-from win32api import GetMonitorInfo, MonitorFromPoint # pylint: disable=no-name-in-module
+# Things needed to move and resize pygame window (windows only, WindowFrame needs them)
+try:
+    import mouse
+    from ctypes import windll, WINFUNCTYPE, POINTER
+    from ctypes.wintypes import BOOL, HWND, RECT
+    from win32api import GetMonitorInfo, MonitorFromPoint # pylint: disable=no-name-in-module
+except (ImportError, ValueError):
+    mouse = windll = WINFUNCTYPE = POINTER = BOOL = HWND = RECT = GetMonitorInfo = MonitorFromPoint = None
 from pygame._sdl2.video import Window, Texture # pylint: disable=no-name-in-module
 
 # import components
 from Options import PATH, FONT, SETTINGS, TEXT_SIZE, \
     TEXT_COLOR, TEXT_BG_COLOR, TEXT_HIGHLIGHT, TAB_SIZE, \
     TEXT_BG_COLOR_LIGHTER, BUTTON_HOVER_COLOR, POPUP_FADE_COLOR, \
-    START_RESOLUTION, LINE_SEPERATOR_COLOR, BUTTON_CLICK_COLOR
+    START_RESOLUTION, LINE_SEPERATOR_COLOR, BUTTON_CLICK_COLOR, \
+    LARGE_FILE_SIZE, SOFT_WRAP, MINIMAP
 from Util import expand_text_lists, \
     rotate, rotate3D, rotate3DV, \
     quad_to_tris, invert_tris, \
-    angle_between, warp, \
+    angle_between, warp, visible_rows, \
     Selection, Cursor
 from UIElement import UIElement
 from RenderPrimitives import Color, Image, Animation
@@ -43,7 +47,25 @@ from MultilineTextBox import MultilineTextBox
 from Geometry import Box, Polygon, Poly3D
 from Organizers import LayeredObjects, Draggable, Resizable, Link
 from FunctionalElements import Button, Tabs, Scrollable, Collapsable
+from Gutter import Gutter
 from NumberedTextArea import NumberedTextArea
+from SpatialIndex import SpatialIndex
+from Profiler import FrameProfiler
+from InputReplay import InputReplay
+from TextMetrics import TextMetrics
+from GlyphAtlas import GlyphAtlas
+from FontPool import FontPool
+from TextBuffer import TextBuffer, LazyChunk
+from TextSearch import TextSearch
+from LineWrap import LineWrap
+from LineFolds import LineFolds, Fold
+from TiledLine import TiledLine
+from Minimap import Minimap
+from MappedFile import MappedFile
+from FileSaver import FileSaver
+from EditHistory import EditHistory, Edit
+from Highlighter import Highlighter, JsonHighlighter, DsHighlighter, MarkdownHighlighter
+from StyledText import from_ansi, to_ansi, to_segments
 
 
 pygame.init() # pylint: disable=no-member
@@ -118,7 +140,9 @@ class ContextTree(UIElement):
         if not self.visible:
             self.set_visibility(False)
     
-    def __call__(self, *_, **__):
+    def __call__(self, editor=None, *_, **__):
+        if editor is not None:
+            editor.mark_dirty()
         self.toggle_visibility()
     
     def _update(self, editor, X, Y):
@@ -190,6 +214,8 @@ class DirectoryTree(UIElement):
                     f.expand_tree(tree[f.name])
 
         def _toggle(self, editor): # "editor" is an argument as it is passed by the button this function is bound to
+            if editor is not None:
+                editor.mark_dirty()
             self.collapsed = not self.collapsed
             self.fold_arrow = DirectoryTree.folds["closed" if self.collapsed else "open"]
         
@@ -368,6 +394,9 @@ class Popup(UIElement):
 
         if self.tick > 0:
             self.tick -= 1
+            editor.request_frame()
+            if self.tick == 0:
+                editor.mark_dirty()
             return
 
         for child in self.children[::-1]:
@@ -378,7 +407,24 @@ class Popup(UIElement):
 
 class Editor:
 
-    def __init__(self, caption, icon=None, width=START_RESOLUTION[0], height=START_RESOLUTION[1]) -> None:
+    DIRTY_RECT_LIMIT = 4
+
+    def __init__(self, caption, icon=None, width=START_RESOLUTION[0], height=START_RESOLUTION[1], dirty_rendering:bool=False, target_fps:int|None=60, idle_mode:bool=False, idle_timeout:float=1.0, spatial_index:bool=False, profile:bool|FrameProfiler=False) -> None:
+        """
+        dirty_rendering: if True, only the screen regions reported through `mark_dirty()` are redrawn and flipped each frame.
+        Elements that change what they draw must call `editor.mark_dirty(rect)` from `_event` for this mode to work.
+
+        target_fps: frame rate cap. None or 0 runs uncapped.
+
+        idle_mode: if True, the loop sleeps until the next input event when no element has requested a frame through `request_frame()`.
+        idle_timeout: the longest the loop will sleep for, in seconds.
+
+        spatial_index: if True, each layer keeps a SpatialIndex of its elements and only elements under the mouse
+        (or still hovered/held) get `_event` calls. Call `invalidate_index(layer)` after moving elements from outside of their `_event`.
+
+        profile: if True (or a FrameProfiler), time every element's `_event`/`_update` and the frame phases.
+        results are on `editor.profiler`. FrameProfiler.OVERLAY_KEY toggles the timing overlay.
+        """
         self.screen:pygame.Surface = None
         self.caption = caption
         self.icon = icon
@@ -408,6 +454,167 @@ class Editor:
         self.unicode = {}
         self.keys = []
         self.typing = []
+        self.dirty_rendering = dirty_rendering
+        self._dirty_rects: list[pygame.Rect] = []
+        self._full_redraw = True
+        self._popup = None
+        self.target_fps = target_fps
+        self.idle_mode = idle_mode
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+        self._next_frame = None
+        self._waited_events = []
+        self.spatial_index = spatial_index
+        self._layer_indexes: dict[int, SpatialIndex] = {}
+        if profile is True:
+            profile = FrameProfiler()
+        self.profiler: FrameProfiler|None = profile or None
+        self.record_input: InputReplay|None = None
+        self.frame_times: list[float] = []
+        self._replay: InputReplay|None = None
+        self._frame_index = 0
+        self._frame_limit = None
+
+    def now(self) -> float:
+        """current time in seconds. virtual (frame based) while running headless so replays are deterministic"""
+        if self._replay is not None:
+            return self._frame_index * self._replay.frame_time
+        return time.time()
+
+    def _poll_input(self):
+        if self._replay is not None:
+            mouse_buttons, mouse_pos, events = self._replay.step(self._frame_index)
+            events += self._waited_events + pygame.event.get()
+        else:
+            mouse_buttons = list(pygame.mouse.get_pressed())
+            mouse_pos = pygame.mouse.get_pos()
+            events = self._waited_events + pygame.event.get()
+            if self.record_input is not None:
+                self.record_input.capture(self._frame_index, mouse_buttons, mouse_pos, events)
+        self._waited_events.clear()
+        return mouse_buttons, mouse_pos, events
+
+    def run_headless(self, replay:InputReplay|None=None, frames:int|None=None) -> list[float]:
+        """
+        runs the main loop on the SDL dummy video driver with input from `replay` instead of the real mouse and keyboard.
+        stops after `frames` frames (default: the length of the replay) or when `running` is set to False.
+        target_fps and idle_mode are ignored. returns each frame's wall time in seconds (also kept in `frame_times`).
+        """
+        if os.environ.get("SDL_VIDEODRIVER") != "dummy":
+            pygame.display.quit()
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            pygame.display.init()
+
+        self._replay = replay or InputReplay()
+        self._replay.reset()
+        self._frame_limit = self._replay.length() if frames is None else frames
+        self.running = True
+        try:
+            self.run()
+        finally:
+            self._replay = None
+            self._frame_limit = None
+        return self.frame_times
+
+    def _phase(self, name:str|None):
+        if self.profiler is not None:
+            self.profiler.phase(name)
+
+    def invalidate_index(self, layer:int|None=None):
+        if layer is None:
+            for index in self._layer_indexes.values():
+                index.invalidate()
+        elif layer in self._layer_indexes:
+            self._layer_indexes[layer].invalidate()
+
+    def request_frame(self, delay:float=0):
+        """
+        asks the editor to run another frame within `delay` seconds.
+        elements with time based work (animations, cursor blinking, timers) call this from `_event` so idle_mode doesn't sleep through it.
+        """
+        t = time.time() + max(0, delay)
+        if self._next_frame is None or t < self._next_frame:
+            self._next_frame = t
+
+    def _wait_for_activity(self):
+        if self.unicode or self.keys or any(self.mouse):
+            return
+
+        if self._next_frame is None:
+            timeout = self.idle_timeout
+        else:
+            timeout = min(self._next_frame - time.time(), self.idle_timeout)
+
+        if self.target_fps and timeout <= 1 / self.target_fps:
+            return
+
+        if timeout > 0:
+            event = pygame.event.wait(int(timeout * 1000))
+            if event.type != pygame.NOEVENT: # pylint: disable=no-member
+                self._waited_events.append(event)
+
+    def mark_dirty(self, rect=None):
+        """
+        reports a screen region that needs to be redrawn this frame.
+        rect: (x, y, width, height), or None to redraw the whole screen.
+        does nothing unless dirty_rendering is enabled.
+        """
+        if not self.dirty_rendering: return
+        if rect is None:
+            self._full_redraw = True
+        elif not self._full_redraw:
+            self._dirty_rects.append(pygame.Rect(rect))
+
+    def _merge_dirty_rects(self) -> list[pygame.Rect]:
+        screen_rect = self.screen.get_rect()
+        rects = []
+        for rect in self._dirty_rects:
+            rect = rect.clip(screen_rect)
+            if rect.width <= 0 or rect.height <= 0: continue
+            i = rect.collidelist(rects)
+            while i != -1:
+                rect.union_ip(rects.pop(i))
+                i = rect.collidelist(rects)
+            rects.append(rect)
+        if len(rects) > self.DIRTY_RECT_LIMIT:
+            rects = [rects[0].unionall(rects[1:])]
+        return rects
+
+    def _draw(self, layers):
+        self.screen.fill((24, 24, 24))
+
+        for l in layers:
+
+            for i in self.layers[l]:
+                i._update(self, 0, 0)
+
+        if Popup._popup:
+            Popup._popup._update(self, 0, 0)
+
+        if self.profiler is not None and self.profiler.overlay:
+            self.profiler.draw_overlay(self.screen)
+
+    def _render(self, layers):
+        self._phase("render")
+        if self.profiler is not None and self.profiler.overlay:
+            self.mark_dirty(self.profiler.overlay_rect(self.screen))
+
+        if self.dirty_rendering and not self._full_redraw:
+            rects = self._merge_dirty_rects()
+            for rect in rects:
+                self.screen.set_clip(rect)
+                self._draw(layers)
+            self.screen.set_clip(None)
+            self._phase("display")
+            if rects:
+                pygame.display.update(rects)
+        else:
+            self._draw(layers)
+            self._phase("display")
+            pygame.display.update()
+
+        self._dirty_rects.clear()
+        self._full_redraw = False
 
     def set_window_location(self, new_x, new_y):
         hwnd = pygame.display.get_wm_info()['window']
@@ -452,32 +659,55 @@ class Editor:
         
         pygame.display.set_caption(self.caption)
 
-        while self.running:
-            self.screen.fill((24, 24, 24))
+        self._full_redraw = True
+        self._next_frame = None
+
+        if self.profiler is not None:
+            self.profiler.enable()
+
+        self._frame_index = 0
+        self.frame_times = []
+        headless = self._replay is not None
+
+        while self.running and (self._frame_limit is None or self._frame_index < self._frame_limit):
+            frame_start = time.perf_counter()
+            if self.profiler is not None:
+                self.profiler.begin_frame()
+            if self.idle_mode and not headless:
+                self._phase("idle")
+                self._wait_for_activity()
+            self._phase("pump")
+            self._next_frame = None
+
             self.previous_keys = self.keys.copy()
             self.previous_mouse = self.mouse
             self._hovered = False
             self._hovering = None
-            self.mouse = list(pygame.mouse.get_pressed()) #[mouse.is_pressed(mouse.LEFT), mouse.is_pressed(mouse.MIDDLE), mouse.is_pressed(mouse.RIGHT)]#list(a and b for a, b in zip(pygame.mouse.get_pressed(), ))
-            self.mouse_pos = pygame.mouse.get_pos()
+            self.mouse, self.mouse_pos, events = self._poll_input()
+            if self.screen.get_size() != (self.width, self.height):
+                self.mark_dirty()
             self.width, self.height = self.Width, self.Height = self.screen.get_size()
             self.typing.clear()
             self.scroll = 0
 
-            for event in pygame.event.get():
+            for event in events:
 
                 if event.type == pygame.MOUSEWHEEL: # pylint: disable=no-member
                     self.scroll = event.y
 
                 elif event.type == pygame.KEYDOWN: # pylint: disable=no-member
 
+                    if self.profiler is not None and event.key == FrameProfiler.OVERLAY_KEY:
+                        self.profiler.overlay = not self.profiler.overlay
+                        self.mark_dirty()
+
                     if event.key not in self.keys:
                         self.keys.append(event.key)
 
                     un = self.unicodes.get(event.key, event.unicode)
 
                     if un:
-                        self.unicode.update({un: time.time()})
+                        self.unicode.update({un: self.now()})
                         self.typing.append(un)
                         
                 elif event.type == pygame.KEYUP: # pylint: disable=no-member
@@ -490,12 +720,18 @@ class Editor:
                     if un and un in self.unicode.keys():
                         self.unicode.pop(un)
 
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED): # pylint: disable=no-member
+                    self.mark_dirty()
+
                 elif event.type == pygame.QUIT: # pylint: disable=no-member
+                    if self.profiler is not None:
+                        self.profiler.end_frame()
+                        self.profiler.disable()
                     pygame.quit() # pylint: disable=no-member
                     self.running = False
                     return
 
-            nt = time.time()
+            nt = self.now()
 
             for key, t in self.unicode.items():
 
@@ -507,6 +743,12 @@ class Editor:
             layers = [*self.layers.keys()]
             layers.sort()
 
+            if Popup._popup is not self._popup:
+                self._popup = Popup._popup
+                self.mark_dirty()
+
+            self._phase("event")
+
             if Popup._popup:
                 Popup._popup._update_layout(self)
                 Popup._popup._event(self, 0, 0)
@@ -516,8 +758,13 @@ class Editor:
             # _layers.reverse()
 
             for l in layers[::-1]:
-                for i in self.layers[l][::-1]:
-                    i._event(self, 0, 0)
+                if self.spatial_index:
+                    if l not in self._layer_indexes:
+                        self._layer_indexes[l] = SpatialIndex()
+                    self._layer_indexes[l].dispatch(self, self.layers[l], 0, 0)
+                else:
+                    for i in self.layers[l][::-1]:
+                        i._event(self, 0, 0)
 
             if rmd:
 
@@ -531,15 +778,21 @@ class Editor:
                         except Exception as e:
                             print("\n".join(e.args))
 
-            for l in layers:
+            self._render(layers)
 
-                for i in self.layers[l]:
-                    i._update(self, 0, 0)
+            if self.target_fps and not headless:
+                self._phase("tick")
+                self.clock.tick(self.target_fps)
 
-            if Popup._popup:
-                Popup._popup._update(self, 0, 0)
-                
-            pygame.display.update()
+            if self.profiler is not None:
+                self.profiler.end_frame()
+
+            if headless:
+                self.frame_times.append(time.perf_counter() - frame_start)
+            self._frame_index += 1
+
+        if self.profiler is not None:
+            self.profiler.disable()
 
 class FileEditor(UIElement):
     
@@ -551,129 +804,110 @@ class FileEditor(UIElement):
         self.file_location = file_location
         self.file_name = file_name
         
+        self.edit_area = NumberedTextArea(self.x, self.y, self.width, self.height, text_bg_color=TEXT_BG_COLOR_LIGHTER, scroll_speed=45)
+        self.edit_area.editable.on_save(self.save_file, snapshot=True)
+        self.edit_area.set_wrap(SOFT_WRAP)
+        self.edit_area.set_minimap(MINIMAP)
+        self.saver = FileSaver.get()
+        self._on_saved = self._default_saved_event
+        self._save_queued = False
+
+        # files past LARGE_FILE_SIZE are memory mapped and indexed in the background, only the lines on screen
+        # are ever read. the first screen is indexed right away
+        self.large_file = os.path.getsize(self.file_location) >= LARGE_FILE_SIZE
+        self._loader: MappedFile|None = None
+        self._loading = False
+        if self.large_file:
+            self.contents = None
+            self._loader = MappedFile(self.file_location)
+            self.edit_area.editable.set_chunks(self._loader.index())
+            self._loader.start()
+            self._loading = True
+            return
+
         with open(self.file_location, "r+", encoding="utf-8") as f:
             self.contents = f.read()
         
-        self.edit_area = NumberedTextArea(self.x, self.y, self.width, self.height, text_bg_color=TEXT_BG_COLOR_LIGHTER, scroll_speed=45)
         self.edit_area.set_content(self.contents)
         self.edit_area.editable.save_history()
-        self.edit_area.editable.on_save(self.save_file)
-
-        # TODO: finish undo/redo then add file saving!
+        self.saver.remember(self.file_location, self.contents)
 
         match file_name.rsplit(".", 1)[-1]:
             case "json"|"piskel":
-                self.edit_area.editable.color_text = self.json_colors
+                self.edit_area.editable.set_highlighter(JsonHighlighter())
 
             case "ds"|"dungeon_script"|"dse":
-                self.edit_area.editable.color_text = self.ds_colors
+                self.edit_area.editable.set_highlighter(DsHighlighter())
 
             case "md":
-                self.edit_area.editable.color_text = self.md_colors
-
-        self.edit_area.editable.refresh_surfaces()
+                self.edit_area.editable.set_highlighter(MarkdownHighlighter())
 
     def __repr__(self):
         return f"File Editor: {self.file_location}/{self.file_name}"
 
-    def save_file(self, text_box:MultilineTextBox, content:str, selection:Selection|None, cursorPos:Cursor):
-        with open(self.file_location, "w+", encoding="utf-8") as f:
-            f.write(content)
-
-    def json_colors(self, text:str) -> str:
+    def save_file(self, text_box:MultilineTextBox, content:TextBuffer|str, selection:Selection|None, cursorPos:Cursor):
+        """
+        queues the content on the background `FileSaver`. it's written to a temp file that is renamed over the file,
+        unedited parts of a mapped large file are copied from the map. on Windows, which can't replace a file that
+        is still mapped, the file is decoded and unmapped first
+        """
+        if self._loading:
+            # only part of the file is in the buffer yet, save once all of it is
+            self._save_queued = True
+            return
+        if self._loader is not None and os.name == "nt":
+            text_box.buffer.materialize()
+            self._loader.close()
+            self._loader = None
+            if isinstance(content, TextBuffer):
+                content = text_box.buffer.snapshot() # the old snapshot still reads from the closed map
+        self.saver.save(self.file_location, content, self._saved)
+
+    def find(self, pattern:str, regex:bool=False, case:bool=True) -> TextSearch:
+        """starts a background search of the file, see `MultilineTextBox.find`"""
+        return self.edit_area.editable.find(pattern, regex, case)
+
+    def find_next(self) -> tuple[int, int]|None:
+        if (found := self.edit_area.editable.find_next()) is not None:
+            self.edit_area.scroll_to_line(*found)
+        return found
+
+    def find_previous(self) -> tuple[int, int]|None:
+        if (found := self.edit_area.editable.find_previous()) is not None:
+            self.edit_area.scroll_to_line(*found)
+        return found
+
+    def replace_all(self, replacement:str) -> int:
+        return self.edit_area.editable.replace_all(replacement)
+
+    def on_saved(self, function):
+        """Decorator for a function
+
+        This function is called on the UI thread when a save of this file finished
+
+        passes:
+            file_editor (FileEditor): the editor that saved
+            result (bool | Exception): True if the file was written, False if it was unchanged, or the error that stopped the save
+        """
+        self._on_saved = function
+        return function
 
-        def repl(match:re.Match) -> str:
-            t = match.group()
+    def _default_saved_event(self, _, result:bool|Exception):
+        if isinstance(result, Exception):
+            print(f"Failed to save {self.file_location}: {result}")
 
-            if (m := re.match(r"(\"(?:\\.|[^\"\\])*\":)", t)): # "...":
-                t = re.sub(r"(\\.)", "\033[38;2;215;186;125m\\1\033[38;2;156;220;254m", m.group())
-                return f"\033[38;2;156;220;254m{t[0:-1]}\033[0m:"
-            
-            elif (m := re.match(r"(\"(?:\\.|[^\"\\])*\")", t)): # "..."
-                t = re.sub(r"(\\.)", "\033[38;2;215;186;125m\\1\033[38;2;206;145;120m", m.group())
-                return f"\033[38;2;206;145;120m{t}\033[0m"
-            
-            elif (m := re.match(r"\b(true|false|null)\b", t)): # keywords - and/or/not/...
-                return f"\033[38;2;86;156;214m{m.group()}\033[0m"
-            
-            elif (m := re.match(r"\d+(?:\.\d+)?", t)):
-                return f"\033[38;2;181;206;168m{m.group()}\033[0m"
-            
-            else:
-                return t
+    def _saved(self, path:str, result:bool|Exception):
+        self._on_saved(self, result)
 
-        return re.sub(r"((?:\"(?:\\.|[^\"\\])*\":)|(?:\"(?:\\.|[^\"\\])*\")|\d+(\.\d+)?|\b(true|false|null)\b)", repl, text)
+    # ANSI colored versions of the highlighters, the editor itself highlights incrementally
+    def json_colors(self, text:str) -> str:
+        return JsonHighlighter().ansi(text)
 
     def ds_colors(self, text:str) -> str:
-
-        def repl(match:re.Match) -> str:
-            t = match.group()
-
-            if (m := re.match(r"(\/\*(?:\\.|\*[^/]|[^*])*\*\/|\/\/.*)", t)): # /* */ # //
-                return f"\033[38;2;106;153;85m{m.group()}\033[0m"
-            
-            elif (m := re.match(r"(\"(?:\\.|[^\"\\])*\"|\'(?:\\.|[^\'\\])*\')", t)): # "..." # '...'
-                t = re.sub(r"(\\.|`[^`]*`)", "\033[38;2;215;186;125m\\1\033[38;2;206;145;120m", m.group())
-                return f"\033[38;2;206;145;120m{t}\033[0m"
-            
-            elif (m := re.match(r"\[([^:]+:)((?:[^/\]]+/)*)([^\]]+)\]", t)): # [engine:combat/start]
-                ns, g, f = m.groups()
-                return f"[\033[38;2;86;156;214m{ns}\033[38;2;156;220;254m{g}\033[38;2;220;220;170m{f}\033[0m]"
-            
-            elif (m := re.match(r"<([^>]+)>", t)): # <variables>
-                t = m.groups()[0]
-
-                if t.startswith("#"):
-                    v = re.sub(r"([./])", "\033[0m\\1\033[38;2;209;105;105m", t)
-                    return f"<\033[38;2;209;105;105m{v}\033[0m>"
-                
-                elif t.startswith("%"):
-                    v = re.sub(r"([./])", "\033[0m\\1\033[38;2;79;193;255m", t)
-                    return f"<\033[38;2;79;193;255m{v}\033[0m>"
-                
-                elif t.startswith("$"):
-                    v = re.sub(r"([./])", "\033[0m\\1\033[38;2;220;220;170m", t)
-                    return f"<\033[38;2;220;220;170m{v}\033[0m>"
-                
-                else:
-                    v = re.sub(r"([./])", "\033[0m\\1\033[38;2;78;201;176m", t)
-                    return f"<\033[38;2;78;201;176m{v}\033[0m>"
-                
-            elif (m := re.match(r"(@[^:]*:|#|%|\$[a-zA-Z_][a-zA-Z0-9_]*)", t)): # @tags:
-                return f"\033[38;2;79;193;255m{m.group()}\033[0m"
-            
-            elif (m := re.match(r"\b(if|elif|else|break|return|pass|for|in)\b", t)): # keywords - if/elif/else/...
-                return f"\033[38;2;197;134;192m{m.group()}\033[0m"
-            
-            elif (m := re.match(r"\b(true|false|none|not|and|or)\b", t)): # keywords - and/or/not/...
-                return f"\033[38;2;86;156;214m{m.group()}\033[0m"
-            
-            elif (m := re.match(r"\d+(?:\.\d+)?", t)):
-                return f"\033[38;2;181;206;168m{m.group()}\033[0m"
-            
-            else:
-                return t
-            
-        return re.sub(r"(\/\*(?:\\.|\*[^/]|[^*])*\*\/|\/\/.*|(?:\"(?:\\.|[^\"\\])*\"|\'(?:\\.|[^\'\\])*\')|\[[^:]+:[^\]]+\]|<=|>=|<<|>>|==|!=|<[^>]+>|@[^:]+:|\$[a-zA-Z_0-9]+|\d+(?:\.\d+)?|\b(and|if|or|not|elif|else|not|return|break|pass|for|in)\b|#|%)", repl, text)
+        return DsHighlighter().ansi(text)
 
     def md_colors(self, text:str) -> str:
-
-        text = re.sub(r"(?<=\n)( *#{1,6}.*)", "\033[38;2;86;156;214m\\1\033[0m", text)
-        text = re.sub(r"(?<=\n)( *-(?!-))", "\033[38;2;103;150;230m\\1\033[0m", text)
-
-        def repl(match:re.Match) -> str:
-            t = match.group()
-
-            if (m := re.match(r"#{1,6}[^#\n].*", t)):
-                return f"\033[38;2;86;156;214m{m.group()}\033[0m"
-            elif (m := re.match(r" *(\-|\+|\*|\d+(:|\.))", t)):
-                return f"\033[38;2;103;150;230m{m.group()}\033[0m"
-            # elif (m := re.match(r"[│┤╡╢╖╕╣║╗╝╜╛┐└┴┬├─┼╞╟╚╔╩╦╠═╬╧╨╤╥╙╘╒╓╫╪┘┌]+", t)):
-            #     return f"\033[38;2;150;150;150m{m.group()}\033[0m"
-            else:
-                return t
-
-        return re.sub(r"((?:^|(?<=\n))#{1,6}[^#\n].*|(?:^|(?<=\n)) *(\-|\+|\*)|(?:^|(?<=\n)) *\d+(?:\.|:)|[│┤╡╢╖╕╣║╗╝╜╛┐└┴┬├─┼╞╟╚╔╩╦╠═╬╧╨╤╥╙╘╒╓╫╪┘┌]+)", repl, text)
+        return MarkdownHighlighter().ansi(text)
 
     def _update_layout(self, editor):
         self.edit_area.width = self.width
@@ -693,6 +927,21 @@ class FileEditor(UIElement):
         self.edit_area.width = self.width
         self.edit_area.height = self.height
         
+        if self._loading:
+            done = self._loader.done
+            if chunks := self._loader.take():
+                self.edit_area.editable.append_chunks(chunks)
+            self._loading = not done
+            if self._loading:
+                editor.request_frame(0.05)
+            elif self._save_queued:
+                self._save_queued = False
+                self.save_file(self.edit_area.editable, self.edit_area.editable.buffer.snapshot(), None, self.edit_area.editable.cursor_location.copy())
+
+        if self.saver.busy():
+            self.saver.poll()
+            editor.request_frame(0.05)
+
         self.edit_area._event(editor, X, Y)
 
 
@@ -808,6 +1057,7 @@ class WindowFrame(UIElement):
 
     def _update_layout(self, editor):
         pygame.display.set_mode((editor.width, editor.height), pygame.RESIZABLE | pygame.NOFRAME)
+        editor.mark_dirty()
         self.top_bar.width = editor.width
         self.bottom_drag.width = editor.width-10
         self.bottom_drag.y = self.bottom_left_drag.y = self.bottom_right_drag.y = editor.height-5
@@ -897,6 +1147,9 @@ class WindowFrame(UIElement):
 
         if (not editor.mouse[0]) and editor.previous_mouse[0]:
             self.selected_drag = ""
+
+        if self.window_drag_offset or self.selected_drag:
+            editor.request_frame() # the mouse can leave the window while dragging, so don't wait for events
             
 
         for child in self.children[::-1]: